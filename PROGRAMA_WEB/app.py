@@ -7,13 +7,22 @@ Desenvolvido com Streamlit - VERSÃO MELHORADA
 """
 
 import streamlit as st
-from PIL import Image
-import io
-import zipfile
+from collections import OrderedDict
 from datetime import datetime
-from pathlib import Path
 import json
-from image_processor import ImageProcessor
+import time
+from image_processor import ImageProcessor, EncodedImage, PREVIEW_MAX_SIDE
+from batch_engine import BatchEngine, default_workers
+from thumbnails import thumbnail_service, GALLERY_THUMBNAIL_SIZE
+from zip_export import create_download_zip, ZipExport, ZipSink
+from pipeline import upload_tasks
+from stage_timings import summarize, slowest, to_json, to_csv
+from caches import process_budget
+from result_cache import ResultCache
+from job_manager import JobManager, QUEUED, DONE, CANCELLED
+from memory_accountant import MemoryAccountant, USAGE_LABELS
+from text_templates import TEMPLATE_FIELDS, load_label_table, text_config_for
+from resize_strategy import DEFAULT_RESIZE_STRATEGY, RESIZE_STRATEGIES
 
 # ==================== CONFIGURAÇÃO DA PÁGINA ====================
 st.set_page_config(
@@ -105,8 +114,17 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ==================== INICIALIZAÇÃO ====================
-if 'processor' not in st.session_state:
-    st.session_state.processor = ImageProcessor()
+@st.cache_resource
+def get_processor(resize_strategy: str = DEFAULT_RESIZE_STRATEGY) -> ImageProcessor:
+    """Processador compartilhado por todas as sessões (fonte e caches carregados uma vez)"""
+    return ImageProcessor(resize_strategy)
+
+@st.cache_resource
+def get_memory_accountant() -> MemoryAccountant:
+    """Memória guardada por todas as sessões, com limite por sessão e global"""
+    return MemoryAccountant(processor=get_processor())
+
+if 'processed_images' not in st.session_state:
     st.session_state.processed_images = []
     st.session_state.preview_image = None
     st.session_state.show_preview = False
@@ -118,8 +136,23 @@ if 'processor' not in st.session_state:
     }
     st.session_state.keep_overlay_size = False
     st.session_state.uploader_key = 0  # Chave para forçar reset do file_uploader
+    st.session_state.results_version = 0  # Identifica o lote atual de processed_images
+    st.session_state.encoded_cache = OrderedDict()  # (lote, formato, qualidade, limite) -> {índice: EncodedImage}
+    st.session_state.zip_cache = None  # Último ZIP montado: {'key', 'export', 'duration'}
+    st.session_state.stage_timings = []  # StageTimings de cada imagem do lote atual
+    st.session_state.batch_job_id = None  # Lote rodando em segundo plano (JobManager)
+    st.session_state.last_batch = None  # Resumo do último lote recolhido
+    st.session_state.streamed_zip_key = None  # Configurações do ZIP gravado durante o lote
+    st.session_state.memory_ledger = get_memory_accountant().ledger()  # Memória desta sessão
+    st.session_state.memory_ledger.track_encoded(st.session_state.encoded_cache)
+
+# Quantas combinações (formato, qualidade) manter codificadas ao mesmo tempo
+ENCODED_CACHE_VARIANTS = 2
 
-processor = st.session_state.processor
+# Intervalo (segundos) entre as consultas ao progresso de um lote em segundo plano
+JOB_POLL_INTERVAL = 0.5
+
+processor = get_processor()
 
 # ==================== FUNÇÕES AUXILIARES ====================
 
@@ -137,63 +170,132 @@ def save_preset(config):
     preset_data = json.dumps(config, indent=4, ensure_ascii=False)
     return preset_data
 
-def create_download_zip(processed_images, format_ext, quality, prefix, suffix, progress_callback=None):
+def get_encoded_images(format_ext, quality, max_bytes=None):
     """
-    Cria arquivo ZIP com todas as imagens processadas
-    ⚡ OTIMIZADO: Sem compressão do ZIP (imagens já são comprimidas)
+    Imagens já codificadas do lote atual para (formato, qualidade, tamanho máximo)
+    Prefixo/sufixo só mudam o nome no ZIP, então não fazem parte da chave.
     """
-    zip_buffer = io.BytesIO()
-
-    # ZIP_STORED = sem compressão (muito mais rápido, pois imagens já são comprimidas)
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as zip_file:
-        total = len(processed_images)
-
-        for idx, (img, original_name) in enumerate(processed_images, 1):
-            # Callback de progresso
-            if progress_callback:
-                progress_callback(idx, total, original_name)
-
-            # Criar nome do arquivo
-            name_without_ext = Path(original_name).stem
-            new_name = f"{prefix}{name_without_ext}{suffix}.{format_ext}"
-
-            # Salvar imagem em buffer
-            img_buffer = io.BytesIO()
-
-            if format_ext == 'png':
-                # PNG: Sem optimize para velocidade
-                img.save(img_buffer, 'PNG', compress_level=6)
-            elif format_ext == 'webp':
-                if quality == 100:
-                    img.save(img_buffer, 'WEBP', lossless=True, quality=100, method=4)
-                else:
-                    # method=4 é mais rápido que method=6 com qualidade similar
-                    img.save(img_buffer, 'WEBP', quality=quality, method=4)
-            elif format_ext in ['jpg', 'jpeg']:
-                # Converter para RGB se necessário
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                # Remover optimize e subsampling para velocidade
-                img.save(img_buffer, 'JPEG', quality=quality)
-
-            # Adicionar ao ZIP
-            zip_file.writestr(new_name, img_buffer.getvalue())
-
-    zip_buffer.seek(0)
-    return zip_buffer
+    variants = st.session_state.encoded_cache
+    key = (st.session_state.results_version, format_ext, quality, max_bytes)
+
+    if key in variants:
+        variants.move_to_end(key)
+    else:
+        variants[key] = {}
+        # Descartar as combinações mais antigas para limitar memória
+        while len(variants) > ENCODED_CACHE_VARIANTS:
+            variants.popitem(last=False)
+
+    return variants[key]
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Cache de resultados em disco, compartilhado por todas as sessões"""
+    return ResultCache()
+
+@st.cache_data(max_entries=4)
+def parse_label_table(data: bytes):
+    """Planilha de rótulos lida uma vez por conteúdo (reruns não releem o CSV)"""
+    return load_label_table(data)
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """Lotes em segundo plano, compartilhados pelo processo do servidor"""
+    return JobManager()
+
+def collect_batch_job(job):
+    """Copia os resultados do lote terminado para a sessão e o descarta do JobManager"""
+    progress = job.progress()
+    failed_files = []
+
+    # Resultados chegam na ordem de entrada
+    for batch_result in job.results:
+        if batch_result.timings is not None:
+            st.session_state.stage_timings.append(batch_result.timings)
+
+        if batch_result.ok:
+            st.session_state.processed_images.append((batch_result.output, batch_result.filename))
+        else:
+            failed_files.append((batch_result.filename, batch_result.error))
+
+    st.session_state.stats = {
+        'total': progress.total,
+        'processed': progress.processed,
+        'failed': progress.failed
+    }
+    st.session_state.last_batch = {
+        'status': progress.status,
+        'done': progress.done,
+        'duration': progress.elapsed,
+        'error': progress.error,
+        'failed_files': failed_files
+    }
+
+    if isinstance(job.output, ZipExport):
+        # Lote gravado direto no ZIP: só o arquivo final fica na sessão
+        discard_zip_cache()
+        st.session_state.zip_cache = {
+            'key': st.session_state.streamed_zip_key,
+            'export': job.output,
+            'duration': None
+        }
+
+    get_job_manager().discard(job.job_id)
+    st.session_state.batch_job_id = None
+
+def reset_processed_results():
+    """Começa um novo lote: invalida imagens codificadas e ZIP em cache"""
+    st.session_state.processed_images = []
+    st.session_state.stage_timings = []
+    st.session_state.results_version += 1
+    st.session_state.encoded_cache.clear()
+    discard_zip_cache()
+
+def account_session_memory(uploaded_files):
+    """
+    Conta o que a sessão guarda e aplica os limites de memória (sessão e global)
+    ⚡ Acima do limite, resultados antigos são comprimidos e depois gravados em disco
+    """
+    ledger = st.session_state.memory_ledger
+    ledger.track_results(st.session_state.processed_images)
+    job_id = st.session_state.batch_job_id
+    ledger.track_batch(get_job_manager().get(job_id) if job_id is not None else None)
+    ledger.set_encoding(selected_format, quality, max_file_bytes)
+
+    zip_cache = st.session_state.zip_cache
+    ledger.set_usage('preview', len(st.session_state.preview_image or b''))
+    ledger.set_usage('uploads', sum(file_item.size for file_item in uploaded_files or []))
+    ledger.set_usage('zip', zip_cache['export'].nbytes
+                     if zip_cache is not None and not zip_cache['export'].on_disk else 0)
+
+    accountant = get_memory_accountant()
+    accountant.enforce(ledger)
+    return ledger.usage(), accountant.stats()
+
+def discard_zip_cache():
+    """Libera o ZIP em cache (memória ou arquivo temporário)"""
+    if st.session_state.zip_cache is not None:
+        st.session_state.zip_cache['export'].close()
+        st.session_state.zip_cache = None
 
 def load_overlay_image():
-    """Carrega a imagem do overlay a partir do session_state"""
+    """
+    Carrega o overlay a partir do session_state
+    ⚡ OTIMIZADO: Compilado (RGBA, análise do alpha, hash) uma vez por conteúdo no
+    processo: sessões que enviam a mesma moldura dividem uma única cópia. A sessão
+    guarda só o hash do arquivo, não os pixels.
+    """
     if 'overlay_file' not in st.session_state or st.session_state.overlay_file is None:
         return None
-    st.session_state.overlay_file.seek(0)
-    return Image.open(st.session_state.overlay_file)
+
+    overlay_file = st.session_state.overlay_file
+    key = (getattr(overlay_file, 'file_id', None), overlay_file.name, overlay_file.size)
+    cached = st.session_state.get('overlay_digest')
+    if cached is None or cached[0] != key:
+        cached = (key, ImageProcessor.content_digest(overlay_file.getvalue()))
+        st.session_state.overlay_digest = cached
+
+    return processor.compile_overlay(overlay_file, content_key=cached[1])
 
 # ==================== HEADER ====================
 st.markdown("# 🎨 PROCESSADOR DE IMAGENS EM LOTE")
@@ -243,6 +345,15 @@ with st.sidebar:
     if overlay_file:
         st.session_state.overlay_file = overlay_file
         st.success(f"✅ Overlay carregado: {overlay_file.name}")
+        compiled_overlay = load_overlay_image()
+        overlay_kinds = {
+            'frame': "moldura (miolo transparente)",
+            'opaque': "opaco (cobre a imagem inteira)",
+            'transparent': "totalmente transparente",
+            'partial': "com transparência"
+        }
+        st.caption(f"{compiled_overlay.width}x{compiled_overlay.height} px, "
+                   f"{overlay_kinds[compiled_overlay.classification]}")
     else:
         st.info("ℹ️ Selecione um arquivo de overlay para continuar")
 
@@ -254,6 +365,66 @@ with st.sidebar:
 
     st.markdown("---")
 
+    # ===== DESEMPENHO =====
+    st.markdown("### ⚡ DESEMPENHO")
+
+    batch_workers = st.number_input(
+        "Processos paralelos",
+        min_value=1,
+        max_value=max(default_workers(), 1) * 2,
+        value=default_workers(),
+        help="Quantos núcleos usar no processamento em lote (1 = sem paralelismo)"
+    )
+
+    store_encoded = st.checkbox(
+        "Economizar memória (guardar imagens já comprimidas)",
+        value=False,
+        help="Cada resultado é codificado no formato de saída assim que fica pronto; "
+             "só os bytes comprimidos e uma miniatura ficam na memória. "
+             "Recomendado para lotes grandes."
+    )
+
+    stream_zip = st.checkbox(
+        "ZIP direto (lotes muito grandes)",
+        value=False,
+        help="Cada imagem vai para o ZIP assim que fica pronta e sai da memória: o consumo "
+             "acompanha o número de processos, não o tamanho do lote. Sem galeria; para mudar "
+             "formato, qualidade ou nomes é preciso reprocessar."
+    )
+
+    resize_strategy = st.selectbox(
+        "Redimensionamento",
+        list(RESIZE_STRATEGIES),
+        index=list(RESIZE_STRATEGIES).index(DEFAULT_RESIZE_STRATEGY),
+        format_func=lambda name: RESIZE_STRATEGIES[name].label,
+        help="Como overlay e base são reduzidos ao tamanho final. Qualidade = LANCZOS direto "
+             "(resultado de sempre). Equilibrado e Rápido reduzem antes por fator inteiro e "
+             "fazem só o ajuste fino com o filtro: bem mais rápidos em fotos grandes, com "
+             "pequena perda de nitidez (veja a etapa 'resize' do benchmark.py)."
+    )
+    # Preview e lote com o mesmo redimensionamento (caches continuam compartilhados)
+    processor = get_processor(resize_strategy)
+
+    use_result_cache = st.checkbox(
+        "Reaproveitar resultados (cache em disco)",
+        value=True,
+        help="Imagens já processadas com o mesmo overlay, texto, formato e qualidade "
+             "saem direto do cache, sem recompor nem recodificar."
+    )
+    if use_result_cache:
+        cache_stats = get_result_cache().stats()
+        st.caption(f"💾 {cache_stats['entries']} resultado(s) em cache | "
+                   f"{cache_stats['bytes'] / 1024 / 1024:.0f}/{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+
+    memory_stats = process_budget.stats()
+    st.caption(f"🧠 Cache em memória (todas as sessões): {memory_stats['entries']} item(ns) | "
+               f"{memory_stats['bytes'] / 1024 / 1024:.0f}/{memory_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+
+    # Preenchido no fim da página, depois de contar o que a sessão guarda
+    memory_status = st.empty()
+
+    st.markdown("---")
+
     # ===== FORMATO E QUALIDADE =====
     st.markdown("### 💾 FORMATO E QUALIDADE")
 
@@ -296,6 +467,19 @@ with st.sidebar:
         quality = 100
         st.success("🌟 PNG: Sempre sem perda de qualidade")
 
+    # Limite de tamanho por arquivo (ex.: marketplaces)
+    max_file_kb = 0
+    if selected_format in ['webp', 'jpg']:
+        max_file_kb = st.number_input(
+            "Tamanho máximo por arquivo (KB)",
+            min_value=0,
+            value=0,
+            step=50,
+            help="0 = sem limite. Com limite, cada imagem usa a maior qualidade "
+                 "(até a escolhida acima) cujo arquivo caiba no tamanho."
+        )
+    max_file_bytes = int(max_file_kb) * 1024 if max_file_kb else None
+
     st.markdown("---")
 
     # ===== RENOMEAÇÃO =====
@@ -321,9 +505,26 @@ with st.sidebar:
         text_overlay = st.text_input(
             "Texto",
             "PROMOÇÃO",
-            help="Texto que aparecerá nas imagens"
+            help="Texto que aparecerá nas imagens. Campos trocados em cada imagem: "
+                 + ", ".join(f"{{{name}}} ({description})" for name, description in TEMPLATE_FIELDS.items())
+                 + " e as colunas do CSV de rótulos (ex.: {sku} - R$ {preco})"
         )
 
+        labels_file = st.file_uploader(
+            "📄 Rótulos por imagem (CSV, opcional)",
+            type=['csv'],
+            help="Primeira coluna: nome do arquivo (com ou sem extensão). "
+                 "Demais colunas: campos usados no texto pelo nome do cabeçalho."
+        )
+        text_labels = None
+        if labels_file is not None:
+            try:
+                text_labels = parse_label_table(labels_file.getvalue())
+                st.caption(f"📄 {len(text_labels['rows'])} chave(s) | campos: "
+                           + ", ".join(f"{{{column}}}" for column in text_labels['columns']))
+            except ValueError as e:
+                st.error(f"❌ CSV de rótulos inválido: {e}")
+
         col1, col2 = st.columns(2)
         with col1:
             text_size = st.number_input("Tamanho", min_value=10, max_value=200, value=50)
@@ -412,9 +613,8 @@ else:
         cols = st.columns(min(5, total_images))
         for idx, file_item in enumerate(images_to_process[:5]):
             with cols[idx]:
-                file_item.seek(0)
-                img = Image.open(file_item)
-                st.image(img, caption=file_item.name, use_container_width=True)
+                # ⚡ Miniatura pequena (em cache pelo conteúdo) em vez da imagem inteira
+                st.image(thumbnail_service.get(file_item.getvalue()), caption=file_item.name, use_container_width=True)
         if total_images > 5:
             st.caption(f"... e mais {total_images - 5} imagem(ns)")
 
@@ -468,19 +668,13 @@ with col1:
                             current_idx = st.session_state.current_preview_index
                             
                             current_file = images_to_process[current_idx]
-                            current_file.seek(0)
-                            base_img = Image.open(current_file)
                             filename = current_file.name
 
                             overlay_img = load_overlay_image()
                             if overlay_img is None:
                                 st.warning("⚠️ Não foi possível carregar o overlay.")
                             else:
-                                result = processor.apply_overlay(
-                                    base_img,
-                                    overlay_img,
-                                    st.session_state.keep_overlay_size
-                                )
+                                text_config = None
 
                                 # Aplicar texto se habilitado
                                 if text_enabled and text_overlay.strip():
@@ -502,8 +696,21 @@ with col1:
                                         "bg_color": text_bg_color if text_bg_enabled else "#000000",
                                         "bg_opacity": text_bg_opacity if text_bg_enabled else 70
                                     }
+                                    if text_labels is not None:
+                                        text_config["labels"] = text_labels
 
-                                    result = processor.add_text_overlay(result, text_config)
+                                    # Campos do texto preenchidos para esta imagem
+                                    text_config = text_config_for(text_config, filename, current_idx)
+
+                                # ⚡ OTIMIZAÇÃO: Preview renderizado na resolução de exibição
+                                # e já codificado (o navegador não precisa de um PNG em tamanho real)
+                                preview = processor.render_preview(
+                                    current_file,
+                                    overlay_img,
+                                    text_config,
+                                    st.session_state.keep_overlay_size
+                                )
+                                result = processor.encode_display(preview, PREVIEW_MAX_SIDE)
 
                                 st.session_state.preview_image = result
                                 st.session_state.show_preview = True
@@ -546,6 +753,9 @@ with col1:
 with col2:
     st.markdown("## 🚀 PROCESSAMENTO")
 
+    job_manager = get_job_manager()
+    poll_batch_job = False  # Rerun no fim da página para atualizar o progresso
+
     if st.button("🚀 PROCESSAR TODAS AS IMAGENS", use_container_width=True, type="primary"):
         overlay_loaded = 'overlay_file' in st.session_state and st.session_state.overlay_file is not None
         if not overlay_loaded:
@@ -553,190 +763,290 @@ with col2:
         elif total_images == 0:
             st.warning("⚠️ Selecione imagens para processar!")
         else:
+            # Lote anterior desta sessão ainda em andamento: substituído pelo novo
+            if st.session_state.batch_job_id is not None:
+                job_manager.discard(st.session_state.batch_job_id)
+                st.session_state.batch_job_id = None
+
             # Resetar estatísticas
             st.session_state.stats = {
                 'total': total_images,
                 'processed': 0,
                 'failed': 0
             }
-            st.session_state.processed_images = []
+            st.session_state.last_batch = None
+            reset_processed_results()
 
-            # Barra de progresso
-            progress_bar = st.progress(0)
             status_text = st.empty()
 
-            start_time = datetime.now()
-            failed_files = []
-
-            # ⚡ OTIMIZAÇÃO: Carregar overlay UMA VEZ antes do loop
+            # ⚡ OTIMIZAÇÃO: Overlay e fonte são carregados UMA VEZ por processo
             status_text.text("Carregando overlay...")
-            overlay_img = load_overlay_image()
-            if overlay_img is None:
+            if load_overlay_image() is None:
                 st.error("❌ Overlay não disponível.")
                 st.stop()
-
-            # Converter overlay para RGBA uma vez
-            if overlay_img.mode != 'RGBA':
-                overlay_img = overlay_img.convert('RGBA')
-
-            status_text.text("Iniciando processamento...")
-
-            # Processar cada imagem
-            img_start_times = []  # Para calcular tempo médio
-
-            for idx, file_item in enumerate(images_to_process):
-                img_start = datetime.now()
-
-                try:
-                    filename = file_item.name
-                    file_item.seek(0)
-                    base_img = Image.open(file_item)
-
-                    # Calcular tempo estimado restante
-                    if idx > 0 and img_start_times:
-                        avg_time = sum(img_start_times) / len(img_start_times)
-                        remaining = total_images - idx
-                        eta_seconds = avg_time * remaining
-                        eta_text = f" - ETA: {int(eta_seconds)}s"
-                    else:
-                        eta_text = ""
-
-                    percent = int(((idx + 1) / total_images) * 100)
-                    status_text.text(f"⚡ [{percent}%] Processando: {filename} ({idx + 1}/{total_images}){eta_text}")
-
-                    # Converter para RGBA
-                    if base_img.mode != 'RGBA':
-                        base_img = base_img.convert('RGBA')
-
-                    # Aplicar overlay (já está carregado e em RGBA)
-                    result = processor.apply_overlay(
-                        base_img,
-                        overlay_img,
-                        st.session_state.keep_overlay_size
-                    )
-
-                    # Aplicar texto
-                    if text_enabled and text_overlay.strip():
-                        pos_map = {
-                            "Superior Esquerda": "superior_esquerda",
-                            "Superior Direita": "superior_direita",
-                            "Inferior Esquerda": "inferior_esquerda",
-                            "Inferior Direita": "inferior_direita",
-                            "Centro": "centro"
-                        }
-
-                        text_config = {
-                            "text": text_overlay,
-                            "size": text_size,
-                            "color": text_color,
-                            "position": pos_map[text_position],
-                            "opacity": text_opacity,
-                            "bg_enabled": text_bg_enabled,
-                            "bg_color": text_bg_color if text_bg_enabled else "#000000",
-                            "bg_opacity": text_bg_opacity if text_bg_enabled else 70
-                        }
-
-                        result = processor.add_text_overlay(result, text_config)
-
-                    st.session_state.processed_images.append((result, filename))
-                    st.session_state.stats['processed'] += 1
-
-                except Exception as e:
-                    failed_files.append((filename, str(e)))
-                    st.session_state.stats['failed'] += 1
-
-                # Calcular tempo gasto nesta imagem
-                img_end = datetime.now()
-                img_time = (img_end - img_start).total_seconds()
-                img_start_times.append(img_time)
-
-                # Manter apenas últimas 5 medições para cálculo de média
-                if len(img_start_times) > 5:
-                    img_start_times.pop(0)
-
-                progress_bar.progress((idx + 1) / total_images)
-
-            # Finalizar
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-
+            st.session_state.overlay_file.seek(0)
+            overlay_bytes = st.session_state.overlay_file.read()
+
+            # Configuração de texto (igual para todo o lote)
+            text_config = None
+            if text_enabled and text_overlay.strip():
+                pos_map = {
+                    "Superior Esquerda": "superior_esquerda",
+                    "Superior Direita": "superior_direita",
+                    "Inferior Esquerda": "inferior_esquerda",
+                    "Inferior Direita": "inferior_direita",
+                    "Centro": "centro"
+                }
+
+                text_config = {
+                    "text": text_overlay,
+                    "size": text_size,
+                    "color": text_color,
+                    "position": pos_map[text_position],
+                    "opacity": text_opacity,
+                    "bg_enabled": text_bg_enabled,
+                    "bg_color": text_bg_color if text_bg_enabled else "#000000",
+                    "bg_opacity": text_bg_opacity if text_bg_enabled else 70
+                }
+                if text_labels is not None:
+                    # ⚡ Planilha enviada uma vez a cada processo; o texto é preenchido por imagem
+                    text_config["labels"] = text_labels
+
+            engine = BatchEngine(
+                overlay_bytes,
+                keep_overlay_size=st.session_state.keep_overlay_size,
+                text_config=text_config,
+                workers=int(batch_workers),
+                # O cache e o ZIP direto guardam saídas codificadas: os resultados já voltam comprimidos
+                output_format=selected_format if (store_encoded or use_result_cache or stream_zip) else None,
+                quality=quality,
+                max_bytes=max_file_bytes,
+                result_cache=get_result_cache() if use_result_cache else None,
+                resize_strategy=resize_strategy
+            )
+            # ⚡ Arquivos lidos sob demanda pelo motor (no máximo alguns por processo em memória)
+            tasks = upload_tasks(images_to_process)
+
+            sink = None
+            if stream_zip:
+                # ⚡ Cada resultado vai para o ZIP e sai da memória
+                sink = ZipSink(selected_format, quality, prefix, suffix, max_file_bytes)
+                st.session_state.streamed_zip_key = (st.session_state.results_version, selected_format,
+                                                     quality, max_file_bytes, prefix, suffix)
+
+            # ⚡ O lote roda em uma thread do servidor: reruns da página (widgets,
+            # reconexão do navegador) não interrompem o processamento
+            st.session_state.batch_job_id = job_manager.submit(engine, tasks, total=total_images, sink=sink)
             status_text.empty()
-            progress_bar.empty()
 
+    # Andamento do lote em segundo plano
+    if st.session_state.batch_job_id is not None:
+        job = job_manager.get(st.session_state.batch_job_id)
+
+        if job is None:
+            st.session_state.batch_job_id = None
+            st.warning("⚠️ O lote em andamento não está mais disponível (servidor reiniciado?)")
+        elif not job.finished:
+            progress = job.progress()
+            st.progress(progress.fraction)
+
+            if progress.status == QUEUED:
+                st.text("⏳ Aguardando outro lote terminar...")
+            elif progress.done == 0:
+                st.text(f"Iniciando processamento ({int(batch_workers)} processo(s))...")
+            else:
+                remaining = progress.total - progress.done
+                eta_text = f" - ETA: {int(progress.eta)}s" if remaining and progress.eta is not None else ""
+                st.text(f"⚡ [{int(progress.fraction * 100)}%] Processado: {progress.current} "
+                        f"({progress.done}/{progress.total}){eta_text}")
+
+            if job.cancel_requested:
+                st.caption("⏹️ Cancelando...")
+            elif st.button("⏹️ CANCELAR PROCESSAMENTO", use_container_width=True):
+                job.cancel()
+
+            poll_batch_job = True
+        else:
+            collect_batch_job(job)
+
+    # Resumo do último lote
+    last_batch = st.session_state.last_batch
+    if last_batch is not None:
+        if last_batch['status'] == DONE:
             st.success("✅ Processamento concluído!")
+        elif last_batch['status'] == CANCELLED:
+            st.warning(f"⏹️ Processamento cancelado após {last_batch['done']} de "
+                       f"{st.session_state.stats['total']} imagem(ns)")
+        else:
+            st.error(f"❌ Processamento interrompido: {last_batch['error']}")
 
-            # Métricas
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Total", st.session_state.stats['total'])
-            with col2:
-                st.metric("✅ Processadas", st.session_state.stats['processed'])
-            with col3:
-                st.metric("❌ Falhas", st.session_state.stats['failed'])
-            with col4:
-                imgs_per_sec = st.session_state.stats['processed'] / max(duration, 0.1)
-                st.metric("⚡ Velocidade", f"{imgs_per_sec:.1f} img/s")
+        duration = last_batch['duration']
+
+        # Métricas
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total", st.session_state.stats['total'])
+        with col2:
+            st.metric("✅ Processadas", st.session_state.stats['processed'])
+        with col3:
+            st.metric("❌ Falhas", st.session_state.stats['failed'])
+        with col4:
+            imgs_per_sec = st.session_state.stats['processed'] / max(duration, 0.1)
+            st.metric("⚡ Velocidade", f"{imgs_per_sec:.1f} img/s")
 
-            st.caption(f"⏱️ Tempo total: {duration:.2f} segundos | Média: {duration/max(total_images, 1):.2f}s por imagem")
+        st.caption(f"⏱️ Tempo total: {duration:.2f} segundos | Média: {duration/max(last_batch['done'], 1):.2f}s por imagem")
 
-            if failed_files:
-                with st.expander("⚠️ Ver erros", expanded=False):
-                    for filename, error in failed_files:
-                        st.error(f"❌ {filename}: {error}")
+        if last_batch['failed_files']:
+            with st.expander("⚠️ Ver erros", expanded=False):
+                for filename, error in last_batch['failed_files']:
+                    st.error(f"❌ {filename}: {error}")
 
     # Botão de download
-    if st.session_state.processed_images:
+    if st.session_state.processed_images or st.session_state.zip_cache is not None:
         st.markdown("---")
         st.markdown("### 📥 DOWNLOAD")
 
-        # Criar placeholder para feedback
-        zip_progress_bar = st.progress(0)
-        zip_status = st.empty()
-
-        # Função de callback para progresso
-        def zip_progress_callback(current, total, filename):
-            percent = current / total
-            zip_progress_bar.progress(percent)
-            zip_status.text(f"📦 Preparando ZIP: {current}/{total} - {filename}")
-
-        # Criar ZIP com feedback
-        zip_start = datetime.now()
-        zip_buffer = create_download_zip(
-            st.session_state.processed_images,
-            selected_format,
-            quality,
-            prefix,
-            suffix,
-            progress_callback=zip_progress_callback
-        )
-        zip_end = datetime.now()
-        zip_duration = (zip_end - zip_start).total_seconds()
+        # ⚡ OTIMIZAÇÃO: Reruns do Streamlit (sliders, preview...) reaproveitam o ZIP
+        # se lote, formato, qualidade, prefixo e sufixo não mudaram
+        zip_key = (st.session_state.results_version, selected_format, quality, max_file_bytes, prefix, suffix)
+        zip_cache = st.session_state.zip_cache
+
+        if not st.session_state.processed_images:
+            # ZIP gravado durante o lote: as imagens não ficaram na memória para refazê-lo
+            if zip_cache['key'] != zip_key:
+                st.warning("⚠️ Formato, qualidade ou nomes mudaram depois do processamento: "
+                           "este ZIP usa as configurações anteriores. Reprocesse para aplicar as novas.")
+        elif zip_cache is None or zip_cache['key'] != zip_key:
+            # Criar placeholder para feedback
+            zip_progress_bar = st.progress(0)
+            zip_status = st.empty()
+
+            # Função de callback para progresso
+            def zip_progress_callback(current, total, filename):
+                percent = current / total
+                zip_progress_bar.progress(percent)
+                zip_status.text(f"📦 Preparando ZIP: {current}/{total} - {filename}")
+
+            # ZIP anterior (outras configurações) não serve mais
+            discard_zip_cache()
+
+            # Criar ZIP com feedback
+            zip_start = datetime.now()
+            zip_export = create_download_zip(
+                processor,
+                st.session_state.processed_images,
+                selected_format,
+                quality,
+                prefix,
+                suffix,
+                progress_callback=zip_progress_callback,
+                encoded=get_encoded_images(selected_format, quality, max_file_bytes),
+                max_bytes=max_file_bytes
+            )
+            zip_end = datetime.now()
+
+            zip_cache = {
+                'key': zip_key,
+                'export': zip_export,
+                'duration': (zip_end - zip_start).total_seconds()
+            }
+            st.session_state.zip_cache = zip_cache
+
+            # Limpar feedback
+            zip_progress_bar.empty()
+            zip_status.empty()
 
-        # Limpar feedback
-        zip_progress_bar.empty()
-        zip_status.empty()
+        zip_duration = zip_cache['duration']
+        image_count = len(zip_cache['export'].report)
 
         filename = f"imagens_processadas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
 
         st.download_button(
-            label=f"📥 BAIXAR TODAS ({len(st.session_state.processed_images)} imagens)",
-            data=zip_buffer,
+            label=f"📥 BAIXAR TODAS ({image_count} imagens)",
+            data=zip_cache['export'].reader(),
             file_name=filename,
             mime="application/zip",
             use_container_width=True
         )
 
-        st.success(f"✅ {len(st.session_state.processed_images)} imagem(ns) pronta(s) para download!")
-        st.caption(f"⚡ ZIP criado em {zip_duration:.2f} segundos")
+        st.success(f"✅ {image_count} imagem(ns) pronta(s) para download!")
+        if zip_duration is None:
+            st.caption("⚡ ZIP montado durante o processamento")
+        else:
+            st.caption(f"⚡ ZIP criado em {zip_duration:.2f} segundos")
+
+        # Qualidade escolhida para cada arquivo com limite de tamanho
+        if max_file_bytes:
+            zip_export = zip_cache['export']
+            over_budget = zip_export.over_budget
+            if over_budget:
+                st.warning(f"⚠️ {len(over_budget)} arquivo(s) passaram de {max_file_kb} KB "
+                           f"mesmo na qualidade mínima")
+            with st.expander(f"📏 Qualidade por arquivo (limite de {max_file_kb} KB)", expanded=bool(over_budget)):
+                st.dataframe(
+                    [
+                        {
+                            'Arquivo': row['arquivo'],
+                            'Qualidade': row['qualidade'] if row['qualidade'] is not None else '—',
+                            'Tamanho (KB)': round(row['bytes'] / 1024, 1),
+                            'Dentro do limite': '✅' if row['dentro_do_limite'] else '❌'
+                        }
+                        for row in zip_export.report
+                    ],
+                    use_container_width=True,
+                    hide_index=True
+                )
 
         # Preview das processadas (compacto)
-        with st.expander("👁️ Ver imagens processadas", expanded=False):
-            cols = st.columns(min(5, len(st.session_state.processed_images)))
-            for idx, (img, name) in enumerate(st.session_state.processed_images[:5]):
-                with cols[idx]:
-                    st.image(img, caption=name, use_container_width=True)
-            if len(st.session_state.processed_images) > 5:
-                st.caption(f"... e mais {len(st.session_state.processed_images) - 5} imagem(ns)")
+        if st.session_state.processed_images:
+            with st.expander("👁️ Ver imagens processadas", expanded=False):
+                cols = st.columns(min(5, len(st.session_state.processed_images)))
+                encoded_images = get_encoded_images(selected_format, quality, max_file_bytes)
+                for idx, (img, name) in enumerate(st.session_state.processed_images[:5]):
+                    with cols[idx]:
+                        if isinstance(img, EncodedImage):
+                            # Resultados comprimidos trazem a própria miniatura (os do cache não)
+                            thumb = img.thumbnail or thumbnail_service.get(img.data)
+                        elif idx + 1 in encoded_images:
+                            # ⚡ Miniatura a partir dos bytes já codificados para o ZIP
+                            thumb = thumbnail_service.get(encoded_images[idx + 1].data)
+                        else:
+                            thumb = processor.encode_display(img, GALLERY_THUMBNAIL_SIZE)
+                        st.image(thumb, caption=name, use_container_width=True)
+                if len(st.session_state.processed_images) > 5:
+                    st.caption(f"... e mais {len(st.session_state.processed_images) - 5} imagem(ns)")
+
+    # Tempos por etapa do último lote
+    if st.session_state.stage_timings:
+        with st.expander("⏱️ Tempos por etapa", expanded=False):
+            all_timings = st.session_state.stage_timings
+            st.dataframe(summarize(all_timings), use_container_width=True, hide_index=True)
+
+            total_in = sum(t.bytes_in for t in all_timings)
+            total_out = sum(t.bytes_out for t in all_timings)
+            st.caption(f"📦 Entrada: {total_in / 1024 / 1024:.1f} MB | Saída: {total_out / 1024 / 1024:.1f} MB"
+                       + ("" if total_out else " (codificação feita no ZIP: ative 'Economizar memória' para medir)"))
+
+            st.markdown("**🐢 Imagens mais lentas**")
+            st.dataframe(slowest(all_timings), use_container_width=True, hide_index=True)
+
+            col_json, col_csv = st.columns(2)
+            with col_json:
+                st.download_button(
+                    label="📄 Exportar JSON",
+                    data=to_json(all_timings),
+                    file_name="tempos_por_etapa.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
+            with col_csv:
+                st.download_button(
+                    label="📊 Exportar CSV",
+                    data=to_csv(all_timings),
+                    file_name="tempos_por_etapa.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
 
 # ==================== FOOTER ====================
 st.markdown("---")
@@ -747,3 +1057,24 @@ st.markdown("""
     <p>💡 Dica: Use WEBP com qualidade 95% para melhor equilíbrio</p>
 </div>
 """, unsafe_allow_html=True)
+
+# ==================== MEMÓRIA DA SESSÃO ====================
+session_usage, accountant_stats = account_session_memory(uploaded_files)
+with memory_status.container():
+    session_bytes = sum(session_usage.values())
+    details = ", ".join(f"{USAGE_LABELS.get(name, name)} {nbytes / 1024 / 1024:.0f} MB"
+                        for name, nbytes in session_usage.items() if nbytes >= 1024 * 1024)
+    st.caption(f"🧮 Esta sessão: {session_bytes / 1024 / 1024:.0f}/"
+               f"{accountant_stats['session_max_bytes'] / 1024 / 1024:.0f} MB" + (f" ({details})" if details else ""))
+    st.caption(f"🖥️ Todas as sessões ({accountant_stats['sessions']}): "
+               f"{accountant_stats['bytes'] / 1024 / 1024:.0f}/{accountant_stats['global_max_bytes'] / 1024 / 1024:.0f} MB"
+               + (f" | {accountant_stats['spilled']} resultado(s) em disco" if accountant_stats['spilled'] else ""))
+    if session_bytes > accountant_stats['session_max_bytes']:
+        st.warning("⚠️ Sessão acima do limite de memória: os uploads não podem ser reduzidos. "
+                   "Envie menos imagens por vez ou use \"ZIP direto\".")
+
+# ==================== LOTE EM SEGUNDO PLANO ====================
+# Página inteira já desenhada: consultar o progresso de novo em instantes
+if poll_batch_job:
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
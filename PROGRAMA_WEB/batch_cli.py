@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PROCESSAMENTO EM LOTE PELA LINHA DE COMANDO (SEM NAVEGADOR)
+Aplica overlay/texto de uma pasta inteira para outra pasta, em paralelo
+
+Uso:
+    python batch_cli.py ENTRADA OVERLAY SAIDA --preset presets_exemplos/2_badge_promocao.json
+    python batch_cli.py ENTRADA OVERLAY SAIDA --workers 8 --keep-overlay-size --force
+    python batch_cli.py ENTRADA OVERLAY SAIDA --cache-dir /tmp/cache --cache-max-mb 500
+    python batch_cli.py ENTRADA OVERLAY SAIDA --preset preco.json --labels precos.csv
+    python batch_cli.py ENTRADA OVERLAY SAIDA --resize fast
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from batch_engine import BatchEngine, default_workers
+from image_processor import SAVE_PROFILE, ImageProcessor
+from pipeline import folder_tasks
+from resize_strategy import DEFAULT_RESIZE_STRATEGY, RESIZE_STRATEGIES
+from result_cache import ResultCache, RESULT_CACHE_MAX_BYTES
+from text_templates import load_label_table
+
+# Arquivo na pasta de saída com o hash das configurações de cada saída gravada
+MANIFEST_NAME = '.image-layer-manifest.json'
+
+
+def load_preset(preset_path: Optional[str]) -> Dict:
+    """Carrega o preset JSON (mesmo formato de presets_exemplos/*.json)"""
+    if not preset_path:
+        return {}
+    with open(preset_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_manifest(output_dir: str) -> Dict[str, str]:
+    """Configurações com que cada saída foi gravada ({nome do arquivo: hash})"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(output_dir: str, manifest: Dict[str, str]) -> None:
+    """Grava o manifesto (arquivo temporário + rename: nunca fica pela metade)"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def is_up_to_date(output_path: str, input_path: str, dependencies_mtime: float,
+                  manifest: Dict[str, str], settings: str) -> bool:
+    """
+    Saída existe, é mais nova que a entrada, o overlay e o preset, e foi gravada
+    com as mesmas configurações (--keep-overlay-size, --max-kb, --resize...)?
+    """
+    if manifest.get(os.path.basename(output_path)) != settings:
+        return False
+    try:
+        output_mtime = os.path.getmtime(output_path)
+    except OSError:
+        return False
+    return output_mtime >= max(os.path.getmtime(input_path), dependencies_mtime)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Executa o lote e retorna o código de saída (0 = sem falhas)"""
+    processor = ImageProcessor()
+    preset = load_preset(args.preset)
+
+    # Configurações do preset (com os mesmos padrões da interface)
+    output_format = None if preset.get('keep_original_format', False) else preset.get('output_format', 'webp')
+    save_options = {
+        'dest_folder': args.output,
+        'output_format': output_format,
+        'quality': preset.get('quality', 95),
+        'prefix': preset.get('prefix', ''),
+        'suffix': preset.get('suffix', '')
+    }
+    if args.max_kb:
+        save_options['max_bytes'] = args.max_kb * 1024
+    text_config = processor.text_config_from_preset(preset)
+    if args.labels:
+        if text_config is None:
+            print("⚠️ --labels ignorado: o preset não tem texto habilitado")
+        else:
+            # Campos do CSV usados no texto do preset (ex.: "{sku} - R$ {preco}")
+            with open(args.labels, 'rb') as f:
+                text_config['labels'] = load_label_table(f.read())
+    keep_overlay_size = args.keep_overlay_size or preset.get('keep_overlay_size', False)
+
+    os.makedirs(args.output, exist_ok=True)
+
+    with open(args.overlay, 'rb') as f:
+        overlay_bytes = f.read()
+
+    # Saídas mais novas que entrada, overlay e preset, gravadas com as mesmas
+    # configurações (hash no manifesto da pasta de saída), são puladas
+    dependencies_mtime = max(
+        os.path.getmtime(args.overlay),
+        os.path.getmtime(args.preset) if args.preset else 0,
+        os.path.getmtime(args.labels) if args.labels else 0
+    )
+    settings = ResultCache.settings_digest(
+        overlay_bytes, keep_overlay_size, text_config, save_options['quality'],
+        save_options.get('max_bytes'), args.resize, SAVE_PROFILE
+    )
+    manifest = load_manifest(args.output)
+
+    input_files = processor.get_image_files(args.input)
+    pending_paths: List[str] = []
+    skipped = 0
+    for path in input_files:
+        output_path = processor.get_output_path(
+            path, args.output, output_format, save_options['prefix'], save_options['suffix']
+        )
+        if not args.force and is_up_to_date(output_path, path, dependencies_mtime, manifest, settings):
+            skipped += 1
+        else:
+            pending_paths.append(path)
+
+    print(f"📂 {len(input_files)} imagem(ns) em {args.input}: "
+          f"{len(pending_paths)} para processar, {skipped} já atualizada(s)")
+
+    if not pending_paths:
+        return 0
+
+    # Saídas de execuções anteriores (mesma entrada e configurações) vêm do cache
+    result_cache = None
+    if not args.no_cache:
+        result_cache = ResultCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+
+    engine = BatchEngine(
+        overlay_bytes,
+        keep_overlay_size=keep_overlay_size,
+        text_config=text_config,
+        workers=args.workers,
+        save_options=save_options,
+        result_cache=result_cache,
+        max_in_flight=args.in_flight,
+        resize_strategy=args.resize
+    )
+
+    total = len(pending_paths)
+    bytes_in = sum(os.path.getsize(path) for path in pending_paths)
+    failed_files = []
+    processed = 0
+    start_time = time.perf_counter()
+
+    # ⚡ Só os caminhos trafegam; cada processo lê e grava os próprios arquivos
+    try:
+        for idx, result in enumerate(engine.run(folder_tasks(pending_paths)), 1):
+            name = os.path.basename(result.filename)
+            if result.ok:
+                processed += 1
+                manifest[os.path.basename(result.output_path)] = settings
+            else:
+                failed_files.append((name, result.error))
+                print(f"❌ {name}: {result.error}", file=sys.stderr)
+
+            if not args.quiet:
+                elapsed = time.perf_counter() - start_time
+                eta = elapsed / idx * (total - idx)
+                chosen = f" (q{result.quality})" if args.max_kb and result.quality is not None else ""
+                print(f"⚡ [{idx * 100 // total}%] {idx}/{total} {name}{chosen} - ETA: {int(eta)}s", flush=True)
+    finally:
+        # Também ao interromper (Ctrl+C): as saídas já gravadas não são refeitas
+        save_manifest(args.output, manifest)
+
+    duration = time.perf_counter() - start_time
+
+    # Resumo
+    print(f"✅ Processadas: {processed} | ❌ Falhas: {len(failed_files)} | ⏭️ Puladas: {skipped}")
+    print(f"⏱️ Tempo total: {duration:.2f}s | "
+          f"⚡ {processed / max(duration, 1e-6):.1f} img/s | "
+          f"{bytes_in / 1024 / 1024 / max(duration, 1e-6):.1f} MB/s lidos")
+    if result_cache is not None:
+        print(f"💾 Cache: {result_cache.hits} reaproveitada(s) de {total}")
+
+    if failed_files:
+        print("⚠️ Falhas:", file=sys.stderr)
+        for name, error in failed_files:
+            print(f"   {name}: {error}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Aplica overlay/texto em todas as imagens de uma pasta (sem interface web)"
+    )
+    parser.add_argument('input', help="Pasta com as imagens de entrada")
+    parser.add_argument('overlay', help="Arquivo do overlay/moldura")
+    parser.add_argument('output', help="Pasta de saída (criada se não existir)")
+    parser.add_argument('--preset', help="Preset JSON (mesmo formato de presets_exemplos/*.json)")
+    parser.add_argument('--labels', default=None,
+                        help="CSV de rótulos: 1ª coluna = nome do arquivo, demais = campos do texto ({sku}...)")
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="Processos paralelos (padrão: todos os núcleos)")
+    parser.add_argument('--in-flight', type=int, default=None,
+                        help="Imagens em andamento ao mesmo tempo (padrão: 2 por processo)")
+    parser.add_argument('--keep-overlay-size', action='store_true',
+                        help="Manter resolução original do overlay")
+    parser.add_argument('--force', action='store_true',
+                        help="Reprocessar mesmo as saídas já atualizadas")
+    parser.add_argument('--resize', choices=list(RESIZE_STRATEGIES), default=DEFAULT_RESIZE_STRATEGY,
+                        help="Redimensionamento: quality (LANCZOS direto), balanced ou fast (reduce + filtro)")
+    parser.add_argument('--max-kb', type=int, default=None,
+                        help="Tamanho máximo por arquivo em KB (busca a maior qualidade que cabe)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Não usar o cache de resultados em disco")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Pasta do cache (padrão: IMAGE_LAYER_CACHE_DIR ou ~/.cache/image-layer/results)")
+    parser.add_argument('--cache-max-mb', type=int, default=RESULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="Tamanho máximo do cache em MB (remove os menos usados)")
+    parser.add_argument('--quiet', action='store_true',
+                        help="Mostrar só falhas e o resumo final")
+    return parser
+
+
+if __name__ == '__main__':
+    sys.exit(run(build_parser().parse_args()))
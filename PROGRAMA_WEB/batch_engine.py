@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MOTOR DE PROCESSAMENTO EM LOTE
+Distribui decodificação → overlay → texto → codificação entre vários processos
+"""
+
+import os
+from collections import deque
+from itertools import chain, islice
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional, Dict, List, Tuple, Iterable, Iterator, Union
+
+from PIL import Image
+from compiled_overlay import CompiledOverlay
+from image_processor import ENCODE_PROFILE, SAVE_PROFILE, ImageProcessor, EncodedImage
+from resize_strategy import DEFAULT_RESIZE_STRATEGY
+from result_cache import ResultCache
+from shared_transfer import (
+    SharedImage, SharedOverlay, SharedOverlayHandle, attach_overlay,
+    open_shared_image, release_shared_image, share_image
+)
+from stage_timings import StageTimings
+from text_templates import has_placeholders, render_label, text_config_for
+from vector_composite import HAS_NUMPY
+
+# Imagens por tarefa na composição vetorizada (bases do mesmo tamanho são empilhadas)
+VECTOR_GROUP_SIZE = 16
+
+# Tarefas em andamento por processo (uma sendo processada e uma esperando na fila)
+IN_FLIGHT_PER_WORKER = 2
+
+
+@dataclass
+class BatchResult:
+    """Resultado de uma imagem do lote"""
+    index: int
+    filename: str
+    image: Optional[Image.Image] = None  # Imagem processada (modo sem codificação)
+    encoded: Optional[EncodedImage] = None  # Resultado comprimido (quando output_format é definido)
+    output_path: Optional[str] = None  # Arquivo gravado (quando save_options é definido)
+    error: Optional[str] = None
+    quality: Optional[int] = None  # Qualidade usada na codificação (com limite de tamanho pode ser menor)
+    timings: Optional[StageTimings] = None  # Tempo por etapa e bytes de entrada/saída
+    shared: Optional[SharedImage] = None  # Imagem em memória compartilhada (só no caminho de volta do pool)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def output(self) -> Union[Image.Image, EncodedImage, None]:
+        """Resultado, seja imagem decodificada ou comprimida"""
+        return self.encoded if self.encoded is not None else self.image
+
+    def without_output(self) -> 'BatchResult':
+        """Cópia sem a imagem/bytes (nome, erro, qualidade e tempos), depois de entregue ao destino"""
+        return replace(self, image=None, encoded=None)
+
+
+# Estado de cada processo trabalhador (carregado UMA VEZ no initializer)
+_worker = {}
+
+
+def _init_worker(*init_args):
+    """Carrega overlay e fonte uma única vez por processo"""
+    _worker.update(_worker_state(*init_args))
+
+
+def _worker_state(overlay: Union[bytes, CompiledOverlay, SharedOverlayHandle], keep_overlay_size: bool,
+                  text_config: Optional[Dict], output_format: Optional[str], quality: int,
+                  save_options: Optional[Dict] = None, max_bytes: Optional[int] = None,
+                  resize_strategy: str = DEFAULT_RESIZE_STRATEGY, shared_results: bool = False) -> Dict:
+    """Processador, overlay compilado e configurações usados pelas tarefas"""
+    processor = ImageProcessor(resize_strategy)
+
+    if isinstance(overlay, SharedOverlayHandle):
+        # ⚡ Pixels e análise publicados pelo processo principal: nada a decodificar
+        overlay = attach_overlay(overlay)
+    else:
+        # ⚡ Overlay compilado uma vez por processo (RGBA, análise, hash)
+        overlay = processor.compile_overlay(overlay)
+
+    # ⚡ Fonte carregada no início do processo, não a cada imagem
+    if text_config:
+        processor.get_font(text_config.get('size', 40))
+
+    return dict(
+        processor=processor,
+        overlay=overlay,
+        keep_overlay_size=keep_overlay_size,
+        text_config=text_config,
+        output_format=output_format,
+        quality=quality,
+        max_bytes=max_bytes,
+        save_options=save_options,
+        shared_results=shared_results,
+    )
+
+
+def _process_task(task: Tuple[int, str, Union[str, bytes]], worker: Optional[Dict] = None) -> BatchResult:
+    """Processa uma imagem dentro do processo trabalhador (ou com o estado worker dado)"""
+    worker = worker or _worker
+    index, filename, source = task
+    timings = StageTimings(filename)
+    try:
+        result = worker['processor'].process_source(
+            source,
+            worker['overlay'],
+            text_config_for(worker['text_config'], filename, index),  # Campos do texto por imagem
+            worker['keep_overlay_size'],
+            timings
+        )
+        return _finish(index, filename, result, timings, worker)
+
+    except Exception as e:
+        return BatchResult(index, filename, error=str(e), timings=timings)
+
+
+def _process_group(group: List[Tuple[int, str, Union[str, bytes]]],
+                   worker: Optional[Dict] = None) -> List[BatchResult]:
+    """
+    Processa várias imagens de uma vez: decodifica todas, compõe as de mesmo
+    tamanho juntas (NumPy) e depois aplica texto e codificação em cada uma
+    """
+    worker = worker or _worker
+    processor = worker['processor']
+    overlay = worker['overlay']
+    results: Dict[int, BatchResult] = {}
+    loaded = []  # (índice, nome, base, tempos)
+
+    for index, filename, source in group:
+        timings = StageTimings(filename)
+        try:
+            loaded.append((index, filename, processor.load_base(source, overlay, False, timings), timings))
+        except Exception as e:
+            results[index] = BatchResult(index, filename, error=str(e), timings=timings)
+
+    composed = processor.apply_overlay_stack(
+        [base for _, _, base, _ in loaded], overlay, [timings for _, _, _, timings in loaded]
+    )
+
+    for (index, filename, _, timings), result in zip(loaded, composed):
+        try:
+            text_config = text_config_for(worker['text_config'], filename, index)
+            if text_config and text_config.get('text', '').strip():
+                with timings.measure('text'):
+                    result = processor.add_text_overlay(result, text_config, in_place=True)
+            results[index] = _finish(index, filename, result, timings, worker)
+        except Exception as e:
+            results[index] = BatchResult(index, filename, error=str(e), timings=timings)
+
+    return [results[index] for index, _, _ in group]
+
+
+def _finish(index: int, filename: str, result: Image.Image, timings: StageTimings,
+            worker: Dict) -> BatchResult:
+    """Grava, codifica ou devolve a imagem processada conforme o modo do lote"""
+    processor = worker['processor']
+
+    if worker['save_options']:
+        # Modo pasta: gravar direto no disco dentro do processo trabalhador
+        with timings.measure('encode'):
+            output_path, quality = processor.save_image_to_size(result, filename, **worker['save_options'])
+        timings.bytes_out = os.path.getsize(output_path)
+        return BatchResult(index, filename, output_path=output_path, quality=quality, timings=timings)
+
+    if worker['output_format']:
+        with timings.measure('encode'):
+            encoded = processor.encode_result(
+                result, worker['output_format'], worker['quality'], max_bytes=worker['max_bytes']
+            )
+        timings.bytes_out = len(encoded.data)
+        return BatchResult(index, filename, encoded=encoded, quality=encoded.encoded_quality, timings=timings)
+
+    if worker['shared_results']:
+        # ⚡ Pixels voltam por memória compartilhada em vez do pickle pelo pipe do pool
+        with timings.measure('transfer'):
+            shared = share_image(result)
+        if shared is not None:
+            return BatchResult(index, filename, shared=shared, timings=timings)
+
+    return BatchResult(index, filename, image=result, timings=timings)
+
+
+class BatchEngine:
+    """Executa o pipeline de processamento em um pool de processos"""
+
+    def __init__(
+        self,
+        overlay_bytes: bytes,
+        keep_overlay_size: bool = False,
+        text_config: Optional[Dict] = None,
+        workers: Optional[int] = None,
+        output_format: Optional[str] = None,
+        quality: int = 95,
+        save_options: Optional[Dict] = None,
+        result_cache: Optional[ResultCache] = None,
+        vectorized: bool = False,
+        max_bytes: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        shared_memory: bool = True,
+        resize_strategy: str = DEFAULT_RESIZE_STRATEGY
+    ):
+        """
+        Args:
+            overlay_bytes: Conteúdo do arquivo de overlay
+            keep_overlay_size: Manter resolução original do overlay
+            text_config: Configurações de texto (opcional)
+            workers: Número de processos (None = todos os núcleos)
+            output_format: Se definido, cada resultado já volta comprimido (EncodedImage)
+            quality: Qualidade de codificação (1-100)
+            save_options: Se definido, cada resultado é gravado com ImageProcessor.save_image
+                (dest_folder, output_format, quality, prefix, suffix e, opcionalmente, max_bytes)
+            result_cache: Cache em disco das saídas codificadas. Só é usado quando
+                output_format ou save_options é definido (resultados comprimidos)
+            vectorized: Compor bases do mesmo tamanho em grupo com NumPy. Ignorado sem
+                NumPy ou com keep_overlay_size (cada base vira um canvas próprio).
+                Só para medição (benchmark.py): resultado idêntico, mas 3-5x mais lento
+                que Image.alpha_composite, por isso não aparece na interface nem na CLI
+            max_bytes: Tamanho máximo de cada resultado comprimido (com output_format): usa a
+                maior qualidade até 'quality' que caiba
+            max_in_flight: Tarefas (imagens, ou grupos no modo vetorizado) em andamento ao
+                mesmo tempo (None = IN_FLIGHT_PER_WORKER por processo)
+            shared_memory: Com o pool, publicar o overlay uma vez em memória compartilhada
+                e receber os resultados em imagem por ela (sem pickle dos pixels)
+            resize_strategy: Redimensionamento de overlay e bases: 'quality', 'balanced' ou 'fast'
+                (ver resize_strategy.py)
+        """
+        self.init_args = (overlay_bytes, keep_overlay_size, text_config, output_format, quality,
+                          save_options, max_bytes, resize_strategy)
+        self.workers = max(1, workers or default_workers())
+        self.output_format = output_format
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.save_options = save_options
+        self.vectorized = vectorized and HAS_NUMPY and not keep_overlay_size
+        self.max_in_flight = max(1, max_in_flight or IN_FLIGHT_PER_WORKER * self.workers)
+        self.shared_memory = shared_memory
+        self._overlay: Optional[CompiledOverlay] = None  # Compilado no processo principal (sob demanda)
+        self._inline_worker: Optional[Dict] = None  # Estado para processar sem pool
+
+        self.result_cache = result_cache if (output_format or save_options) else None
+        if self.result_cache is not None:
+            # ⚡ Hash de overlay/texto/qualidade calculado uma vez para o lote inteiro
+            quality_key = save_options.get('quality', quality) if save_options else quality
+            max_bytes_key = save_options.get('max_bytes') if save_options else max_bytes
+            # Texto com campos por imagem: o texto já preenchido entra na chave de cada
+            # imagem (mudar uma linha da planilha só invalida as imagens daquela linha)
+            self.label_template = None
+            cache_text_config = text_config
+            if text_config and has_placeholders(text_config.get('text', '')):
+                self.label_template = text_config
+                cache_text_config = {key: value for key, value in text_config.items() if key != 'labels'}
+            self.cache_settings = ResultCache.settings_digest(
+                overlay_bytes, keep_overlay_size, cache_text_config, quality_key, max_bytes_key,
+                resize_strategy, SAVE_PROFILE if save_options else ENCODE_PROFILE
+            )
+
+    def run(self, tasks: Iterable[Tuple[str, Union[str, bytes]]]) -> Iterator[BatchResult]:
+        """
+        Processa as imagens e devolve os resultados NA ORDEM DE ENTRADA
+
+        ⚡ tasks é consumido aos poucos: no máximo max_in_flight tarefas ficam em
+        andamento e a próxima só é lida quando o consumidor recebe um resultado.
+        A memória acompanha o número de processos, não o tamanho do lote.
+
+        Args:
+            tasks: Lista ou gerador de (nome do arquivo, caminho ou bytes da imagem)
+
+        Yields:
+            BatchResult de cada imagem, na mesma ordem de tasks
+        """
+        indexed = ((idx, filename, source) for idx, (filename, source) in enumerate(tasks))
+        yield from self._execute(self._jobs(indexed))
+
+    def _jobs(self, indexed: Iterator[Tuple[int, str, Union[str, bytes]]]) -> Iterator[Tuple]:
+        """
+        Agrupa as tarefas (em grupos no modo vetorizado) e separa as que já estão no cache
+
+        Yields:
+            (tarefas do grupo, chave de cache por índice, tarefas a processar)
+        """
+        size = VECTOR_GROUP_SIZE if self.vectorized else 1
+        while True:
+            chunk = list(islice(indexed, size))
+            if not chunk:
+                return
+
+            keys = {}
+            pending = chunk
+            if self.result_cache is not None:
+                # ⚡ Entradas já processadas com as mesmas configurações saem do cache;
+                # só as demais vão para os processos trabalhadores
+                keys = {task[0]: self._cache_key(task) for task in chunk}
+                pending = [task for task in chunk if not self.result_cache.contains(keys[task[0]])]
+            yield chunk, keys, pending
+
+    def _execute(self, jobs: Iterator[Tuple], workers: Optional[int] = None) -> Iterator[BatchResult]:
+        """Processa os grupos no pool (ou no próprio processo), com no máximo max_in_flight em andamento"""
+        workers = workers or self.workers
+
+        # As primeiras tarefas decidem se compensa criar o pool
+        first = list(islice(jobs, self.max_in_flight))
+        if len(first) < self.max_in_flight:
+            workers = min(workers, sum(1 for _, _, pending in first if pending))
+
+        # Com 1 processo (ou 1 tarefa a processar) não compensa criar o pool
+        if workers <= 1:
+            for job in chain(first, jobs):
+                yield from self._collect(job, self._process_inline(job[2]))
+            return
+
+        process = _process_group if self.vectorized else _process_task
+        window = deque()  # (grupo, future) na ordem de entrada
+
+        initargs = self.init_args
+        shared_overlay = SharedOverlay.publish(self._compiled_overlay()) if self.shared_memory else None
+        if shared_overlay is not None:
+            # ⚡ Cada processo recebe só o nome do bloco e a análise, não o PNG para decodificar
+            initargs = (shared_overlay.handle,) + initargs[1:] + (True,)
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                def submit(job: Tuple) -> None:
+                    pending = job[2]
+                    future = None
+                    if pending:
+                        future = executor.submit(process, pending if self.vectorized else pending[0])
+                    window.append((job, future))
+
+                for job in first:
+                    submit(job)
+                try:
+                    while window:
+                        job, future = window.popleft()
+                        output = future.result() if future is not None else None
+                        # Vaga liberada: só agora a próxima tarefa é lida e enviada
+                        next_job = next(jobs, None)
+                        if next_job is not None:
+                            submit(next_job)
+                        yield from self._collect(job, self._receive(self._unpack(output)))
+                finally:
+                    # Se o consumidor parar no meio, não processar o restante
+                    for _, future in window:
+                        if future is not None:
+                            future.cancel()
+        finally:
+            # Resultados prontos que ninguém vai ler: liberar a memória compartilhada
+            for _, future in window:
+                if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+                    for result in self._unpack(future.result()):
+                        if result.shared is not None:
+                            release_shared_image(result.shared)
+            if shared_overlay is not None:
+                shared_overlay.close()
+
+    def _compiled_overlay(self) -> CompiledOverlay:
+        """Overlay compilado uma vez no processo principal (publicação e processamento sem pool)"""
+        if self._overlay is None:
+            # ⚡ Pelo cache do processo: a mesma moldura já compilada pela página é reaproveitada
+            self._overlay = ImageProcessor().compile_overlay(self.init_args[0])
+        return self._overlay
+
+    @staticmethod
+    def _receive(results: List[BatchResult]) -> List[BatchResult]:
+        """Abre as imagens que voltaram por memória compartilhada (o bloco é removido na hora)"""
+        for result in results:
+            if result.shared is not None:
+                with result.timings.measure('transfer'):
+                    result.image = open_shared_image(result.shared)
+                result.shared = None
+        return results
+
+    def _process_inline(self, tasks: List[Tuple[int, str, Union[str, bytes]]]) -> List[BatchResult]:
+        """Processa no próprio processo, com estado próprio (lotes em threads não se misturam)"""
+        if not tasks:
+            return []
+        if self._inline_worker is None:
+            self._inline_worker = _worker_state(self._compiled_overlay(), *self.init_args[1:])
+        if self.vectorized:
+            return _process_group(tasks, self._inline_worker)
+        return [_process_task(task, self._inline_worker) for task in tasks]
+
+    def _unpack(self, output: Union[BatchResult, List[BatchResult], None]) -> List[BatchResult]:
+        """Resultados de uma tarefa (uma imagem ou um grupo, no modo vetorizado)"""
+        if output is None:
+            return []
+        return output if self.vectorized else [output]
+
+    def _collect(self, job: Tuple, results: List[BatchResult]) -> Iterator[BatchResult]:
+        """Resultados do grupo na ordem de entrada: processados agora ou lidos do cache"""
+        chunk, keys, pending = job
+        processed = iter(results)
+        pending_indexes = {task[0] for task in pending}
+
+        for task in chunk:
+            index = task[0]
+            if index in pending_indexes:
+                result = next(processed)
+            else:
+                result = self._from_cache(task, keys[index])
+                if result is not None:
+                    yield result
+                    continue
+                # Removido do cache desde a verificação: processar aqui mesmo
+                result = self._process_inline([task])[0]
+
+            if keys and result.ok:
+                self._store(result, keys[index])
+            yield result
+
+    def _output_path(self, filename: str) -> str:
+        """Arquivo de saída no modo pasta (mesmo nome que save_image usaria)"""
+        options = self.save_options
+        return ImageProcessor.get_output_path(
+            filename, options['dest_folder'], options.get('output_format'),
+            options.get('prefix', ''), options.get('suffix', '')
+        )
+
+    def _cache_key(self, task: Tuple[int, str, Union[str, bytes]]) -> str:
+        index, filename, source = task
+        if self.save_options:
+            format_ext = Path(self._output_path(filename)).suffix
+        else:
+            format_ext = self.output_format
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source_bytes = source
+        else:
+            with open(source, 'rb') as f:
+                source_bytes = f.read()
+        label = None
+        if self.label_template is not None:
+            template = self.label_template
+            label = render_label(template['text'], filename, index, template.get('labels'))
+        return ResultCache.key(self.cache_settings, format_ext, source_bytes, label)
+
+    def _from_cache(self, task: Tuple[int, str, Union[str, bytes]], key: str) -> Optional[BatchResult]:
+        """Monta o resultado a partir do cache (None se a entrada sumiu)"""
+        index, filename, source = task
+        timings = StageTimings(filename)
+        with timings.measure('cache'):
+            data = self.result_cache.get(key)
+            if data is None:
+                return None
+
+            if self.save_options:
+                output_path = self._output_path(filename)
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+                result = BatchResult(index, filename, output_path=output_path, timings=timings)
+            else:
+                encoded = EncodedImage.from_bytes(data, self.output_format, self.quality, self.max_bytes)
+                result = BatchResult(index, filename, encoded=encoded, timings=timings)
+
+        timings.bytes_in = ImageProcessor.source_nbytes(source)
+        timings.bytes_out = len(data)
+        return result
+
+    def _store(self, result: BatchResult, key: str) -> None:
+        """Guarda no cache a saída codificada recém-produzida"""
+        if result.encoded is not None:
+            data = result.encoded.data
+        elif result.output_path is not None:
+            with open(result.output_path, 'rb') as f:
+                data = f.read()
+        else:
+            return
+        self.result_cache.put(key, data)
+
+
+def default_workers() -> int:
+    """Número padrão de processos: todos os núcleos disponíveis"""
+    return os.cpu_count() or 1
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK POR ETAPA DO PROCESSAMENTO
+Gera bases e overlays sintéticos (determinísticos) e mede cada etapa do
+ImageProcessor separadamente e o lote completo. O resultado sai em JSON para
+comparar entre commits.
+
+Uso:
+    python benchmark.py --output bench_antes.json
+    python benchmark.py --quick --output bench_depois.json --compare bench_antes.json
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import PIL
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from batch_engine import BatchEngine, default_workers
+from compiled_overlay import CompiledOverlay
+from image_processor import ImageProcessor
+from overlay_analysis import composite_with_plan
+from resize_strategy import QUALITY, RESIZE_STRATEGIES, resize
+from shared_transfer import open_shared_image, share_image
+from vector_composite import HAS_NUMPY, composite_stack
+from zip_export import create_download_zip
+
+try:
+    import resource  # Indisponível no Windows
+except ImportError:
+    resource = None
+
+# Resoluções em megapixels (proporção 3:2, como fotos de produto)
+DEFAULT_RESOLUTIONS = [1, 6, 12, 24, 50]
+QUICK_RESOLUTIONS = [1, 6]
+
+DEFAULT_MODES = ['RGB', 'RGBA', 'P', 'L']
+DEFAULT_FORMATS = ['webp', 'png', 'jpg']
+
+# Maior lado de destino na etapa de redimensionamento (ex.: 4K, post, miniatura)
+RESIZE_TARGETS = [2160, 1080, 640]
+
+# Texto usado na etapa de texto (igual a um preset de exemplo)
+TEXT_CONFIG = {
+    "text": "PROMOÇÃO",
+    "size": 60,
+    "color": "#FFFF00",
+    "position": "superior_direita",
+    "opacity": 100,
+    "bg_enabled": True,
+    "bg_color": "#FF0000",
+    "bg_opacity": 85
+}
+
+
+# ==================== DADOS SINTÉTICOS ====================
+
+def megapixels_to_size(megapixels: float) -> Tuple[int, int]:
+    """Tamanho 3:2 com aproximadamente a quantidade de megapixels pedida"""
+    height = int(math.sqrt(megapixels * 1_000_000 / 1.5))
+    return int(height * 1.5), height
+
+
+def make_base(size: Tuple[int, int], mode: str) -> Image.Image:
+    """Base determinística com detalhe fino (fractal) e gradientes suaves"""
+    detail = Image.effect_mandelbrot((512, 512), (-2.0, -1.2, 0.8, 1.2), 64).resize(size, Image.Resampling.BICUBIC)
+    horizontal = Image.linear_gradient('L').rotate(90).resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    image = Image.merge('RGB', (detail, horizontal, radial))
+
+    if mode == 'RGBA':
+        image.putalpha(Image.linear_gradient('L').resize(size).point(lambda v: 128 + v // 2))
+    elif mode == 'P':
+        image = image.quantize(colors=256)
+    elif mode == 'L':
+        image = image.convert('L')
+    return image
+
+
+def make_overlay(size: Tuple[int, int]) -> Image.Image:
+    """Moldura típica: borda opaca/semitransparente e centro totalmente transparente"""
+    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    border = max(8, min(size) // 12)
+    draw.rectangle((0, 0, size[0] - 1, border), fill=(230, 30, 30, 255))
+    draw.rectangle((0, size[1] - border, size[0] - 1, size[1] - 1), fill=(20, 20, 20, 180))
+    draw.rectangle((0, 0, border // 2, size[1] - 1), fill=(255, 255, 255, 120))
+    draw.rectangle((size[0] - border // 2, 0, size[0] - 1, size[1] - 1), fill=(255, 255, 255, 120))
+    return overlay
+
+
+def encode_source(image: Image.Image) -> bytes:
+    """Arquivo de entrada como viria do upload (JPEG sem alpha, PNG com alpha/paleta)"""
+    buffer = io.BytesIO()
+    if image.mode in ('RGB', 'L'):
+        image.save(buffer, 'JPEG', quality=92)
+    else:
+        image.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+# ==================== MEDIÇÃO ====================
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Pico de memória residente (MB) do processo (ou dos processos filhos)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux reporta em KB, macOS em bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+def time_stage(func: Callable[[], object], repeat: int) -> Dict:
+    """Executa func repeat vezes (após 1 aquecimento) e devolve estatísticas em segundos"""
+    func()  # Aquecimento (caches, fontes, overlay redimensionado)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'max_s': max(timings)
+    }
+
+
+def psnr(a: Image.Image, b: Image.Image) -> float:
+    """Relação sinal-ruído de pico entre duas imagens (dB, maior = mais parecidas)"""
+    diff = ImageChops.difference(a.convert('RGB'), b.convert('RGB'))
+    mse = sum(value ** 2 for value in ImageStat.Stat(diff).rms) / 3
+    return float('inf') if mse == 0 else round(10 * math.log10(255 ** 2 / mse), 2)
+
+
+def record(results: List[Dict], stage: str, params: Dict, stats: Dict, pixels: int, nbytes: int, images: int = 1):
+    """Adiciona uma linha de resultado com vazão calculada"""
+    median = max(stats['median_s'], 1e-9)
+    entry = {
+        'stage': stage,
+        **params,
+        **{key: round(value, 6) for key, value in stats.items()},
+        'images_per_s': round(images / median, 3),
+        'megapixels_per_s': round(pixels / 1_000_000 / median, 3),
+        'mb_per_s': round(nbytes / 1024 / 1024 / median, 3),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    results.append(entry)
+    print(f"  {stage:<22} {json.dumps(params, ensure_ascii=False):<55} "
+          f"{entry['median_s'] * 1000:9.1f} ms  {entry['images_per_s']:8.2f} img/s  {entry['mb_per_s']:8.1f} MB/s",
+          flush=True)
+
+
+# ==================== ETAPAS ====================
+
+def bench_stages(processor: ImageProcessor, args: argparse.Namespace, results: List[Dict]):
+    """Mede decode, overlay, texto e gravação para cada resolução/modo"""
+    for megapixels in args.resolutions:
+        size = megapixels_to_size(megapixels)
+        overlay = make_overlay(size)
+        overlay_small = make_overlay((1080, 1080))
+
+        for mode in args.modes:
+            base = make_base(size, mode)
+            data = encode_source(base)
+            pixels = size[0] * size[1]
+            params = {'megapixels': megapixels, 'mode': mode}
+            print(f"▶ {megapixels} MP {mode} ({size[0]}x{size[1]}, {len(data) / 1024 / 1024:.1f} MB)", flush=True)
+
+            # Decodificação + conversão para RGBA
+            def decode():
+                image = Image.open(io.BytesIO(data))
+                return image.convert('RGBA') if image.mode != 'RGBA' else image.copy()
+            base_rgba = decode()
+            record(results, 'decode', params, time_stage(decode, args.repeat), pixels, len(data))
+
+            # Overlay do mesmo tamanho e overlay redimensionado (cache aquecido)
+            record(results, 'apply_overlay', params,
+                   time_stage(lambda: processor.apply_overlay(base_rgba, overlay), args.repeat),
+                   pixels, pixels * 4)
+            record(results, 'apply_overlay_resize', params,
+                   time_stage(lambda: processor.apply_overlay(base_rgba, overlay_small), args.repeat),
+                   pixels, pixels * 4)
+
+            # Modo "cover": decodificação completa x decodificação reduzida
+            def cover_full():
+                image = Image.open(io.BytesIO(data)).convert('RGBA')
+                return processor.apply_overlay(image, overlay_small, True)
+
+            def cover_reduced():
+                return processor.process_source(data, overlay_small, None, True)
+
+            record(results, 'cover_full_decode', params, time_stage(cover_full, args.repeat), pixels, len(data))
+            record(results, 'cover_reduced_decode', params, time_stage(cover_reduced, args.repeat), pixels, len(data))
+            results[-1]['psnr_vs_full_db'] = psnr(cover_full(), cover_reduced())
+
+            # Texto
+            composed = processor.apply_overlay(base_rgba, overlay)
+            record(results, 'add_text_overlay', params,
+                   time_stage(lambda: processor.add_text_overlay(composed, TEXT_CONFIG), args.repeat),
+                   pixels, pixels * 4)
+
+            # Gravação em cada formato
+            with tempfile.TemporaryDirectory() as tmp:
+                for format_ext in args.formats:
+                    path = processor.get_output_path(f"bench.{format_ext}", tmp, format_ext)
+                    stats = time_stage(
+                        lambda: processor.save_image(composed, 'bench.png', tmp, format_ext, args.quality),
+                        args.repeat
+                    )
+                    record(results, 'save_image', dict(params, format=format_ext), stats,
+                           pixels, os.path.getsize(path))
+
+
+def bench_zip(processor: ImageProcessor, args: argparse.Namespace, results: List[Dict]):
+    """Mede create_download_zip com um lote pequeno na menor resolução"""
+    size = megapixels_to_size(min(args.resolutions))
+    overlay = make_overlay(size)
+    images = [
+        (processor.apply_overlay(make_base(size, 'RGB').convert('RGBA'), overlay), f"img_{idx}.png")
+        for idx in range(args.batch_size)
+    ]
+    pixels = size[0] * size[1] * len(images)
+
+    print(f"▶ ZIP com {len(images)} imagens de {size[0]}x{size[1]}", flush=True)
+    for format_ext in args.formats:
+        def build():
+            create_download_zip(processor, images, format_ext, args.quality, '', '').close()
+        record(results, 'create_download_zip', {'megapixels': min(args.resolutions), 'format': format_ext},
+               time_stage(build, args.repeat), pixels, pixels * 4, images=len(images))
+
+
+def bench_vectorized(processor: ImageProcessor, args: argparse.Namespace, results: List[Dict]):
+    """Compara a composição imagem a imagem com a composição em grupo (NumPy)"""
+    if not HAS_NUMPY:
+        print("▶ Composição vetorizada: NumPy não instalado (etapa ignorada)", flush=True)
+        return
+
+    size = megapixels_to_size(min(args.resolutions))
+    overlay, plan = processor.get_overlay_plan(make_overlay(size), size)
+    bases = [make_base(size, 'RGB').convert('RGBA') for _ in range(args.batch_size)]
+    pixels = size[0] * size[1] * len(bases)
+    params = {'megapixels': min(args.resolutions)}
+
+    print(f"▶ Composição de {len(bases)} imagens de {size[0]}x{size[1]}", flush=True)
+    record(results, 'composite_per_image', params,
+           time_stage(lambda: [composite_with_plan(base, overlay, plan) for base in bases], args.repeat),
+           pixels, pixels * 4, images=len(bases))
+    record(results, 'composite_vectorized', params,
+           time_stage(lambda: composite_stack(bases, overlay, plan), args.repeat),
+           pixels, pixels * 4, images=len(bases))
+
+
+def bench_resize(args: argparse.Namespace, results: List[Dict]):
+    """Compara as estratégias de redimensionamento: tempo e PSNR em relação ao LANCZOS direto"""
+    for megapixels in args.resolutions:
+        size = megapixels_to_size(megapixels)
+        base = make_base(size, 'RGB')
+        overlay = CompiledOverlay(make_overlay(size))
+        pixels = size[0] * size[1]
+        print(f"▶ Redimensionamento de {size[0]}x{size[1]}", flush=True)
+
+        for long_side in RESIZE_TARGETS:
+            scale = long_side / max(size)
+            if scale >= 1:
+                continue
+            target = (max(round(size[0] * scale), 1), max(round(size[1] * scale), 1))
+
+            stages = {
+                'resize_base': (lambda name: resize(base, target, name), pixels * 3),
+                'resize_overlay': (lambda name: overlay.resized(target, name), pixels * 4)
+            }
+            for stage, (run, nbytes) in stages.items():
+                reference = run(QUALITY)
+                quality_median = None
+                for name in RESIZE_STRATEGIES:
+                    stats = time_stage(lambda: run(name), args.repeat)
+                    record(results, stage, {'megapixels': megapixels, 'target': long_side, 'strategy': name},
+                           stats, pixels, nbytes)
+                    if name == QUALITY:
+                        quality_median = stats['median_s']
+                    results[-1]['speedup_vs_quality'] = round(quality_median / max(stats['median_s'], 1e-9), 2)
+                    results[-1]['psnr_vs_quality_db'] = psnr(reference, run(name))
+
+
+def bench_transfer(args: argparse.Namespace, results: List[Dict]):
+    """Compara a volta de um resultado RGBA do processo trabalhador: pickle x memória compartilhada"""
+    print("▶ Transferência de resultados entre processos", flush=True)
+    for megapixels in args.resolutions:
+        size = megapixels_to_size(megapixels)
+        image = make_base(size, 'RGB').convert('RGBA')
+        pixels = size[0] * size[1]
+        params = {'megapixels': megapixels}
+
+        # Pickle: o que o pool faz com uma imagem (sem contar a cópia pelo pipe)
+        record(results, 'transfer_pickle', params,
+               time_stage(lambda: pickle.loads(pickle.dumps(image, pickle.HIGHEST_PROTOCOL)), args.repeat),
+               pixels, pixels * 4)
+
+        def shared_round_trip():
+            shared = share_image(image)
+            if shared is not None:
+                open_shared_image(shared)
+        record(results, 'transfer_shared_memory', params,
+               time_stage(shared_round_trip, args.repeat), pixels, pixels * 4)
+
+
+def bench_batch(args: argparse.Namespace, results: List[Dict]):
+    """Mede o lote completo (decode → overlay → texto → encode) no BatchEngine"""
+    size = megapixels_to_size(args.batch_megapixels)
+    overlay_buffer = io.BytesIO()
+    make_overlay(size).save(overlay_buffer, 'PNG')
+
+    data = encode_source(make_base(size, 'RGB'))
+    tasks = [(f"img_{idx}.jpg", data) for idx in range(args.batch_size)]
+    pixels = size[0] * size[1] * len(tasks)
+
+    print(f"▶ Lote completo: {len(tasks)} imagens de {size[0]}x{size[1]}", flush=True)
+    for workers in sorted({1, args.workers}):
+        engine = BatchEngine(overlay_buffer.getvalue(), text_config=TEXT_CONFIG, workers=workers,
+                             output_format='webp', quality=args.quality)
+        stats = time_stage(lambda: list(engine.run(tasks)), max(1, args.repeat // 2))
+        record(results, 'batch_end_to_end', {'megapixels': args.batch_megapixels, 'workers': workers},
+               stats, pixels, len(data) * len(tasks), images=len(tasks))
+        results[-1]['peak_rss_children_mb'] = peak_rss_mb(children=True)
+
+
+# ==================== RELATÓRIO ====================
+
+def git_commit() -> Optional[str]:
+    """Commit atual (para comparar resultados entre versões)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def result_key(entry: Dict) -> Tuple:
+    """Identifica a mesma medição em dois relatórios"""
+    keys = ('stage', 'megapixels', 'mode', 'format', 'workers', 'target', 'strategy')
+    return tuple((key, entry[key]) for key in keys if key in entry)
+
+
+def compare(previous_path: str, results: List[Dict]):
+    """Mostra a variação de tempo em relação a um relatório anterior"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = {result_key(entry): entry for entry in json.load(f)['results']}
+
+    print(f"\n📊 Comparação com {previous_path} (negativo = mais rápido)")
+    for entry in results:
+        old = previous.get(result_key(entry))
+        if old:
+            change = (entry['median_s'] / max(old['median_s'], 1e-9) - 1) * 100
+            label = ' '.join(f"{key}={value}" for key, value in result_key(entry))
+            print(f"  {label:<60} {change:+7.1f}%")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark por etapa do processamento de imagens")
+    parser.add_argument('--resolutions', type=float, nargs='+', help="Megapixels (padrão: 1 6 12 24 50)")
+    parser.add_argument('--modes', nargs='+', default=DEFAULT_MODES, choices=DEFAULT_MODES)
+    parser.add_argument('--formats', nargs='+', default=DEFAULT_FORMATS, choices=DEFAULT_FORMATS)
+    parser.add_argument('--quality', type=int, default=95)
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições por medição (usa a mediana)")
+    parser.add_argument('--batch-size', type=int, default=16, help="Imagens no ZIP e no lote completo")
+    parser.add_argument('--batch-megapixels', type=float, default=6)
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--quick', action='store_true', help="Só resoluções pequenas (1 e 6 MP)")
+    parser.add_argument('--output', help="Arquivo JSON de saída")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    if not args.resolutions:
+        args.resolutions = QUICK_RESOLUTIONS if args.quick else DEFAULT_RESOLUTIONS
+
+    processor = ImageProcessor()
+    results: List[Dict] = []
+
+    bench_stages(processor, args, results)
+    bench_zip(processor, args, results)
+    bench_vectorized(processor, args, results)
+    bench_resize(args, results)
+    bench_transfer(args, results)
+    bench_batch(args, results)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        },
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados salvos em {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
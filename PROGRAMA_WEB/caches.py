@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHES EM MEMÓRIA
+Cache LRU limitado por orçamento de memória, compartilhado entre preview e lote
+e, no servidor, entre todas as sessões do mesmo processo
+"""
+
+import hashlib
+import itertools
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from PIL import Image
+
+# Orçamento somado de todos os caches em memória do processo (IMAGE_LAYER_MEMORY_CACHE_MB)
+PROCESS_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_LAYER_MEMORY_CACHE_MB', 384)) * 1024 * 1024
+
+# Relógio de uso comum a todos os caches: compara itens de caches diferentes
+_ticks = itertools.count()
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Memória aproximada ocupada pelos pixels de uma imagem"""
+    return image.width * image.height * len(image.getbands())
+
+
+# Impressões digitais já calculadas: id(imagem) -> (referência fraca, hash)
+# (Image não é hashable, então não dá para usar WeakKeyDictionary)
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def _forget_fingerprint(image_id: int) -> None:
+    with _fingerprints_lock:
+        _fingerprints.pop(image_id, None)
+
+
+def image_fingerprint(image: Image.Image) -> str:
+    """
+    Identidade de uma imagem pelo conteúdo dos pixels
+
+    O hash é calculado uma única vez por objeto: reutilizar o mesmo overlay no
+    lote inteiro custa só uma consulta ao dicionário.
+
+    Args:
+        image: Imagem PIL
+
+    Returns:
+        Hash hexadecimal (modo + tamanho + pixels)
+    """
+    image_id = id(image)
+    with _fingerprints_lock:
+        entry = _fingerprints.get(image_id)
+    if entry is not None and entry[0]() is image:
+        return entry[1]
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    digest.update(image.tobytes())
+    fingerprint = digest.hexdigest()
+
+    ref = weakref.ref(image, lambda _ref, image_id=image_id: _forget_fingerprint(image_id))
+    with _fingerprints_lock:
+        _fingerprints[image_id] = (ref, fingerprint)
+    return fingerprint
+
+
+class MemoryBudget:
+    """
+    Orçamento de memória comum a vários BoundedLRUCache
+
+    Cada cache mantém o próprio limite; o orçamento limita a soma. Ao estourar,
+    sai o item usado há mais tempo entre todos os caches registrados, seja
+    um overlay compilado, um overlay redimensionado ou um texto.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Limite da soma dos caches registrados
+        """
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._caches: List['BoundedLRUCache'] = []
+        self._lock = threading.Lock()
+
+    def register(self, cache: 'BoundedLRUCache') -> None:
+        with self._lock:
+            self._caches.append(cache)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(cache.nbytes for cache in self._caches)
+
+    def enforce(self) -> None:
+        """Descarta os itens usados há mais tempo (em qualquer cache) até a soma caber"""
+        with self._lock:
+            # Os caches chamam depois de soltar o próprio lock: aqui cada um é
+            # travado sozinho, sempre depois deste lock (sem risco de deadlock)
+            total = self.nbytes
+            while total > self.max_bytes:
+                oldest = None
+                for cache in self._caches:
+                    tick = cache._oldest_tick()
+                    if tick is not None and (oldest is None or tick < oldest[0]):
+                        oldest = (tick, cache)
+                if oldest is None:
+                    break
+                total -= oldest[1]._evict_oldest()
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Ocupação somada dos caches registrados"""
+        with self._lock:
+            return {
+                'entries': sum(len(cache) for cache in self._caches),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+class BoundedLRUCache:
+    """Cache LRU thread-safe com limite de memória (bytes) e contadores de acerto"""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = image_nbytes,
+                 budget: Optional[MemoryBudget] = None):
+        """
+        Args:
+            max_bytes: Orçamento de memória do cache
+            sizeof: Função que estima o tamanho de um valor em bytes
+            budget: Orçamento comum a outros caches (ex.: process_budget)
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # chave -> (valor, bytes, último uso)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if budget is not None:
+            budget.register(self)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna o valor (marcando como usado recentemente) ou None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._items[key] = (item[0], item[1], next(_ticks))
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Armazena o valor, descartando os menos usados se passar do orçamento"""
+        nbytes = self.sizeof(value)
+        if nbytes > self.max_bytes:
+            return  # Maior que o cache inteiro: não vale a pena guardar
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, nbytes, next(_ticks))
+            self._bytes += nbytes
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes, _) = self._items.popitem(last=False)
+                self._bytes -= evicted_bytes
+
+        if self.budget is not None:
+            self.budget.enforce()
+
+    def _oldest_tick(self) -> Optional[int]:
+        """Último uso do item menos recente (None se vazio)"""
+        with self._lock:
+            if not self._items:
+                return None
+            return next(iter(self._items.values()))[2]
+
+    def _evict_oldest(self) -> int:
+        """Descarta o item menos recente; devolve os bytes liberados"""
+        with self._lock:
+            if not self._items:
+                return 0
+            _, (_, evicted_bytes, _) = self._items.popitem(last=False)
+            self._bytes -= evicted_bytes
+            return evicted_bytes
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Retorna o valor em cache ou cria com factory() e armazena"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Esvazia o cache (contadores são mantidos)"""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Contadores de uso do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+# ⚡ Orçamento único dos caches do processo: no servidor, todas as sessões
+# dividem os mesmos overlays, textos e miniaturas dentro deste limite
+process_budget = MemoryBudget(PROCESS_CACHE_MAX_BYTES)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OVERLAY COMPILADO
+Tudo o que depende só do overlay é calculado uma vez por upload: pixels RGBA,
+versão pré-multiplicada (para redimensionar), bbox do alpha, classificação,
+hash do conteúdo e plano de regiões no tamanho original
+"""
+
+import copy
+import io
+import threading
+from typing import Optional, Tuple, Union
+
+from PIL import Image
+from caches import image_fingerprint
+from overlay_analysis import OverlayPlan, analyze_overlay
+from resize_strategy import resize
+
+# Classificações do overlay pelo canal alpha
+OPAQUE = 'opaque'  # Alpha 255 em todo o quadro: cobre a base inteira
+TRANSPARENT = 'transparent'  # Alpha 0 em todo o quadro: não altera a base
+FRAME = 'frame'  # Miolo transparente (moldura): só as bordas são compostas
+PARTIAL = 'partial'  # Demais casos (ex.: marca d'água semitransparente)
+
+
+class CompiledOverlay:
+    """Overlay RGBA com as conversões e análises que o lote inteiro reaproveita"""
+
+    def __init__(self, image: Image.Image):
+        """
+        Args:
+            image: Overlay em qualquer modo (convertido para RGBA)
+        """
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        image.load()
+
+        self.image = image
+        self.key = image_fingerprint(image)  # Hash do conteúdo (chave dos caches)
+
+        alpha = image.getchannel('A')
+        self.alpha_extrema: Tuple[int, int] = alpha.getextrema()
+        self.alpha_bbox: Optional[Tuple[int, int, int, int]] = alpha.getbbox()  # None = tudo transparente
+        self.plan: OverlayPlan = analyze_overlay(image)
+
+        # Miolo = terço central do quadro
+        width, height = image.size
+        center = (width // 3, height // 3, max(width * 2 // 3, width // 3 + 1), max(height * 2 // 3, height // 3 + 1))
+        self._center_transparent = alpha.crop(center).getextrema()[1] == 0
+
+        self._premultiplied: Optional[Image.Image] = None
+        self._buffer_owner = None  # Ex.: memória compartilhada de onde vêm os pixels (attach)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, source: Union[str, bytes, io.IOBase]) -> 'CompiledOverlay':
+        """Compila o overlay a partir de caminho, bytes ou arquivo"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        elif hasattr(source, 'seek'):
+            source.seek(0)
+        return cls(Image.open(source))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    @property
+    def width(self) -> int:
+        return self.image.width
+
+    @property
+    def height(self) -> int:
+        return self.image.height
+
+    @property
+    def is_opaque(self) -> bool:
+        return self.alpha_extrema[0] == 255
+
+    @property
+    def is_transparent(self) -> bool:
+        return self.alpha_extrema[1] == 0
+
+    @property
+    def has_transparent_interior(self) -> bool:
+        """Miolo totalmente transparente (moldura)?"""
+        return self._center_transparent and not self.is_transparent
+
+    @property
+    def classification(self) -> str:
+        if self.is_opaque:
+            return OPAQUE
+        if self.is_transparent:
+            return TRANSPARENT
+        if self.has_transparent_interior:
+            return FRAME
+        return PARTIAL
+
+    @property
+    def premultiplied(self) -> Image.Image:
+        """Pixels em 'RGBa' (cor já multiplicada pelo alpha), gerados no primeiro uso"""
+        with self._lock:
+            if self._premultiplied is None:
+                self._premultiplied = self.image.convert('RGBa')
+            return self._premultiplied
+
+    def resized(self, size: Tuple[int, int], strategy: Optional[str] = None) -> Image.Image:
+        """
+        Overlay redimensionado (LANCZOS direto, ou em dois estágios conforme a estratégia)
+
+        ⚡ Image.resize converte RGBA para 'RGBa' e de volta a cada chamada; partindo
+        da versão pré-multiplicada guardada, só a volta é feita (resultado idêntico)
+
+        Args:
+            size: Tamanho de destino (largura, altura)
+            strategy: Nome da estratégia de resize_strategy.py (None = padrão)
+
+        Returns:
+            Overlay RGBA no tamanho pedido
+        """
+        if size == self.size:
+            return self.image
+        return resize(self.premultiplied, size, strategy).convert('RGBA')
+
+    def detached(self) -> 'CompiledOverlay':
+        """Cópia só com a análise, sem pixels (para enviar a outro processo e usar attach)"""
+        clone = copy.copy(self)
+        clone.image = None
+        clone._premultiplied = None
+        clone._buffer_owner = None
+        clone._lock = threading.Lock()
+        return clone
+
+    def attach(self, image: Image.Image, buffer_owner=None) -> 'CompiledOverlay':
+        """
+        Associa os pixels a uma cópia de detached() (ex.: mapeados de memória compartilhada)
+
+        Args:
+            image: Overlay RGBA com o mesmo conteúdo do compilado
+            buffer_owner: Objeto dono da memória da imagem (mantido vivo junto com o overlay)
+
+        Returns:
+            O próprio overlay
+        """
+        self.image = image
+        self._buffer_owner = buffer_owner
+        return self
+
+    def __getstate__(self):
+        # O lock não é serializável (ex.: envio para outro processo)
+        state = self.__dict__.copy()
+        del state['_lock']
+        state.pop('_buffer_owner', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """Memória aproximada (pixels RGBA + versão pré-multiplicada, se gerada)"""
+        pixels = self.width * self.height * 4
+        return pixels * (2 if self._premultiplied is not None else 1)
+
+    def __repr__(self) -> str:
+        return f"CompiledOverlay({self.width}x{self.height}, {self.classification}, {self.key[:8]})"
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHE DE GLIFOS
+Cada caractere é rasterizado uma vez por (fonte, tamanho); rótulos diferentes
+(SKU, preço, nome do arquivo) são montados colando os glifos guardados.
+O resultado é idêntico ao ImageDraw.text no layout básico do FreeType (sem
+raqm): mesmas posições, e a colagem com máscara sobrepõe glifos vizinhos com
+a mesma conta que o FreeType usa.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+from caches import BoundedLRUCache
+
+# Orçamento de memória dos glifos rasterizados (todas as fontes e tamanhos)
+GLYPH_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Avanços guardados por fonte (pares de caracteres, por causa do kerning)
+ADVANCE_CACHE_MAX_ENTRIES = 4096
+
+
+@dataclass
+class Glyph:
+    """Máscara L de um caractere e sua posição em relação à origem do texto"""
+    mask: Optional[Image.Image]  # None = sem tinta (ex.: espaço)
+    offset: Tuple[int, int]
+
+    @property
+    def nbytes(self) -> int:
+        return self.mask.width * self.mask.height if self.mask is not None else 0
+
+
+def supports_glyph_cache(font) -> bool:
+    """A fonte pode ser montada por glifos? (TrueType com layout básico; raqm faz shaping)"""
+    return isinstance(font, ImageFont.FreeTypeFont) and font.layout_engine == ImageFont.Layout.BASIC
+
+
+class GlyphRenderer:
+    """Desenha textos de uma fonte (em um tamanho) a partir de glifos em cache"""
+
+    def __init__(self, font: ImageFont.FreeTypeFont, font_key: Hashable, cache: BoundedLRUCache):
+        """
+        Args:
+            font: Fonte já carregada no tamanho desejado
+            font_key: Identidade da fonte nas chaves do cache (ex.: (caminho, tamanho))
+            cache: Cache dos glifos (compartilhado entre fontes)
+        """
+        self.font = font
+        self.font_key = font_key
+        self.cache = cache
+        self._advances: Dict[str, float] = {}
+
+    def glyph(self, char: str) -> Glyph:
+        """Glifo do caractere (rasterizado só na primeira vez)"""
+        key = (self.font_key, char)
+        glyph = self.cache.get(key)
+        if glyph is None:
+            glyph = self._render(char)
+            self.cache.put(key, glyph)
+        return glyph
+
+    def _render(self, char: str) -> Glyph:
+        # getbbox dá o tamanho e a posição exatos da máscara que o draw.text usaria
+        left, top, right, bottom = self.font.getbbox(char)
+        if right <= left or bottom <= top:
+            return Glyph(None, (left, top))
+        mask = Image.new('L', (right - left, bottom - top))
+        ImageDraw.Draw(mask).text((-left, -top), char, font=self.font, fill=255)
+        return Glyph(mask, (left, top))
+
+    def advance(self, pair: str) -> float:
+        """Avanço do primeiro caractere do par, já com o kerning em relação ao segundo"""
+        advance = self._advances.get(pair)
+        if advance is None:
+            advance = self.font.getlength(pair) - self.font.getlength(pair[1:])
+            if len(self._advances) >= ADVANCE_CACHE_MAX_ENTRIES:
+                self._advances.clear()
+            self._advances[pair] = advance
+        return advance
+
+    def draw(self, target: Image.Image, xy: Tuple[int, int], text: str) -> None:
+        """
+        Desenha o texto (tinta 255) em uma máscara L, como draw.text(xy, text, fill=255)
+
+        Args:
+            target: Máscara L de destino
+            xy: Origem do texto (inteira)
+            text: Uma linha de texto
+        """
+        x, y = xy
+        pen = 0.0  # Posição em pixels fracionários (múltiplos de 1/64, exatos em float)
+        for i, char in enumerate(text):
+            glyph = self.glyph(char)
+            if glyph.mask is not None:
+                # ⚡ Colar 255 pela máscara: onde glifos se sobrepõem, soma como o FreeType
+                target.paste(255, (x + math.floor(pen + 0.5) + glyph.offset[0], y + glyph.offset[1]), glyph.mask)
+            pen += self.advance(text[i:i + 2])
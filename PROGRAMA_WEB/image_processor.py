@@ -5,10 +5,108 @@ MÓDULO DE PROCESSAMENTO DE IMAGENS
 Funções para aplicar overlays, texto e salvar imagens com qualidade controlada
 """
 
+import hashlib
+import io
 import os
+import threading
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
-from typing import Optional, Dict, List
+from dataclasses import dataclass
+from typing import Callable, Optional, Dict, List, Tuple, Union
+from caches import BoundedLRUCache, image_fingerprint, image_nbytes, process_budget
+from compiled_overlay import CompiledOverlay
+from glyph_cache import GLYPH_CACHE_MAX_BYTES, GlyphRenderer, supports_glyph_cache
+from overlay_analysis import OverlayPlan, analyze_overlay, composite_with_plan
+from resize_strategy import DEFAULT_RESIZE_STRATEGY, get_strategy, resize
+from stage_timings import StageTimings, measure
+from vector_composite import composite_stack
+
+# Orçamento de memória do cache de overlays redimensionados
+OVERLAY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Orçamento de memória do cache de textos renderizados
+TEXT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Orçamento de memória do cache de análises de overlay
+PLAN_CACHE_MAX_BYTES = 4 * 1024 * 1024
+
+# Orçamento de memória das bases já reduzidas para o preview
+PREVIEW_BASE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Orçamento de memória dos overlays compilados (imagens PIL ou arquivos enviados)
+COMPILED_OVERLAY_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Maior lado das miniaturas guardadas junto com resultados comprimidos
+THUMBNAIL_SIZE = 256
+
+# Maior lado da imagem de preview (resolução de exibição)
+PREVIEW_MAX_SIDE = 1000
+
+# Modos aceitos por Image.reduce (P, 1, I;16... são convertidos antes da redução)
+REDUCE_MODES = {'L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK'}
+
+# Distância do texto até a borda e folga do fundo atrás do texto (pixels)
+TEXT_MARGIN = 20
+TEXT_BG_PADDING = 15
+
+# Perfis de codificação (entram na chave do cache de resultados). Mudar os parâmetros
+# de _encode_prepared ou _save_prepared exige mudar a versão do perfil correspondente
+ENCODE_PROFILE = 'encode-1'  # Interface: PNG compress_level=6, WEBP method=4, JPEG 4:2:0
+SAVE_PROFILE = 'save-1'  # Arquivos gravados (CLI): PNG optimize, WEBP method=6, JPEG 4:4:4 + optimize
+
+# Busca de qualidade para caber em um tamanho máximo de arquivo (WEBP/JPG)
+ENCODE_MIN_QUALITY = 10  # Abaixo disso a imagem fica inaceitável: entregar acima do limite
+ENCODE_SEARCH_MAX_STEPS = 8  # Máximo de codificações por imagem (busca binária em 1-100)
+
+
+@dataclass
+class TextSprite:
+    """Texto pronto para colar: fonte carregada, medida e camada RGBA com fundo"""
+    font: ImageFont.FreeTypeFont
+    bbox: Tuple[int, int, int, int]  # textbbox relativo ao ponto (0, 0)
+    image: Image.Image  # Camada RGBA com fundo + texto
+    offset: Tuple[int, int]  # Posição da camada em relação ao ponto (x, y) do texto
+
+    @property
+    def text_size(self) -> Tuple[int, int]:
+        return self.bbox[2] - self.bbox[0], self.bbox[3] - self.bbox[1]
+
+
+@dataclass
+class EncodedImage:
+    """Resultado guardado já comprimido (bytes do arquivo final + miniatura)"""
+    data: bytes  # Arquivo codificado no formato de saída
+    format_ext: str  # 'webp', 'png' ou 'jpg'
+    quality: int
+    size: Tuple[int, int]  # Tamanho da imagem completa
+    thumbnail: Optional[bytes] = None  # Miniatura WEBP para a galeria (None = gerar quando exibir)
+    max_bytes: Optional[int] = None  # Limite de tamanho pedido (None = sem limite)
+    encoded_quality: Optional[int] = None  # Qualidade usada de fato com limite (None = desconhecida)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + len(self.thumbnail or b'')
+
+    def matches(self, format_ext: str, quality: int, max_bytes: Optional[int] = None) -> bool:
+        """Foi codificado com estas configurações? (então os bytes servem como estão)"""
+        return (self.format_ext, self.quality, self.max_bytes) == (format_ext, quality, max_bytes)
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes,
+        format_ext: str,
+        quality: int,
+        max_bytes: Optional[int] = None
+    ) -> 'EncodedImage':
+        """Resultado a partir de um arquivo já codificado (só lê o cabeçalho)"""
+        with Image.open(io.BytesIO(data)) as img:
+            size = img.size
+        return cls(data, format_ext, quality, size, max_bytes=max_bytes)
+
+    def to_image(self) -> Image.Image:
+        """Decodifica a imagem completa (ex.: para recodificar em outro formato)"""
+        return Image.open(io.BytesIO(self.data))
 
 
 class ImageProcessor:
@@ -17,13 +115,70 @@ class ImageProcessor:
     # Formatos suportados
     SUPPORTED_FORMATS = {'.png', '.jpg', '.jpeg', '.webp'}
 
-    def __init__(self):
-        """Inicializa o processador"""
+    # ⚡ Overlays redimensionados, compartilhados por todas as instâncias
+    # (preview e lote) do mesmo processo. Chave: (hash do overlay, tamanho, estratégia)
+    overlay_cache = BoundedLRUCache(OVERLAY_CACHE_MAX_BYTES, budget=process_budget)
+
+    # ⚡ Textos já medidos e renderizados. Chave: (fonte, tamanho, texto, estilo)
+    text_cache = BoundedLRUCache(
+        TEXT_CACHE_MAX_BYTES, sizeof=lambda sprite: image_nbytes(sprite.image), budget=process_budget
+    )
+
+    # ⚡ Análises de regiões dos overlays. Chave: (hash do overlay, tamanho, estratégia)
+    plan_cache = BoundedLRUCache(PLAN_CACHE_MAX_BYTES, sizeof=lambda plan: plan.nbytes, budget=process_budget)
+
+    # ⚡ Overlays compilados. Chave: hash dos pixels (Image) ou ('file', hash do arquivo):
+    # sessões que enviam a mesma moldura dividem uma única cópia
+    compiled_overlay_cache = BoundedLRUCache(
+        COMPILED_OVERLAY_CACHE_MAX_BYTES, sizeof=lambda compiled: compiled.nbytes, budget=process_budget
+    )
+
+    # ⚡ Glifos rasterizados: rótulos diferentes são montados sem rasterizar de novo.
+    # Chave: ((caminho da fonte, tamanho), caractere)
+    glyph_cache = BoundedLRUCache(GLYPH_CACHE_MAX_BYTES, sizeof=lambda glyph: glyph.nbytes, budget=process_budget)
+
+    # ⚡ Bases do preview já decodificadas e reduzidas: mudar texto/overlay ou voltar a
+    # uma imagem não decodifica o arquivo de novo (PNG/WEBP não têm decodificação reduzida).
+    # Chave: (identidade do arquivo, tamanho do preview, modo "cover")
+    preview_base_cache = BoundedLRUCache(PREVIEW_BASE_CACHE_MAX_BYTES, budget=process_budget)
+
+    # Fontes carregadas. Chave: (caminho da fonte, tamanho)
+    _fonts = {}
+
+    # Montadores de texto por glifos. Chave: (caminho da fonte, tamanho)
+    _glyph_renderers = {}
+
+    # Fonte padrão do sistema, procurada uma vez por processo
+    _default_font_path: Optional[str] = None
+    _default_font_searched = False
+    _default_font_lock = threading.Lock()
+
+    def __init__(self, resize_strategy: str = DEFAULT_RESIZE_STRATEGY):
+        """
+        Inicializa o processador
+
+        Args:
+            resize_strategy: Redimensionamento de overlays e bases (ver resize_strategy.py)
+        """
+        self.resize_strategy = get_strategy(resize_strategy).name
         self.default_font = None
         self.load_default_font()
 
     def load_default_font(self):
-        """Carrega fonte padrão para texto"""
+        """
+        Carrega fonte padrão para texto
+        ⚡ A busca no disco (e a mensagem no console) acontece uma vez por processo
+        """
+        with ImageProcessor._default_font_lock:
+            if not ImageProcessor._default_font_searched:
+                ImageProcessor._default_font_path = self._find_default_font()
+                ImageProcessor._default_font_searched = True
+        self.default_font = ImageProcessor._default_font_path
+
+    @staticmethod
+    def _find_default_font() -> Optional[str]:
+        """Primeira fonte TTF conhecida que existe no sistema"""
+        default_font = None
         try:
             # Tentar carregar fonte do sistema
             if os.name == 'nt':  # Windows
@@ -46,17 +201,59 @@ class ImageProcessor:
 
             for font_path in font_paths:
                 if os.path.exists(font_path):
-                    self.default_font = font_path
+                    default_font = font_path
                     print(f"✅ Fonte carregada: {font_path}")
                     break
 
             # Se nenhuma fonte foi encontrada, não é erro crítico
-            if not self.default_font:
+            if not default_font:
                 print("⚠️ Nenhuma fonte TTF encontrada. Usando fonte padrão do PIL.")
 
         except Exception as e:
             print(f"⚠️ Aviso: Não foi possível carregar fonte padrão: {e}")
 
+        return default_font
+
+    def get_font(self, font_size: int):
+        """
+        Retorna a fonte no tamanho pedido, carregando do disco só na primeira vez
+
+        Args:
+            font_size: Tamanho da fonte
+
+        Returns:
+            Fonte PIL (TrueType ou padrão)
+        """
+        key = (self.default_font, font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            try:
+                if self.default_font:
+                    font = ImageFont.truetype(self.default_font, font_size)
+                else:
+                    font = ImageFont.load_default()
+            except:
+                font = ImageFont.load_default()
+            self._fonts[key] = font
+        return font
+
+    def get_glyph_renderer(self, font_size: int) -> Optional[GlyphRenderer]:
+        """
+        Montador de texto por glifos em cache para a fonte no tamanho pedido
+
+        Returns:
+            GlyphRenderer, ou None se a fonte não permite (fonte bitmap ou layout raqm)
+        """
+        key = (self.default_font, font_size)
+        renderer = self._glyph_renderers.get(key)
+        if renderer is None:
+            font = self.get_font(font_size)
+            if not supports_glyph_cache(font):
+                return None
+            renderer = GlyphRenderer(font, key, self.glyph_cache)
+            self._glyph_renderers[key] = renderer
+        return renderer
+
     def get_image_files(self, folder: str) -> List[str]:
         """
         Retorna lista de arquivos de imagem em uma pasta
@@ -86,7 +283,7 @@ class ImageProcessor:
     def process_image(
         self,
         base_image_path: str,
-        overlay_path: str,
+        overlay_path: Union[str, CompiledOverlay],
         text_config: Optional[Dict] = None,
         keep_overlay_size: bool = False
     ) -> Image.Image:
@@ -95,47 +292,298 @@ class ImageProcessor:
 
         Args:
             base_image_path: Caminho da imagem base
-            overlay_path: Caminho do overlay/moldura
+            overlay_path: Caminho do overlay/moldura ou overlay já compilado
             text_config: Configurações de texto (opcional)
 
         Returns:
             Imagem processada
         """
-        # Carregar imagem base
-        base = Image.open(base_image_path)
+        overlay = self.compile_overlay(overlay_path)
+        return self.process_source(base_image_path, overlay, text_config, keep_overlay_size)
+
+    def compile_overlay(
+        self,
+        overlay: Union[CompiledOverlay, Image.Image, str, bytes, io.IOBase],
+        content_key: Optional[str] = None
+    ) -> CompiledOverlay:
+        """
+        Overlay compilado (RGBA, pré-multiplicado, bbox do alpha, classificação, hash)
+
+        ⚡ Compilar uma vez por upload e passar o CompiledOverlay adiante. Imagens
+        PIL, caminhos, bytes e arquivos também são aceitos: a compilação fica no cache do
+        processo pelo hash dos pixels ou do arquivo, e sessões diferentes que
+        enviam o mesmo overlay recebem o mesmo objeto (não modificar).
 
-        # Aplicar overlay
-        overlay = Image.open(overlay_path)
-        result = self.apply_overlay(base, overlay, keep_overlay_size)
+        Args:
+            overlay: CompiledOverlay, imagem PIL, caminho, bytes ou arquivo
+            content_key: content_digest() do arquivo, se já calculado
+
+        Returns:
+            CompiledOverlay
+        """
+        if isinstance(overlay, CompiledOverlay):
+            return overlay
+        if isinstance(overlay, Image.Image):
+            return self.compiled_overlay_cache.get_or_create(
+                image_fingerprint(overlay),
+                lambda: CompiledOverlay(overlay)
+            )
+        if isinstance(overlay, (str, os.PathLike)):
+            # Caminho: mesma entrada do cache que os bytes do arquivo (ler + hash
+            # custa bem menos que decodificar e analisar o overlay de novo)
+            with open(overlay, 'rb') as f:
+                overlay = f.read()
+
+        if content_key is None:
+            content_key = self.content_digest(self._read_bytes(overlay))
+        return self.compiled_overlay_cache.get_or_create(
+            ('file', content_key),
+            lambda: CompiledOverlay.open(overlay)
+        )
+
+    @staticmethod
+    def content_digest(data: bytes) -> str:
+        """Hash do conteúdo de um arquivo (identidade nos caches do processo)"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _read_bytes(source: Union[bytes, io.IOBase]) -> bytes:
+        """Conteúdo de bytes ou de um arquivo aberto (UploadedFile, BytesIO...)"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return bytes(source)
+        if hasattr(source, 'getvalue'):
+            return source.getvalue()
+        source.seek(0)
+        data = source.read()
+        source.seek(0)
+        return data
+
+    @classmethod
+    def _source_key(cls, source: Union[str, bytes, io.IOBase]) -> Tuple:
+        """Identidade de um arquivo de entrada nos caches (conteúdo; caminho + data para arquivos em disco)"""
+        if isinstance(source, (str, os.PathLike)):
+            stat = os.stat(source)
+            return 'path', os.fspath(source), stat.st_mtime_ns, stat.st_size
+        return 'data', cls.content_digest(cls._read_bytes(source))
+
+    @staticmethod
+    def open_image(source: Union[str, bytes, io.IOBase]) -> Image.Image:
+        """
+        Abre uma imagem a partir de caminho, bytes ou arquivo em memória
 
-        # Aplicar texto se configurado
-        if text_config:
-            result = self.add_text_overlay(result, text_config)
+        Args:
+            source: Caminho, conteúdo em bytes ou objeto de arquivo (ex.: UploadedFile)
+
+        Returns:
+            Imagem PIL (ainda não decodificada)
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return Image.open(io.BytesIO(source))
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return Image.open(source)
+
+    def process_source(
+        self,
+        source: Union[str, bytes, io.IOBase],
+        overlay: Union[CompiledOverlay, Image.Image],
+        text_config: Optional[Dict] = None,
+        keep_overlay_size: bool = False,
+        timings: Optional[StageTimings] = None
+    ) -> Image.Image:
+        """
+        Pipeline completo de uma imagem: decodificar → RGBA → overlay → texto
+
+        Args:
+            source: Imagem base (caminho, bytes ou arquivo)
+            overlay: Overlay compilado (ou imagem RGBA)
+            text_config: Configurações de texto (opcional)
+            keep_overlay_size: Manter resolução original do overlay
+            timings: Se informado, recebe o tempo de cada etapa e os bytes de entrada
+
+        Returns:
+            Imagem processada (RGBA)
+        """
+        base = self.load_base(source, overlay, keep_overlay_size, timings)
+        result = self.apply_overlay(base, overlay, keep_overlay_size, timings)
+
+        # Aplicar texto se configurado (o resultado do overlay é novo: pode desenhar nele)
+        if text_config and text_config.get('text', '').strip():
+            with measure(timings, 'text'):
+                result = self.add_text_overlay(result, text_config, in_place=True)
 
         return result
 
+    def load_base(
+        self,
+        source: Union[str, bytes, io.IOBase],
+        overlay: Union[CompiledOverlay, Image.Image],
+        keep_overlay_size: bool = False,
+        timings: Optional[StageTimings] = None
+    ) -> Image.Image:
+        """
+        Decodifica a imagem base e converte para RGBA (primeira metade de process_source)
+
+        Args:
+            source: Imagem base (caminho, bytes ou arquivo)
+            overlay: Overlay (define a escala de decodificação no modo "cover")
+            keep_overlay_size: Manter resolução original do overlay
+            timings: Se informado, recebe os tempos de 'decode' e 'convert'
+
+        Returns:
+            Imagem base em RGBA
+        """
+        if timings is not None:
+            timings.bytes_in = self.source_nbytes(source)
+
+        with measure(timings, 'decode'):
+            if keep_overlay_size:
+                # ⚡ Base vai ser reduzida ao tamanho do overlay: decodificar em escala menor
+                base = self.open_for_cover(source, overlay.size)
+            else:
+                base = self.open_image(source)
+                base.load()
+
+        # Converter para RGBA
+        with measure(timings, 'convert'):
+            if base.mode != 'RGBA':
+                base = base.convert('RGBA')
+
+        return base
+
+    @staticmethod
+    def source_nbytes(source: Union[str, bytes, io.IOBase]) -> int:
+        """Tamanho em bytes do arquivo de entrada (0 se não der para saber)"""
+        try:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                return len(source)
+            if isinstance(source, (str, os.PathLike)):
+                return os.path.getsize(source)
+            return getattr(source, 'size', 0) or 0
+        except OSError:
+            return 0
+
+    def render_preview(
+        self,
+        source: Union[str, bytes, io.IOBase],
+        overlay: Union[CompiledOverlay, Image.Image],
+        text_config: Optional[Dict] = None,
+        keep_overlay_size: bool = False,
+        max_side: int = PREVIEW_MAX_SIDE
+    ) -> Image.Image:
+        """
+        Resultado em resolução de exibição, sem processar a imagem em tamanho real
+
+        A base é decodificada em escala reduzida, o overlay vem redimensionado do
+        cache e texto/espaçamentos são escalados na mesma proporção.
+
+        Args:
+            source: Imagem base (caminho, bytes ou arquivo)
+            overlay: Overlay compilado (ou imagem RGBA)
+            text_config: Configurações de texto (opcional)
+            keep_overlay_size: Manter resolução original do overlay
+            max_side: Maior lado do preview (pixels)
+
+        Returns:
+            Imagem RGBA com no máximo max_side pixels no maior lado
+        """
+        base = self.open_image(source)
+
+        # Tamanho do resultado final e escala do preview
+        final_size = overlay.size if keep_overlay_size else base.size
+        scale = min(1.0, max_side / max(final_size))
+        if scale == 1.0:
+            return self.process_source(source, overlay, text_config, keep_overlay_size)
+
+        preview_size = (max(1, round(final_size[0] * scale)), max(1, round(final_size[1] * scale)))
+
+        # ⚡ Overlay na resolução do preview (cache compartilhado com o lote)
+        overlay_preview = self.resize_overlay(overlay, preview_size)
+
+        def decode_base() -> Image.Image:
+            # ⚡ Decodificar a base em escala reduzida
+            base = self.open_for_cover(source, preview_size)
+            if not keep_overlay_size:
+                # Sem "cover": a base define o tamanho, basta ajustar ao preview
+                base = base.resize(preview_size, Image.Resampling.BILINEAR)
+            if base.mode != 'RGBA':
+                base = base.convert('RGBA')
+            return base
+
+        key = (self._source_key(source), preview_size, keep_overlay_size)
+        base = self.preview_base_cache.get_or_create(key, decode_base)
+
+        result = self.apply_overlay(base, overlay_preview, keep_overlay_size)
+
+        if text_config and text_config.get('text', '').strip():
+            result = self.add_text_overlay(result, dict(text_config, scale=scale), in_place=True)
+
+        return result
+
+    def apply_overlay_stack(
+        self,
+        bases: List[Image.Image],
+        overlay: Union[CompiledOverlay, Image.Image],
+        timings: Optional[List[StageTimings]] = None
+    ) -> List[Image.Image]:
+        """
+        apply_overlay (sem manter a resolução do overlay) para várias bases de uma vez
+        ⚡ Bases do mesmo tamanho são compostas juntas em um array NumPy (sem NumPy,
+        uma a uma). As bases são modificadas: passar só imagens recém-decodificadas.
+
+        Args:
+            bases: Imagens base RGBA
+            overlay: Overlay compilado (ou imagem RGBA)
+            timings: Tempos de cada base (opcional); o tempo do grupo é dividido entre elas
+
+        Returns:
+            Imagens compostas, na mesma ordem
+        """
+        overlay = self.compile_overlay(overlay)
+        results = list(bases)
+        by_size: Dict[Tuple[int, int], List[int]] = {}
+        for idx, base in enumerate(bases):
+            by_size.setdefault(base.size, []).append(idx)
+
+        for size, indexes in by_size.items():
+            group_timings = StageTimings()
+            with group_timings.measure('resize'):
+                overlay_resized, plan = self.get_overlay_plan(overlay, size)
+            with group_timings.measure('composite'):
+                composed = composite_stack([bases[i] for i in indexes], overlay_resized, plan, in_place=True)
+
+            for idx, image in zip(indexes, composed):
+                results[idx] = image
+                if timings is not None:
+                    for stage, seconds in group_timings.stages.items():
+                        timings[idx].add(stage, seconds / len(indexes))
+
+        return results
+
     def apply_overlay(
         self,
         base_image: Image.Image,
-        overlay_image: Image.Image,
-        keep_original_size: bool = False
+        overlay_image: Union[CompiledOverlay, Image.Image],
+        keep_original_size: bool = False,
+        timings: Optional[StageTimings] = None
     ) -> Image.Image:
         """
         Combina base e overlay com opção de manter a resolução original do overlay.
-        ⚡ OTIMIZADO: Assume que imagens já estão em RGBA (convertidas antes do loop)
+        ⚡ OTIMIZADO: Assume que a base já está em RGBA (convertida antes do loop)
+        ⚡ OTIMIZADO: Com CompiledOverlay, hash/análise/conversões do overlay não se repetem
+        timings (opcional) recebe os tempos de 'resize' e 'composite'.
         """
         # ⚡ OTIMIZAÇÃO: Não fazer cópia se já está no formato correto
         base = base_image
-        overlay = overlay_image
+        overlay = self.compile_overlay(overlay_image)
 
         if not keep_original_size:
-            # Verificar se já está no tamanho correto (evita resize desnecessário)
-            if overlay.size == base.size:
-                return Image.alpha_composite(base, overlay)
-
-            # Usar LANCZOS para qualidade, mas com otimização
-            overlay_resized = overlay.resize(base.size, Image.Resampling.LANCZOS)
-            return Image.alpha_composite(base, overlay_resized)
+            # ⚡ OTIMIZAÇÃO: Overlay redimensionado vem do cache (1x por tamanho e estratégia)
+            # e só os blocos não transparentes são compostos
+            with measure(timings, 'resize'):
+                overlay_resized, plan = self.get_overlay_plan(overlay, base.size)
+            with measure(timings, 'composite'):
+                return composite_with_plan(base, overlay_resized, plan)
 
         # Manter resolução original do overlay SEM ACHATAR a imagem base
         # Usar comportamento "cover" - expande até preencher completamente
@@ -144,92 +592,170 @@ class ImageProcessor:
         canvas = Image.new('RGBA', overlay.size, (0, 0, 0, 0))
 
         # Calcular tamanho da base mantendo proporções (cover - preenche tudo)
-        base_ratio = base.width / base.height
-        overlay_ratio = overlay.width / overlay.height
+        # Se a base foi decodificada em escala reduzida, a proporção vem do tamanho original
+        new_width, new_height = self.cover_size(base.info.get('source_size', base.size), overlay.size)
+
+        # Redimensionar base mantendo proporções
+        with measure(timings, 'resize'):
+            base_resized = resize(base, (new_width, new_height), self.resize_strategy)
+            _, plan = self.get_overlay_plan(overlay, overlay.size)
 
-        if base_ratio > overlay_ratio:
+        with measure(timings, 'composite'):
+            # Centralizar base no canvas (pode cortar as bordas)
+            x_offset = (overlay.width - new_width) // 2
+            y_offset = (overlay.height - new_height) // 2
+            canvas.paste(base_resized, (x_offset, y_offset))
+
+            # Aplicar overlay por cima (canvas é nosso: compor direto nele)
+            return composite_with_plan(canvas, overlay.image, plan, in_place=True)
+
+    @staticmethod
+    def cover_size(base_size: Tuple[int, int], target_size: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Tamanho da base redimensionada para cobrir todo o alvo mantendo proporções
+
+        Args:
+            base_size: Tamanho original da base (largura, altura)
+            target_size: Tamanho do overlay/canvas (largura, altura)
+
+        Returns:
+            Tupla (largura, altura) da base redimensionada
+        """
+        base_ratio = base_size[0] / base_size[1]
+        target_ratio = target_size[0] / target_size[1]
+
+        if base_ratio > target_ratio:
             # Base é mais larga: ajustar pela ALTURA (para cobrir tudo)
-            new_height = overlay.height
-            new_width = int(overlay.height * base_ratio)
-        else:
-            # Base é mais alta: ajustar pela LARGURA (para cobrir tudo)
-            new_width = overlay.width
-            new_height = int(overlay.width / base_ratio)
+            return int(target_size[1] * base_ratio), target_size[1]
 
-        # Redimensionar base mantendo proporções
-        base_resized = base.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        # Base é mais alta: ajustar pela LARGURA (para cobrir tudo)
+        return target_size[0], int(target_size[0] / base_ratio)
 
-        # Centralizar base no canvas (pode cortar as bordas)
-        x_offset = (overlay.width - new_width) // 2
-        y_offset = (overlay.height - new_height) // 2
-        canvas.paste(base_resized, (x_offset, y_offset))
+    def open_for_cover(self, source: Union[str, bytes, io.IOBase], target_size: Tuple[int, int]) -> Image.Image:
+        """
+        Abre a base já na menor escala suficiente para o modo "cover"
 
-        # Aplicar overlay por cima
-        return Image.alpha_composite(canvas, overlay)
+        A geometria é calculada pelo cabeçalho (sem decodificar). JPEG usa
+        Image.draft (o decodificador pula os coeficientes de alta frequência);
+        os demais formatos usam Image.reduce por fator inteiro. O resultado
+        continua maior ou igual ao tamanho final, e o resize_strategy faz o ajuste fino.
 
-    def add_text_overlay(self, image: Image.Image, config: Dict) -> Image.Image:
+        Args:
+            source: Imagem base (caminho, bytes ou arquivo)
+            target_size: Tamanho do overlay/canvas
+
+        Returns:
+            Imagem decodificada (info['source_size'] guarda o tamanho original)
         """
-        Adiciona texto sobre a imagem
+        img = self.open_image(source)
+        source_size = img.size
+        needed = self.cover_size(source_size, target_size)
+
+        # ⚡ JPEG: decodificar direto em 1/2, 1/4 ou 1/8 quando possível
+        if img.format == 'JPEG':
+            img.draft(img.mode, needed)
+
+        img.load()
+
+        # ⚡ Demais formatos (ou JPEG ainda grande demais): redução inteira rápida
+        factor = min(img.width // max(needed[0], 1), img.height // max(needed[1], 1))
+        if factor >= 2:
+            if img.mode not in REDUCE_MODES:
+                # Paleta, bitmap e 16 bits: mesma conversão que a base teria depois
+                img = img.convert('RGBA')
+            img = img.reduce(factor)
+
+        img.info['source_size'] = source_size
+        return img
+
+    def resize_overlay(self, overlay: Union[CompiledOverlay, Image.Image], size: Tuple[int, int]) -> Image.Image:
+        """
+        Redimensiona o overlay (com resize_strategy) reaproveitando resultados anteriores
 
         Args:
-            image: Imagem PIL
-            config: Dicionário com configurações de texto
+            overlay: Overlay compilado (ou imagem RGBA)
+            size: Tamanho de destino (largura, altura)
 
         Returns:
-            Imagem com texto
+            Overlay no tamanho pedido (não modificar: é compartilhado pelo cache)
         """
-        # Criar cópia para não modificar original
-        img = image.copy()
+        compiled = self.compile_overlay(overlay)
+        if size == compiled.size:
+            return compiled.image
 
-        # Criar camada de desenho
-        txt_layer = Image.new('RGBA', img.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(txt_layer)
+        key = (compiled.key, size, self.resize_strategy)
+        return self.overlay_cache.get_or_create(key, lambda: compiled.resized(size, self.resize_strategy))
 
-        # Carregar fonte
-        font_size = config.get('size', 40)
-        try:
-            if self.default_font:
-                font = ImageFont.truetype(self.default_font, font_size)
-            else:
-                font = ImageFont.load_default()
-        except:
-            font = ImageFont.load_default()
+    def get_text_sprite(self, config: Dict) -> 'TextSprite':
+        """
+        Retorna o texto já medido e renderizado (com fundo), reaproveitando o cache
 
-        # Obter texto
+        Args:
+            config: Dicionário com configurações de texto
+
+        Returns:
+            TextSprite com fonte, bbox e camada RGBA pronta para colar
+        """
+        # 'scale' reduz texto e espaçamentos proporcionalmente (usado no preview)
+        scale = config.get('scale', 1.0)
+        font_size = max(1, round(config.get('size', 40) * scale))
+        bg_padding = round(TEXT_BG_PADDING * scale)
         text = config.get('text', '')
-        if not text:
-            return img
+        bg_enabled = config.get('bg_enabled', False)
+        style = (
+            config.get('color', '#FFFFFF'),
+            config.get('opacity', 100),
+            bg_enabled,
+            config.get('bg_color', '#000000') if bg_enabled else None,
+            config.get('bg_opacity', 70) if bg_enabled else None
+        )
+        key = (self.default_font, font_size, text, style, bg_padding)
+
+        sprite = self.text_cache.get(key)
+        if sprite is None:
+            sprite = self._render_text_sprite(text, font_size, config, bg_padding)
+            self.text_cache.put(key, sprite)
+        return sprite
+
+    def _render_text_sprite(
+        self,
+        text: str,
+        font_size: int,
+        config: Dict,
+        bg_padding: int = TEXT_BG_PADDING
+    ) -> 'TextSprite':
+        """Mede o texto e desenha texto + fundo em uma camada do tamanho do rótulo"""
+        # Carregar fonte (⚡ reaproveitada entre imagens)
+        font = self.get_font(font_size)
 
         # Calcular tamanho do texto
+        draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
         bbox = draw.textbbox((0, 0), text, font=font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
 
-        # Calcular posição
-        position = config.get('position', 'superior_direita')
-        padding = 20
+        # Área ocupada em relação ao ponto (x, y) do texto: tinta do texto + fundo
+        bg_enabled = config.get('bg_enabled', False)
+        left, top, right, bottom = bbox
+        if bg_enabled:
+            left = min(left, -bg_padding)
+            top = min(top, -bg_padding)
+            right = max(right, text_width + bg_padding + 1)
+            bottom = max(bottom, text_height + bg_padding + 1)
 
-        if position == 'superior_esquerda':
-            x = padding
-            y = padding
-        elif position == 'superior_direita':
-            x = img.width - text_width - padding
-            y = padding
-        elif position == 'inferior_esquerda':
-            x = padding
-            y = img.height - text_height - padding
-        elif position == 'inferior_direita':
-            x = img.width - text_width - padding
-            y = img.height - text_height - padding
-        elif position == 'centro':
-            x = (img.width - text_width) // 2
-            y = (img.height - text_height) // 2
-        else:
-            x = padding
-            y = padding
+        # Margem de segurança para antialiasing
+        margin = 2
+        left, top = left - margin, top - margin
+        right, bottom = right + margin, bottom + margin
+
+        layer = Image.new('RGBA', (right - left, bottom - top), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(layer)
+
+        # Origem do texto dentro da camada
+        x, y = -left, -top
 
         # Desenhar fundo se habilitado
-        if config.get('bg_enabled', False):
+        if bg_enabled:
             bg_color = config.get('bg_color', '#000000')
             bg_opacity = config.get('bg_opacity', 70)
 
@@ -238,7 +764,6 @@ class ImageProcessor:
             bg_alpha = int(255 * (bg_opacity / 100))
 
             # Adicionar padding ao fundo
-            bg_padding = 15
             bg_rect = [
                 x - bg_padding,
                 y - bg_padding,
@@ -256,12 +781,111 @@ class ImageProcessor:
         text_rgb = self.hex_to_rgb(text_color)
         text_alpha = int(255 * (text_opacity / 100))
 
-        draw.text((x, y), text, font=font, fill=(*text_rgb, text_alpha))
+        glyphs = self.get_glyph_renderer(font_size) if '\n' not in text else None
+        if glyphs is not None:
+            # ⚡ Texto montado com glifos já rasterizados (idêntico ao draw.text): com
+            # milhares de rótulos diferentes cada caractere é rasterizado uma vez só
+            mask = Image.new('L', layer.size)
+            glyphs.draw(mask, (x, y), text)
+            layer.paste((*text_rgb, text_alpha), (0, 0), mask)
+        else:
+            draw.text((x, y), text, font=font, fill=(*text_rgb, text_alpha))
 
-        # Combinar com imagem original
-        result = Image.alpha_composite(img, txt_layer)
+        return TextSprite(font, bbox, layer, (left, top))
 
-        return result
+    def get_overlay_plan(
+        self,
+        overlay: Union[CompiledOverlay, Image.Image],
+        size: Tuple[int, int]
+    ) -> Tuple[Image.Image, OverlayPlan]:
+        """
+        Overlay no tamanho pedido + análise de regiões transparentes/opacas
+
+        A análise é feita uma vez por (overlay, tamanho) e fica em cache.
+
+        Args:
+            overlay: Overlay compilado (ou imagem RGBA)
+            size: Tamanho final (largura, altura)
+
+        Returns:
+            Tupla (overlay no tamanho pedido, OverlayPlan)
+        """
+        compiled = self.compile_overlay(overlay)
+        if compiled.size == size:
+            # Tamanho original: análise já feita na compilação
+            return compiled.image, compiled.plan
+
+        overlay_sized = self.resize_overlay(compiled, size)
+        key = (compiled.key, size, self.resize_strategy)
+        plan = self.plan_cache.get_or_create(key, lambda: analyze_overlay(overlay_sized))
+        return overlay_sized, plan
+
+    def add_text_overlay(self, image: Image.Image, config: Dict, in_place: bool = False) -> Image.Image:
+        """
+        Adiciona texto sobre a imagem
+
+        Args:
+            image: Imagem PIL (RGBA)
+            config: Dicionário com configurações de texto
+            in_place: Desenhar direto na imagem recebida, sem cópia
+
+        Returns:
+            Imagem com texto
+        """
+        # Criar cópia para não modificar original (única alocação do tamanho da imagem)
+        img = image if in_place else image.copy()
+
+        # Obter texto
+        text = config.get('text', '')
+        if not text:
+            return img
+
+        # ⚡ OTIMIZAÇÃO: Fonte, medida e desenho do texto vêm do cache
+        sprite = self.get_text_sprite(config)
+        text_width, text_height = sprite.text_size
+
+        # Calcular posição
+        position = config.get('position', 'superior_direita')
+        padding = round(TEXT_MARGIN * config.get('scale', 1.0))
+
+        if position == 'superior_esquerda':
+            x = padding
+            y = padding
+        elif position == 'superior_direita':
+            x = img.width - text_width - padding
+            y = padding
+        elif position == 'inferior_esquerda':
+            x = padding
+            y = img.height - text_height - padding
+        elif position == 'inferior_direita':
+            x = img.width - text_width - padding
+            y = img.height - text_height - padding
+        elif position == 'centro':
+            x = (img.width - text_width) // 2
+            y = (img.height - text_height) // 2
+        else:
+            x = padding
+            y = padding
+
+        # ⚡ OTIMIZAÇÃO: Combinar só o retângulo do rótulo (recortado aos limites da imagem),
+        # em vez de uma camada transparente do tamanho da imagem inteira
+        left = x + sprite.offset[0]
+        top = y + sprite.offset[1]
+        box = (
+            max(left, 0),
+            max(top, 0),
+            min(left + sprite.image.width, img.width),
+            min(top + sprite.image.height, img.height)
+        )
+
+        if box[0] < box[2] and box[1] < box[3]:
+            img.alpha_composite(
+                sprite.image,
+                dest=box[:2],
+                source=(box[0] - left, box[1] - top, box[2] - left, box[3] - top)
+            )
+
+        return img
 
     def hex_to_rgb(self, hex_color: str) -> tuple:
         """
@@ -276,30 +900,26 @@ class ImageProcessor:
         hex_color = hex_color.lstrip('#')
         return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
 
-    def save_image(
-        self,
-        image: Image.Image,
+    @staticmethod
+    def get_output_path(
         original_path: str,
         dest_folder: str,
         output_format: Optional[str] = None,
-        quality: int = 95,
         prefix: str = "",
         suffix: str = ""
     ) -> str:
         """
-        Salva imagem processada
+        Caminho onde save_image grava o resultado de uma imagem
 
         Args:
-            image: Imagem PIL
             original_path: Caminho da imagem original
             dest_folder: Pasta de destino
             output_format: Formato de saída (None = manter original)
-            quality: Qualidade (1-100) para WEBP e JPG
             prefix: Prefixo para nome do arquivo
             suffix: Sufixo para nome do arquivo
 
         Returns:
-            Caminho do arquivo salvo
+            Caminho completo do arquivo de saída
         """
         # Obter nome e extensão originais
         original_name = Path(original_path).stem
@@ -313,7 +933,89 @@ class ImageProcessor:
 
         # Construir novo nome
         new_name = f"{prefix}{original_name}{suffix}{ext}"
-        output_path = os.path.join(dest_folder, new_name)
+        return os.path.join(dest_folder, new_name)
+
+    @staticmethod
+    def text_config_from_preset(preset: Dict) -> Optional[Dict]:
+        """
+        Converte as chaves de texto de um preset JSON no text_config do processador
+
+        Aceita tanto a posição dos presets de exemplo ("superior_direita") quanto
+        a salva pela interface ("Superior Direita").
+
+        Args:
+            preset: Dicionário carregado de um preset
+
+        Returns:
+            text_config ou None se o texto estiver desabilitado/vazio
+        """
+        text = preset.get('text_overlay', '')
+        if not preset.get('text_enabled', False) or not text.strip():
+            return None
+
+        position = preset.get('text_position', 'superior_direita').strip().lower().replace(' ', '_')
+
+        return {
+            "text": text,
+            "size": preset.get('text_size', 40),
+            "color": preset.get('text_color', '#FFFFFF'),
+            "position": position,
+            "opacity": preset.get('text_opacity', 100),
+            "bg_enabled": preset.get('text_bg_enabled', False),
+            "bg_color": preset.get('text_bg_color', '#000000'),
+            "bg_opacity": preset.get('text_bg_opacity', 70)
+        }
+
+    def save_image(
+        self,
+        image: Image.Image,
+        original_path: str,
+        dest_folder: str,
+        output_format: Optional[str] = None,
+        quality: int = 95,
+        prefix: str = "",
+        suffix: str = "",
+        max_bytes: Optional[int] = None
+    ) -> str:
+        """
+        Salva imagem processada
+
+        Args:
+            image: Imagem PIL
+            original_path: Caminho da imagem original
+            dest_folder: Pasta de destino
+            output_format: Formato de saída (None = manter original)
+            quality: Qualidade (1-100) para WEBP e JPG
+            prefix: Prefixo para nome do arquivo
+            suffix: Sufixo para nome do arquivo
+            max_bytes: Tamanho máximo do arquivo (WEBP/JPG: maior qualidade até 'quality' que caiba)
+
+        Returns:
+            Caminho do arquivo salvo
+        """
+        return self.save_image_to_size(
+            image, original_path, dest_folder, output_format, quality, prefix, suffix, max_bytes
+        )[0]
+
+    def save_image_to_size(
+        self,
+        image: Image.Image,
+        original_path: str,
+        dest_folder: str,
+        output_format: Optional[str] = None,
+        quality: int = 95,
+        prefix: str = "",
+        suffix: str = "",
+        max_bytes: Optional[int] = None
+    ) -> Tuple[str, int]:
+        """
+        Como save_image, devolvendo também a qualidade usada
+
+        Returns:
+            Tupla (caminho do arquivo salvo, qualidade usada)
+        """
+        output_path = self.get_output_path(original_path, dest_folder, output_format, prefix, suffix)
+        ext = Path(output_path).suffix
 
         # Preparar imagem para salvamento
         save_image = image
@@ -330,10 +1032,28 @@ class ImageProcessor:
             elif save_image.mode != 'RGB':
                 save_image = save_image.convert('RGB')
 
+        if max_bytes is None:
+            self._save_prepared(save_image, output_path, ext, quality)
+            return output_path, quality
+
+        # ⚡ Busca em memória com a imagem já preparada; só o resultado vai para o disco
+        def encode(q: int) -> bytes:
+            buffer = io.BytesIO()
+            self._save_prepared(save_image, buffer, ext, q)
+            return buffer.getvalue()
+
+        data, used_quality = self.search_quality(encode, ext, max_bytes, quality)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        return output_path, used_quality
+
+    @staticmethod
+    def _save_prepared(save_image: Image.Image, target, ext: str, quality: int) -> None:
+        """Grava com as configurações de save_image (target = caminho ou buffer)"""
         # Salvar com configurações apropriadas
         if ext == '.png':
             # PNG: Sempre sem perda
-            save_image.save(output_path, 'PNG', optimize=True)
+            save_image.save(target, 'PNG', optimize=True)
 
         elif ext == '.webp':
             # WEBP: Qualidade controlada (similar ao Photoshop)
@@ -341,26 +1061,204 @@ class ImageProcessor:
             # quality=1-99 = com perda controlada
             if quality == 100:
                 # Modo lossless (sem perda)
-                save_image.save(output_path, 'WEBP', lossless=True, quality=100)
+                save_image.save(target, 'WEBP', lossless=True, quality=100)
             else:
                 # Modo lossy com qualidade especificada
-                save_image.save(output_path, 'WEBP', quality=quality, method=6)
+                save_image.save(target, 'WEBP', quality=quality, method=6)
 
         elif ext in ['.jpg', '.jpeg']:
             # JPG: Qualidade controlada
             save_image.save(
-                output_path,
+                target,
                 'JPEG',
                 quality=quality,
                 optimize=True,
                 subsampling=0  # Melhor qualidade de cor
             )
 
-        else:
+        elif isinstance(target, str):
             # Formato desconhecido, tentar salvar como está
-            save_image.save(output_path)
+            save_image.save(target)
+
+        else:
+            save_image.save(target, ext.lstrip('.').upper())
+
+    @staticmethod
+    def search_quality(
+        encode: Callable[[int], bytes],
+        format_ext: str,
+        max_bytes: int,
+        max_quality: int = 95,
+        min_quality: int = ENCODE_MIN_QUALITY,
+        max_steps: int = ENCODE_SEARCH_MAX_STEPS
+    ) -> Tuple[bytes, int]:
+        """
+        Maior qualidade (até max_quality) cujo arquivo cabe em max_bytes
+
+        Busca binária limitada a max_steps codificações. Formatos sem qualidade
+        (PNG) são codificados uma vez. Se nem min_quality couber, devolve o
+        resultado em min_quality (acima do limite: quem chama compara o tamanho).
+
+        Args:
+            encode: Função que codifica a imagem com a qualidade dada
+            format_ext: Formato ('webp', 'jpg'... com ou sem ponto)
+            max_bytes: Tamanho máximo do arquivo
+            max_quality: Qualidade pedida (teto da busca)
+            min_quality: Menor qualidade aceitável
+            max_steps: Máximo de codificações
+
+        Returns:
+            Tupla (bytes codificados, qualidade usada)
+        """
+        data = encode(max_quality)
+        if len(data) <= max_bytes or format_ext.lower().lstrip('.') not in ('webp', 'jpg', 'jpeg'):
+            return data, max_quality
+
+        min_quality = min(min_quality, max_quality)
+        best = None
+        smallest = (data, max_quality)
+        lo, hi = min_quality, max_quality - 1
+        steps = 1
+
+        # ⚡ Tamanho cresce com a qualidade: busca binária pela maior que cabe
+        while lo <= hi and steps < max_steps:
+            mid = (lo + hi) // 2
+            candidate = encode(mid)
+            steps += 1
+            if len(candidate) <= max_bytes:
+                best = (candidate, mid)
+                lo = mid + 1
+            else:
+                smallest = (candidate, mid)
+                hi = mid - 1
+
+        if best is not None:
+            return best
+        if smallest[1] == min_quality or steps >= max_steps:
+            return smallest
+        return encode(min_quality), min_quality
 
-        return output_path
+    def encode_image(self, image: Image.Image, format_ext: str, quality: int = 95) -> bytes:
+        """
+        Codifica a imagem em memória com as configurações usadas no download
+
+        Args:
+            image: Imagem PIL
+            format_ext: Formato de saída ('webp', 'png', 'jpg')
+            quality: Qualidade (1-100) para WEBP e JPG
+
+        Returns:
+            Bytes da imagem codificada
+        """
+        return self._encode_prepared(self._prepare_for_encode(image, format_ext), format_ext, quality)
+
+    def encode_image_to_size(
+        self,
+        image: Image.Image,
+        format_ext: str,
+        max_bytes: int,
+        quality: int = 95
+    ) -> Tuple[bytes, int]:
+        """
+        encode_image com tamanho máximo: maior qualidade (até 'quality') que caiba
+
+        Args:
+            image: Imagem PIL (já composta: é preparada uma vez para todas as tentativas)
+            format_ext: Formato de saída ('webp', 'png', 'jpg')
+            max_bytes: Tamanho máximo do arquivo
+            quality: Qualidade máxima
+
+        Returns:
+            Tupla (bytes codificados, qualidade usada)
+        """
+        img = self._prepare_for_encode(image, format_ext)
+        return self.search_quality(
+            lambda q: self._encode_prepared(img, format_ext, q), format_ext, max_bytes, quality
+        )
+
+    @staticmethod
+    def _prepare_for_encode(image: Image.Image, format_ext: str) -> Image.Image:
+        """Conversões exigidas pelo formato (JPG: achatar sobre fundo branco)"""
+        img = image
+        if format_ext in ['jpg', 'jpeg']:
+            # Converter para RGB se necessário
+            if img.mode in ('RGBA', 'LA', 'P'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+        return img
+
+    @staticmethod
+    def _encode_prepared(img: Image.Image, format_ext: str, quality: int) -> bytes:
+        img_buffer = io.BytesIO()
+
+        if format_ext == 'png':
+            # PNG: Sem optimize para velocidade
+            img.save(img_buffer, 'PNG', compress_level=6)
+        elif format_ext == 'webp':
+            if quality == 100:
+                img.save(img_buffer, 'WEBP', lossless=True, quality=100, method=4)
+            else:
+                # method=4 é mais rápido que method=6 com qualidade similar
+                img.save(img_buffer, 'WEBP', quality=quality, method=4)
+        elif format_ext in ['jpg', 'jpeg']:
+            # Remover optimize e subsampling para velocidade
+            img.save(img_buffer, 'JPEG', quality=quality)
+
+        return img_buffer.getvalue()
+
+    def encode_result(
+        self,
+        image: Image.Image,
+        format_ext: str,
+        quality: int = 95,
+        thumbnail_size: int = THUMBNAIL_SIZE,
+        max_bytes: Optional[int] = None
+    ) -> EncodedImage:
+        """
+        Codifica o resultado e gera a miniatura, para não guardar a imagem decodificada
+
+        Args:
+            image: Imagem PIL processada
+            format_ext: Formato de saída ('webp', 'png', 'jpg')
+            quality: Qualidade (1-100) para WEBP e JPG
+            thumbnail_size: Maior lado da miniatura (pixels)
+            max_bytes: Tamanho máximo do arquivo (busca a maior qualidade que caiba)
+
+        Returns:
+            EncodedImage com bytes finais e miniatura
+        """
+        if max_bytes is None:
+            data, used_quality = self.encode_image(image, format_ext, quality), quality
+        else:
+            data, used_quality = self.encode_image_to_size(image, format_ext, max_bytes, quality)
+        thumbnail = self.encode_display(image, thumbnail_size, quality=80)
+        return EncodedImage(data, format_ext, quality, image.size, thumbnail, max_bytes, used_quality)
+
+    def encode_display(self, image: Image.Image, max_side: int, quality: int = 85) -> bytes:
+        """
+        WEBP rápido para exibir no navegador (miniaturas e preview)
+
+        Args:
+            image: Imagem PIL
+            max_side: Maior lado da imagem exibida (reduz se for maior)
+            quality: Qualidade WEBP
+
+        Returns:
+            Bytes WEBP
+        """
+        img = image
+        if max(img.size) > max_side:
+            img = img.copy()
+            img.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+
+        buffer = io.BytesIO()
+        img.save(buffer, 'WEBP', quality=quality, method=0)
+        return buffer.getvalue()
 
     def get_image_info(self, image_path: str) -> Dict:
         """
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LOTES EM SEGUNDO PLANO
+Cada lote roda em uma thread própria, fora do script do Streamlit: reruns,
+cliques em widgets ou uma reconexão do navegador não interrompem o processamento.
+A página só consulta o progresso pelo ID do lote.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from batch_engine import BatchEngine, BatchResult
+from pipeline import stream_to_sink
+
+# Estados de um lote
+QUEUED = 'queued'  # Aguardando um lote anterior terminar
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'  # Erro inesperado no motor (falhas de imagens isoladas não contam)
+
+FINISHED_STATES = (DONE, CANCELLED, FAILED)
+
+# Lotes executados ao mesmo tempo (cada um já usa um pool de processos)
+MAX_CONCURRENT_JOBS = 2
+
+# Lotes terminados e nunca recolhidos (ex.: aba fechada) são descartados depois disto
+JOB_RETENTION_SECONDS = 60 * 60
+
+# Imagens recentes usadas na estimativa de tempo restante
+ETA_WINDOW = 5
+
+
+@dataclass
+class JobProgress:
+    """Retrato do andamento de um lote (seguro para ler fora da thread do lote)"""
+    job_id: str
+    status: str
+    total: int
+    done: int
+    processed: int
+    failed: int
+    current: str  # Último arquivo concluído
+    elapsed: float
+    eta: Optional[float]  # Segundos restantes (None antes da primeira imagem)
+    error: Optional[str] = None
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+
+class BatchJob:
+    """Um lote submetido ao JobManager: resultados, contadores e pedido de cancelamento"""
+
+    def __init__(self, job_id: str, total: int):
+        """
+        Args:
+            job_id: Identificador do lote
+            total: Número de imagens
+        """
+        self.job_id = job_id
+        self.total = total
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.results: List[BatchResult] = []  # Com destino (sink), sem imagem/bytes
+        self.output = None  # O que o destino devolveu ao fechar (ex.: ZipExport)
+        self.processed = 0
+        self.failed = 0
+        self.current = ''
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self._recent = deque(maxlen=ETA_WINDOW)  # Duração das últimas imagens
+        self._last_result_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def cancel(self) -> None:
+        """Pede o cancelamento (atendido entre uma imagem e outra)"""
+        self._cancel.set()
+
+    def progress(self) -> JobProgress:
+        """Andamento atual do lote"""
+        with self._lock:
+            done = self.processed + self.failed
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+
+            eta = None
+            if self._recent:
+                eta = sum(self._recent) / len(self._recent) * (self.total - done)
+
+            return JobProgress(
+                job_id=self.job_id,
+                status=self.status,
+                total=self.total,
+                done=done,
+                processed=self.processed,
+                failed=self.failed,
+                current=self.current,
+                elapsed=elapsed,
+                eta=eta,
+                error=self.error
+            )
+
+    def _start(self) -> None:
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = self._last_result_at = time.time()
+
+    def _add(self, result: BatchResult) -> None:
+        with self._lock:
+            now = time.time()
+            self._recent.append(now - self._last_result_at)
+            self._last_result_at = now
+
+            self.results.append(result)
+            self.current = result.filename
+            if result.ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+
+    def _finish(self, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+
+
+class JobManager:
+    """Executa lotes em threads de fundo, identificados por ID"""
+
+    def __init__(self, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS):
+        """
+        Args:
+            max_concurrent_jobs: Lotes executados ao mesmo tempo (os demais aguardam na fila)
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix='batch-job')
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, engine: BatchEngine, tasks: Iterable[Tuple[str, Union[str, bytes]]],
+               total: Optional[int] = None, sink=None) -> str:
+        """
+        Agenda um lote
+
+        Args:
+            engine: Motor já configurado (overlay, texto, formato...)
+            tasks: Lista ou gerador de (nome do arquivo, caminho ou bytes da imagem)
+            total: Número de imagens (obrigatório se tasks for um gerador)
+            sink: Destino que recebe cada resultado assim que fica pronto (ZipSink,
+                FolderSink); o lote guarda só nome, erro e tempos
+
+        Returns:
+            ID do lote (use em get/cancel/discard)
+        """
+        self._prune()
+
+        job = BatchJob(uuid.uuid4().hex, len(tasks) if total is None else total)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, engine, tasks, sink)
+        return job.job_id
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        """Lote pelo ID (None se não existe ou já foi descartado)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Pede o cancelamento do lote; False se ele não existe"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def discard(self, job_id: str) -> None:
+        """Esquece o lote (cancelando-o se ainda estiver rodando) e libera seus resultados"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel()
+
+    def active_jobs(self) -> List[BatchJob]:
+        """Lotes na fila ou em execução"""
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def _run(self, job: BatchJob, engine: BatchEngine, tasks: Iterable[Tuple[str, Union[str, bytes]]],
+             sink=None) -> None:
+        """Corpo da thread do lote"""
+        if job.cancel_requested:
+            job._finish(CANCELLED)
+            return
+
+        job._start()
+        results = engine.run(tasks)
+        try:
+            for result in (results if sink is None else stream_to_sink(results, sink)):
+                job._add(result)
+                if job.cancel_requested:
+                    break
+        except Exception as e:
+            job._finish(FAILED, str(e))
+            return
+        finally:
+            # Fecha o gerador: encerra o pool e cancela as imagens ainda não iniciadas
+            results.close()
+            if sink is not None:
+                job.output = sink.close()
+
+        job._finish(CANCELLED if job.cancel_requested else DONE)
+
+    def _prune(self) -> None:
+        """Descarta lotes terminados há mais de JOB_RETENTION_SECONDS"""
+        limit = time.time() - JOB_RETENTION_SECONDS
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < limit]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Cancela todos os lotes e espera as threads terminarem"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CONTABILIDADE DE MEMÓRIA POR SESSÃO
+Cada sessão do Streamlit registra o que guarda (resultados, lote em andamento,
+imagens codificadas para o ZIP, preview, uploads). Acima do limite da sessão
+ou do limite somado de todas as sessões, os resultados mais antigos descem de
+nível: imagem decodificada → arquivo comprimido em memória → arquivo em disco.
+Nada se perde: galeria e ZIP continuam funcionando com qualquer nível.
+
+Cada sessão só mexe nos próprios objetos, no próprio rerun: acima do limite
+global, as outras sessões recebem um pedido de redução (atendido no próximo
+rerun delas) e a soma usa o último uso que cada uma informou.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from dataclasses import fields
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+from caches import image_nbytes
+from image_processor import ImageProcessor, EncodedImage
+
+# Limite de memória de uma sessão (IMAGE_LAYER_SESSION_MEMORY_MB)
+SESSION_MEMORY_MAX_BYTES = int(os.environ.get('IMAGE_LAYER_SESSION_MEMORY_MB', 1024)) * 1024 * 1024
+
+# Limite somado de todas as sessões do processo (IMAGE_LAYER_TOTAL_MEMORY_MB)
+GLOBAL_MEMORY_MAX_BYTES = int(os.environ.get('IMAGE_LAYER_TOTAL_MEMORY_MB', 4096)) * 1024 * 1024
+
+# Categorias contadas por sessão (rótulos exibidos na barra lateral)
+USAGE_LABELS = {
+    'results': 'resultados',
+    'batch': 'lote em andamento',
+    'encoded': 'codificadas para o ZIP',
+    'preview': 'preview',
+    'uploads': 'uploads',
+    'zip': 'ZIP'
+}
+
+
+class SpilledImage(EncodedImage):
+    """EncodedImage com os bytes em um arquivo em disco (só a miniatura fica na memória)"""
+
+    def __init__(self, path: str, encoded: EncodedImage):
+        """
+        Args:
+            path: Arquivo com os bytes codificados
+            encoded: Resultado de origem (formato, qualidade, tamanho e miniatura são mantidos)
+        """
+        for field in fields(EncodedImage):
+            if field.name != 'data':
+                setattr(self, field.name, getattr(encoded, field.name))
+        self.path = path
+
+    @property
+    def data(self) -> bytes:
+        """Bytes codificados (lidos do disco a cada acesso)"""
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.thumbnail or b'')
+
+    def __repr__(self) -> str:
+        return f"SpilledImage({self.format_ext}, {self.size[0]}x{self.size[1]}, {self.path})"
+
+
+def resident_nbytes(item) -> int:
+    """Memória ocupada por um resultado (imagem, EncodedImage, SpilledImage ou bytes)"""
+    if isinstance(item, Image.Image):
+        return image_nbytes(item)
+    if isinstance(item, EncodedImage):
+        return item.nbytes
+    if isinstance(item, (bytes, bytearray)):
+        return len(item)
+    return 0
+
+
+class SessionLedger:
+    """O que uma sessão guarda na memória, e como reduzir"""
+
+    def __init__(self, accountant: 'MemoryAccountant'):
+        """
+        Args:
+            accountant: Contador do processo (onde a sessão fica registrada)
+        """
+        self._accountant = weakref.ref(accountant)
+        self._results: List[Tuple[object, str]] = []  # Mesma lista de st.session_state.processed_images
+        self._encoded_variants = None  # Mesmo OrderedDict de st.session_state.encoded_cache
+        self._job = None  # BatchJob desta sessão, enquanto roda
+        self._fixed: Dict[str, int] = {}  # Uso que só pode ser medido (preview, uploads, ZIP)
+        self._encoding: Tuple[str, int, Optional[int]] = ('webp', 95, None)
+        self._spill_dir: Optional[str] = None  # Pasta temporária dos resultados gravados em disco
+        self._finalizer = None  # Remove a pasta (ao trocar de lote ou quando a sessão deixa de existir)
+        self._spill_count = 0
+        self._failed = set()  # id() de resultados que não puderam ser reduzidos
+        self.reported_nbytes = 0  # Uso na última contagem da própria sessão (lido pelas outras)
+        self._shrink_target: Optional[int] = None  # Pedido de redução vindo do limite global
+        self._lock = threading.RLock()
+
+    def track_results(self, results: List[Tuple[object, str]]) -> None:
+        """Lista de (resultado, nome) da sessão; uma lista nova descarta os arquivos em disco da anterior"""
+        with self._lock:
+            if results is not self._results:
+                self._remove_spill_dir()
+                self._failed.clear()
+            self._results = results
+
+    def track_encoded(self, variants) -> None:
+        """Variantes já codificadas para o ZIP ((lote, formato, ...) -> {índice: EncodedImage})"""
+        with self._lock:
+            self._encoded_variants = variants
+
+    def track_batch(self, job) -> None:
+        """Lote em andamento (seus resultados ficam na memória até serem recolhidos)"""
+        with self._lock:
+            self._job = job
+
+    def set_usage(self, name: str, nbytes: int) -> None:
+        """Uso medido que a sessão não deixa reduzir (ex.: 'preview', 'uploads', 'zip')"""
+        with self._lock:
+            self._fixed[name] = nbytes
+
+    def set_encoding(self, format_ext: str, quality: int, max_bytes: Optional[int] = None) -> None:
+        """Formato usado ao comprimir resultados (o atual da sessão: o ZIP reaproveita os bytes)"""
+        with self._lock:
+            self._encoding = (format_ext, quality, max_bytes)
+
+    def usage(self) -> Dict[str, int]:
+        """Bytes por categoria (ver USAGE_LABELS)"""
+        with self._lock:
+            seen = set()
+
+            def count(items) -> int:
+                total = 0
+                for item in items:
+                    if item is not None and id(item) not in seen:
+                        seen.add(id(item))
+                        total += resident_nbytes(item)
+                return total
+
+            usage = {
+                'results': count(item for item, _ in list(self._results)),
+                'batch': count(result.output for result in self._batch_results()),
+                'encoded': count(
+                    encoded
+                    for variant in list((self._encoded_variants or {}).values())
+                    for encoded in list(variant.values())
+                )
+            }
+            usage.update(self._fixed)
+            return usage
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.usage().values())
+
+    def measure(self) -> int:
+        """Conta o uso e o publica em reported_nbytes (só no thread da própria sessão)"""
+        self.reported_nbytes = self.nbytes
+        return self.reported_nbytes
+
+    def request_shrink(self, target_bytes: int) -> None:
+        """Pede que a sessão desça a target_bytes no próximo rerun (chamado por outras sessões)"""
+        with self._lock:
+            if self._shrink_target is None or target_bytes < self._shrink_target:
+                self._shrink_target = max(target_bytes, 0)
+
+    def take_shrink_request(self) -> Optional[int]:
+        """Pedido de redução pendente (e o remove)"""
+        with self._lock:
+            target, self._shrink_target = self._shrink_target, None
+            return target
+
+    @property
+    def shrink_requested(self) -> bool:
+        return self._shrink_target is not None
+
+    def _batch_results(self) -> List:
+        job = self._job
+        return list(job.results) if job is not None else []
+
+    def _held_results(self) -> Iterator[Tuple[object, Callable]]:
+        """(resultado, substituir por) do mais antigo ao mais novo"""
+        results = self._results
+        for index, (item, name) in enumerate(list(results)):
+            yield item, partial(self._replace_listed, results, index, item, name)
+        for result in self._batch_results():
+            yield result.output, partial(self._replace_batch_result, result)
+
+    @staticmethod
+    def _replace_listed(results: List, index: int, item, name: str, new_item) -> None:
+        # A lista pode ter mudado enquanto o resultado era comprimido
+        if index < len(results) and results[index][0] is item:
+            results[index] = (new_item, name)
+
+    @staticmethod
+    def _replace_batch_result(result, new_item) -> None:
+        result.encoded = new_item
+        result.image = None
+
+    def shrink(self, processor: ImageProcessor) -> bool:
+        """
+        Reduz a memória da sessão em um passo (só no thread da própria sessão:
+        altera encoded_cache e processed_images dela)
+
+        1. Descarta a variante codificada para o ZIP usada há mais tempo (refeita se precisar)
+        2. Comprime o resultado decodificado mais antigo no formato atual
+        3. Grava em disco o resultado comprimido mais antigo
+
+        ⚡ A compressão e a gravação acontecem fora do lock
+
+        Returns:
+            False se não há mais nada a reduzir
+        """
+        with self._lock:
+            variants = self._encoded_variants
+            if variants:
+                variants.popitem(last=False)
+                return True
+            held = list(self._held_results())
+            format_ext, quality, max_bytes = self._encoding
+
+        for item, replace in held:
+            if isinstance(item, Image.Image) and id(item) not in self._failed:
+                try:
+                    encoded = processor.encode_result(item, format_ext, quality, max_bytes=max_bytes)
+                except Exception as e:
+                    print(f"⚠️ Não foi possível comprimir um resultado: {e}")
+                    self._failed.add(id(item))
+                    continue
+                with self._lock:
+                    replace(encoded)
+                return True
+
+        for item, replace in held:
+            if isinstance(item, EncodedImage) and not isinstance(item, SpilledImage) \
+                    and id(item) not in self._failed:
+                try:
+                    spilled = self._spill(item)
+                except OSError as e:
+                    print(f"⚠️ Não foi possível gravar um resultado em disco: {e}")
+                    self._failed.add(id(item))
+                    continue
+                with self._lock:
+                    replace(spilled)
+                return True
+
+        return False
+
+    def _spill(self, encoded: EncodedImage) -> SpilledImage:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='image-layer-spill-')
+            # Sessão encerrada (session_state descartado): a pasta vai junto
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+
+        self._spill_count += 1
+        path = os.path.join(self._spill_dir, f"{self._spill_count:06d}.{encoded.format_ext}")
+        with open(path, 'wb') as f:
+            f.write(encoded.data)
+
+        accountant = self._accountant()
+        if accountant is not None:
+            accountant.count_spilled()
+        return SpilledImage(path, encoded)
+
+    def _remove_spill_dir(self) -> None:
+        if self._spill_dir is not None:
+            self._finalizer()
+            self._spill_dir = None
+
+    def close(self) -> None:
+        """Apaga os resultados gravados em disco e sai da contabilidade"""
+        with self._lock:
+            self._remove_spill_dir()
+            self._results = []
+            self._encoded_variants = None
+            self._job = None
+            self._fixed.clear()
+            self.reported_nbytes = 0
+            self._shrink_target = None
+
+
+class MemoryAccountant:
+    """Memória guardada por todas as sessões do processo, com limite por sessão e global"""
+
+    def __init__(
+        self,
+        session_max_bytes: int = SESSION_MEMORY_MAX_BYTES,
+        global_max_bytes: int = GLOBAL_MEMORY_MAX_BYTES,
+        processor: Optional[ImageProcessor] = None
+    ):
+        """
+        Args:
+            session_max_bytes: Limite de cada sessão
+            global_max_bytes: Limite somado de todas as sessões
+            processor: Processador usado para comprimir resultados
+        """
+        self.session_max_bytes = session_max_bytes
+        self.global_max_bytes = global_max_bytes
+        self.processor = processor or ImageProcessor()
+        self.spilled = 0  # Resultados gravados em disco desde o início do processo
+        self._ledgers = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def count_spilled(self) -> None:
+        with self._lock:
+            self.spilled += 1
+
+    def ledger(self) -> SessionLedger:
+        """Registra uma sessão (guarde o retorno no session_state)"""
+        ledger = SessionLedger(self)
+        with self._lock:
+            self._ledgers.add(ledger)
+        return ledger
+
+    def enforce(self, ledger: SessionLedger) -> None:
+        """
+        Aplica os limites a partir do rerun de uma sessão
+
+        A própria sessão é reduzida na hora (limite dela, pedido pendente e sua
+        parte do excesso global). As outras sessões que passam do limite global
+        só recebem um pedido, atendido no próximo rerun delas.
+
+        Nunca levanta exceção: sem como reduzir mais, a sessão só fica acima do limite
+        """
+        try:
+            limit = self.session_max_bytes
+            requested = ledger.take_shrink_request()
+            if requested is not None:
+                limit = min(limit, requested)
+            self._shrink_to(ledger, limit)
+
+            own_target = self._share_global_excess(ledger)
+            if own_target is not None:
+                self._shrink_to(ledger, own_target)
+        except Exception as e:
+            print(f"⚠️ Falha ao aplicar o limite de memória: {e}")
+
+    def _shrink_to(self, ledger: SessionLedger, target_bytes: int) -> None:
+        """Reduz a sessão (no thread dela, sem o lock do contador) até target_bytes"""
+        while ledger.measure() > target_bytes:
+            if not ledger.shrink(self.processor):
+                break
+
+    def _share_global_excess(self, ledger: SessionLedger) -> Optional[int]:
+        """
+        Divide o excesso global entre as sessões, das que mais ocupam para as que menos
+
+        Returns:
+            Novo alvo da própria sessão, se ela tiver parte do excesso
+        """
+        with self._lock:
+            ledgers = list(self._ledgers)
+        usage = {candidate: candidate.reported_nbytes for candidate in ledgers}
+        excess = sum(usage.values()) - self.global_max_bytes
+        own_target = None
+        for candidate in sorted(usage, key=usage.get, reverse=True):
+            if excess <= 0:
+                break
+            reduction = min(excess, usage[candidate])
+            if candidate is ledger:
+                own_target = usage[candidate] - reduction
+            else:
+                candidate.request_shrink(usage[candidate] - reduction)
+            excess -= reduction
+        return own_target
+
+    def stats(self) -> Dict:
+        """Uso somado das sessões e limites"""
+        with self._lock:
+            ledgers = list(self._ledgers)
+        return {
+            'sessions': len(ledgers),
+            'bytes': sum(ledger.reported_nbytes for ledger in ledgers),
+            'session_max_bytes': self.session_max_bytes,
+            'global_max_bytes': self.global_max_bytes,
+            'spilled': self.spilled,
+            'shrink_requests': sum(ledger.shrink_requested for ledger in ledgers)
+        }
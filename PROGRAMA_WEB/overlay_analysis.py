@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ANÁLISE DE OVERLAYS ESPARSOS
+Molduras costumam ter o centro totalmente transparente: só as bordas precisam
+de mistura (alpha blending). A análise é feita uma vez por overlay/tamanho e
+reaproveitada no lote inteiro.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from PIL import Image
+
+# Tamanho dos blocos analisados (pixels)
+TILE_SIZE = 64
+
+# Acima desta fração de área a misturar, compor o quadro inteiro é mais barato
+MAX_BLEND_FRACTION = 0.85
+
+Box = Tuple[int, int, int, int]
+
+
+@dataclass
+class OverlayPlan:
+    """Mapa de regiões do overlay: o que misturar, o que copiar e o que ignorar"""
+    size: Tuple[int, int]
+    blend_boxes: List[Box] = field(default_factory=list)  # Alpha parcial: alpha_composite
+    opaque_boxes: List[Box] = field(default_factory=list)  # Alpha 255: copiar do overlay
+    blend_area: int = 0
+    opaque_area: int = 0
+
+    @property
+    def area(self) -> int:
+        return self.size[0] * self.size[1]
+
+    @property
+    def transparent_fraction(self) -> float:
+        """Fração do overlay que é totalmente transparente (ignorada)"""
+        return 1 - (self.blend_area + self.opaque_area) / max(self.area, 1)
+
+    @property
+    def is_sparse(self) -> bool:
+        """Vale a pena compor por regiões em vez do quadro inteiro?"""
+        return self.blend_area <= self.area * MAX_BLEND_FRACTION
+
+    @property
+    def nbytes(self) -> int:
+        """Memória aproximada do plano (para o orçamento do cache)"""
+        return 64 + 32 * (len(self.blend_boxes) + len(self.opaque_boxes))
+
+
+def _merge_boxes(rows: List[List[Box]]) -> List[Box]:
+    """Junta verticalmente faixas com as mesmas colunas em linhas de blocos vizinhas"""
+    merged = []
+    open_boxes = {}  # (x0, x1) -> caixa em crescimento
+    for row in rows:
+        next_open = {}
+        for box in row:
+            key = (box[0], box[2])
+            current = open_boxes.pop(key, None)
+            if current is not None and current[3] == box[1]:
+                next_open[key] = (current[0], current[1], current[2], box[3])
+            else:
+                if current is not None:
+                    merged.append(current)
+                next_open[key] = box
+        merged.extend(open_boxes.values())
+        open_boxes = next_open
+    merged.extend(open_boxes.values())
+    return merged
+
+
+def analyze_overlay(overlay: Image.Image, tile_size: int = TILE_SIZE) -> OverlayPlan:
+    """
+    Classifica os blocos do overlay pelo canal alpha
+
+    Args:
+        overlay: Overlay RGBA (já no tamanho final)
+        tile_size: Tamanho dos blocos
+
+    Returns:
+        OverlayPlan com regiões a misturar e a copiar
+    """
+    plan = OverlayPlan(overlay.size)
+    alpha = overlay.getchannel('A')
+    width, height = overlay.size
+
+    # Casos triviais: overlay inteiro transparente ou inteiro opaco
+    lo, hi = alpha.getextrema()
+    if hi == 0:
+        return plan
+    if lo == 255:
+        plan.opaque_boxes.append((0, 0, width, height))
+        plan.opaque_area = plan.area
+        return plan
+
+    blend_rows, opaque_rows = [], []
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        blend_row, opaque_row = [], []
+        run_kind, run_start = None, 0
+
+        # Percorrer a linha de blocos juntando blocos vizinhos do mesmo tipo
+        for x0 in range(0, width + tile_size, tile_size):
+            if x0 < width:
+                x1 = min(x0 + tile_size, width)
+                lo, hi = alpha.crop((x0, y0, x1, y1)).getextrema()
+                kind = 'transparent' if hi == 0 else 'opaque' if lo == 255 else 'blend'
+            else:
+                kind = None  # Fim da linha: fechar a faixa aberta
+
+            if kind != run_kind:
+                run_end = min(x0, width)
+                if run_kind == 'blend':
+                    blend_row.append((run_start, y0, run_end, y1))
+                    plan.blend_area += (run_end - run_start) * (y1 - y0)
+                elif run_kind == 'opaque':
+                    opaque_row.append((run_start, y0, run_end, y1))
+                    plan.opaque_area += (run_end - run_start) * (y1 - y0)
+                run_kind, run_start = kind, x0
+
+        blend_rows.append(blend_row)
+        opaque_rows.append(opaque_row)
+
+    plan.blend_boxes = _merge_boxes(blend_rows)
+    plan.opaque_boxes = _merge_boxes(opaque_rows)
+    return plan
+
+
+def composite_with_plan(
+    base: Image.Image,
+    overlay: Image.Image,
+    plan: OverlayPlan,
+    in_place: bool = False
+) -> Image.Image:
+    """
+    Equivalente bit a bit a Image.alpha_composite(base, overlay), tocando só
+    nos blocos que não são totalmente transparentes
+
+    Args:
+        base: Imagem base RGBA (mesmo tamanho do overlay)
+        overlay: Overlay RGBA
+        plan: Plano gerado por analyze_overlay para este overlay
+        in_place: Compor direto na base, sem cópia
+
+    Returns:
+        Imagem composta
+    """
+    if not plan.is_sparse:
+        return Image.alpha_composite(base, overlay)
+
+    result = base if in_place else base.copy()
+
+    # Blocos opacos: o resultado é exatamente o pixel do overlay
+    for box in plan.opaque_boxes:
+        result.paste(overlay.crop(box), box[:2])
+
+    # Blocos com alpha parcial: misturar só a região
+    for box in plan.blend_boxes:
+        result.alpha_composite(overlay, dest=box[:2], source=box)
+
+    return result
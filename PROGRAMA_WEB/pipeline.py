@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PIPELINE LIMITADO DE LOTE
+leitura → decodificação/overlay/codificação (BatchEngine) → destino (ZIP ou pasta)
+
+Cada etapa só avança quando a seguinte libera espaço: as entradas são lidas sob
+demanda, o motor mantém no máximo max_in_flight imagens em andamento e cada
+resultado é entregue ao destino e descartado. O pico de memória acompanha o
+número de processos, não o tamanho do lote.
+"""
+
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from batch_engine import BatchResult
+from image_processor import ImageProcessor
+
+
+def upload_tasks(uploaded_files: Iterable) -> Iterator[Tuple[str, bytes]]:
+    """
+    Tarefas a partir de arquivos enviados (UploadedFile do Streamlit)
+
+    ⚡ Os bytes de cada arquivo só são copiados quando o motor pede a tarefa
+
+    Args:
+        uploaded_files: Arquivos com .name e .getvalue()
+
+    Yields:
+        (nome do arquivo, bytes da imagem)
+    """
+    for file_item in uploaded_files:
+        yield file_item.name, file_item.getvalue()
+
+
+def folder_tasks(paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Tarefas a partir de caminhos (ex.: ImageProcessor.get_image_files)
+
+    O arquivo é lido pelo próprio processo trabalhador: só o caminho trafega
+
+    Yields:
+        (caminho, caminho)
+    """
+    for path in paths:
+        yield path, path
+
+
+class FolderSink:
+    """Destino de lote: arquivos em uma pasta"""
+
+    def __init__(self, processor: ImageProcessor, dest_folder: str, output_format: Optional[str] = None,
+                 quality: int = 95, prefix: str = '', suffix: str = ''):
+        """
+        Args:
+            processor: Processador (grava resultados que chegam como imagem)
+            dest_folder: Pasta de destino
+            output_format: Formato de saída (None = mantém o original)
+            quality: Qualidade de codificação
+            prefix: Prefixo dos nomes
+            suffix: Sufixo dos nomes
+        """
+        self.processor = processor
+        self.dest_folder = dest_folder
+        self.output_format = output_format
+        self.quality = quality
+        self.prefix = prefix
+        self.suffix = suffix
+        self.paths: List[str] = []
+        os.makedirs(dest_folder, exist_ok=True)
+
+    def add(self, result: BatchResult) -> None:
+        """Grava o resultado (falhas são ignoradas)"""
+        if result.output_path is not None:
+            # Já gravado pelo processo trabalhador (BatchEngine com save_options)
+            path = result.output_path
+        elif result.encoded is not None:
+            path = ImageProcessor.get_output_path(
+                result.filename, self.dest_folder, result.encoded.format_ext, self.prefix, self.suffix
+            )
+            with open(path, 'wb') as f:
+                f.write(result.encoded.data)
+        elif result.image is not None:
+            path = self.processor.save_image(
+                result.image, result.filename, self.dest_folder, self.output_format,
+                self.quality, self.prefix, self.suffix
+            )
+        else:
+            return
+        self.paths.append(path)
+
+    def close(self) -> List[str]:
+        """Arquivos gravados, na ordem de entrada"""
+        return self.paths
+
+
+def stream_to_sink(results: Iterable[BatchResult], sink) -> Iterator[BatchResult]:
+    """
+    Entrega cada resultado ao destino assim que chega
+
+    Args:
+        results: Resultados do lote (ex.: BatchEngine.run)
+        sink: Destino com add(result) (ZipSink, FolderSink)
+
+    Yields:
+        O resultado sem imagem/bytes (nome, erro, qualidade e tempos)
+    """
+    for result in results:
+        sink.add(result)
+        yield result.without_output()
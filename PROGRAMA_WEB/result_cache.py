@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CACHE DE RESULTADOS EM DISCO
+Guarda as saídas já codificadas, endereçadas pelo hash de tudo que as define
+(imagem, overlay, texto, formato, qualidade): rodar o mesmo lote de novo só
+processa as imagens que mudaram
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from resize_strategy import DEFAULT_RESIZE_STRATEGY
+
+# Muda quando o pipeline passa a gerar pixels diferentes (invalida o cache antigo)
+RESULT_CACHE_VERSION = 1
+
+# Orçamento padrão do cache em disco
+RESULT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Ao estourar o limite, remove os mais antigos até ficar nesta fração dele
+RESULT_CACHE_LOW_WATERMARK = 0.9
+
+
+def default_cache_dir() -> str:
+    """Pasta do cache (IMAGE_LAYER_CACHE_DIR ou ~/.cache/image-layer/results)"""
+    return os.environ.get('IMAGE_LAYER_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'image-layer', 'results'
+    )
+
+
+class ResultCache:
+    """Saídas codificadas em disco, com limite de tamanho e remoção LRU"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Pasta do cache (None = default_cache_dir())
+            max_bytes: Tamanho máximo somado dos arquivos do cache
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Ocupação mantida a cada gravação/remoção (varredura da pasta só na primeira vez)
+        self._total_bytes: Optional[int] = None
+        self._entries: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def settings_digest(
+        overlay_bytes: bytes,
+        keep_overlay_size: bool,
+        text_config: Optional[Dict],
+        quality: int,
+        max_bytes: Optional[int] = None,
+        resize_strategy: Optional[str] = None,
+        encoder: Optional[str] = None
+    ) -> str:
+        """
+        Hash das configurações comuns a todo o lote (calculado uma vez por lote)
+
+        Args:
+            overlay_bytes: Conteúdo do arquivo de overlay
+            keep_overlay_size: Manter resolução original do overlay
+            text_config: Configurações de texto (opcional)
+            quality: Qualidade de codificação
+            max_bytes: Tamanho máximo por arquivo (opcional)
+            resize_strategy: Estratégia de redimensionamento (None = padrão)
+            encoder: Perfil de codificação (ENCODE_PROFILE ou SAVE_PROFILE): os mesmos
+                formato e qualidade geram bytes diferentes na interface e na CLI
+
+        Returns:
+            Hash hexadecimal
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(hashlib.blake2b(overlay_bytes, digest_size=20).digest())
+        settings = [RESULT_CACHE_VERSION, bool(keep_overlay_size), text_config or None, quality]
+        if max_bytes is not None:
+            settings.append(max_bytes)
+        if resize_strategy not in (None, DEFAULT_RESIZE_STRATEGY):
+            # O padrão fica fora da lista: resultados já em cache continuam valendo
+            settings.append({'resize': resize_strategy})
+        if encoder is not None:
+            settings.append({'encoder': encoder})
+        h.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+        return h.hexdigest()
+
+    @staticmethod
+    def key(settings: str, format_ext: str, source_bytes: bytes, label: Optional[str] = None) -> str:
+        """
+        Chave de uma imagem: configurações do lote + formato + conteúdo da entrada
+
+        Args:
+            settings: Resultado de settings_digest()
+            format_ext: Formato de saída ('webp', 'png', 'jpg'...)
+            source_bytes: Conteúdo do arquivo de entrada
+            label: Texto desta imagem, quando o texto tem campos por imagem
+
+        Returns:
+            Chave hexadecimal (também é o nome do arquivo no cache)
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(settings.encode('ascii'))
+        h.update(format_ext.lower().lstrip('.').replace('jpeg', 'jpg').encode('ascii'))
+        h.update(hashlib.blake2b(source_bytes, digest_size=20).digest())
+        if label is not None:
+            h.update(b'\0' + label.encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Subpastas pelos 2 primeiros caracteres (evita pastas com milhares de arquivos)
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def contains(self, key: str) -> bool:
+        """Existe no cache? (marca como usado recentemente)"""
+        try:
+            os.utime(self._path(key))
+            return True
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Bytes codificados guardados para a chave
+
+        Returns:
+            Conteúdo do arquivo de saída ou None se não estiver no cache
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # ⚡ mtime = último uso: a remoção LRU ordena por ele
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Guarda a saída codificada (gravação atômica) e aplica o limite de tamanho"""
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Arquivo temporário + os.replace: leitores nunca veem um arquivo pela metade
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+
+        self._ensure_totals()
+        with self._lock:
+            try:
+                self._total_bytes -= os.path.getsize(path)
+            except OSError:
+                self._entries += 1  # Entrada nova (não substitui uma existente)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * RESULT_CACHE_LOW_WATERMARK))
+
+    def _ensure_totals(self) -> None:
+        """Conta entradas e bytes da pasta uma vez (fora do lock: não bloqueia get/put)"""
+        if self._total_bytes is not None:
+            return
+        entries = self._scan()
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in entries)
+                self._entries = len(entries)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """(último uso, tamanho, caminho) de cada arquivo do cache"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self, target_bytes: int) -> None:
+        """Remove os arquivos usados há mais tempo até o cache caber em target_bytes"""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            count -= 1
+        self._total_bytes = total
+        self._entries = count
+
+    def clear(self) -> None:
+        """Apaga todo o conteúdo do cache"""
+        with self._lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+            self._entries = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        """
+        Acertos, falhas e ocupação do cache
+
+        ⚡ Sem varrer a pasta (chamado a cada rerun da interface): a ocupação vem dos
+        contadores deste processo. Gravações de outros processos na mesma pasta
+        (ex.: a CLI) só entram na contagem na próxima remoção LRU
+        """
+        self._ensure_totals()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': self._entries,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TRANSFERÊNCIA ENTRE PROCESSOS POR MEMÓRIA COMPARTILHADA
+O overlay é publicado uma vez pelo processo principal e mapeado (somente
+leitura) por todos os processos trabalhadores. Resultados em imagem voltam
+por um bloco compartilhado (uma cópia de memória de cada lado), em vez de
+serem serializados (pickle) e enviados pelo pipe do pool.
+"""
+
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+from PIL import Image
+from compiled_overlay import CompiledOverlay
+
+# Pasta da memória compartilhada POSIX (Linux); usada para checar o espaço livre
+SHARED_MEMORY_DIR = '/dev/shm'
+
+# Folga mínima deixada livre em SHARED_MEMORY_DIR (Docker usa 64 MB por padrão)
+SHARED_MEMORY_RESERVE = 16 * 1024 * 1024
+
+# Modos que Image.frombuffer mapeia sem cópia (bytes por pixel)
+_MAPPED_MODES = {'RGBA': 4, 'RGBX': 4, 'L': 1}
+
+def shared_memory_available(nbytes: int) -> bool:
+    """
+    Há espaço para um bloco de nbytes?
+
+    ⚡ Gravar além do espaço de /dev/shm derruba o processo (SIGBUS) em vez de
+    gerar um erro: sem espaço, a transferência volta ao caminho serializado
+    """
+    if not hasattr(os, 'statvfs') or not os.path.isdir(SHARED_MEMORY_DIR):
+        return True  # Sem /dev/shm (ex.: macOS, Windows): o sistema reserva o bloco na criação
+    try:
+        stat = os.statvfs(SHARED_MEMORY_DIR)
+    except OSError:
+        return False
+    return stat.f_bavail * stat.f_frsize >= nbytes + SHARED_MEMORY_RESERVE
+
+
+class _SharedBlock(shared_memory.SharedMemory):
+    """SharedMemory que pode ser descartado enquanto uma imagem ainda lê do bloco"""
+
+    def __del__(self):
+        # A imagem mantém a própria referência ao mapeamento (buffer exportado):
+        # ele só é desfeito quando ela deixar de existir
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+def _map_image(shm: shared_memory.SharedMemory, mode: str, size: Tuple[int, int]) -> Image.Image:
+    """Imagem sobre o bloco (somente leitura; sem cópia nos modos de _MAPPED_MODES)"""
+    return Image.frombuffer(mode, size, shm.buf, 'raw', mode, 0, 1)
+
+
+@dataclass(frozen=True)
+class SharedOverlayHandle:
+    """Referência ao overlay publicado (pequena: é o que vai para cada processo)"""
+    name: str
+    size: Tuple[int, int]
+    overlay: CompiledOverlay  # Análise sem pixels (CompiledOverlay.detached)
+
+
+class SharedOverlay:
+    """Pixels RGBA do overlay em memória compartilhada, publicados pelo processo principal"""
+
+    def __init__(self, overlay: CompiledOverlay):
+        """
+        Args:
+            overlay: Overlay já compilado (a análise também é enviada, sem recalcular)
+        """
+        data = overlay.image.tobytes()
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        self._shm.buf[:len(data)] = data
+        self.handle = SharedOverlayHandle(self._shm.name, overlay.size, overlay.detached())
+
+    @classmethod
+    def publish(cls, overlay: CompiledOverlay) -> Optional['SharedOverlay']:
+        """Publica o overlay, ou None sem espaço em memória compartilhada"""
+        nbytes = overlay.width * overlay.height * 4
+        if not shared_memory_available(nbytes):
+            return None
+        try:
+            return cls(overlay)
+        except OSError:
+            return None
+
+    def close(self) -> None:
+        """Remove o bloco (processos que já o mapearam continuam lendo até terminarem)"""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def attach_overlay(handle: SharedOverlayHandle) -> CompiledOverlay:
+    """
+    Overlay compilado sobre os pixels publicados (dentro do processo trabalhador)
+
+    ⚡ Sem decodificar o PNG nem refazer hash/análise em cada processo, e uma
+    única cópia dos pixels na memória para todos eles
+    """
+    # Os processos do pool usam o mesmo resource_tracker do principal: abrir o
+    # bloco não muda quem o remove (o processo que o publicou)
+    shm = _SharedBlock(name=handle.name)
+    return handle.overlay.attach(_map_image(shm, 'RGBA', handle.size), buffer_owner=shm)
+
+
+@dataclass(frozen=True)
+class SharedImage:
+    """Resultado gravado em memória compartilhada pelo processo trabalhador"""
+    name: str
+    mode: str
+    size: Tuple[int, int]
+
+
+def share_image(image: Image.Image) -> Optional[SharedImage]:
+    """
+    Copia os pixels do resultado para um bloco novo (processo trabalhador)
+
+    Returns:
+        Referência ao bloco, ou None sem espaço (o resultado segue pelo pickle)
+    """
+    mapped = image.mode in _MAPPED_MODES
+    if mapped:
+        nbytes = image.width * image.height * _MAPPED_MODES[image.mode]
+    else:
+        data = image.tobytes()
+        nbytes = len(data)
+
+    if not shared_memory_available(nbytes):
+        return None
+    try:
+        shm = _SharedBlock(create=True, size=max(nbytes, 1))
+    except OSError:
+        return None
+
+    if mapped:
+        # ⚡ Cópia única, direto para o bloco (sem o tobytes intermediário). A imagem
+        # sobre o bloco nasce somente leitura; o bloco é nosso e gravável
+        target = _map_image(shm, image.mode, image.size)
+        target.readonly = 0
+        target.paste(image, (0, 0))
+        del target
+    else:
+        shm.buf[:nbytes] = data
+    shared = SharedImage(shm.name, image.mode, image.size)
+    # O bloco continua registrado no resource_tracker: se o processo principal
+    # morrer antes de abri-lo, ele é removido no encerramento
+    shm.close()
+    return shared
+
+
+def open_shared_image(shared: SharedImage) -> Image.Image:
+    """
+    Resultado a partir do bloco (processo principal)
+
+    Os pixels são copiados para uma imagem própria (gravável) e o bloco é
+    fechado e removido na hora: mantido mapeado, cada resultado prenderia um
+    descritor de arquivo e as páginas de /dev/shm enquanto a sessão existir
+    """
+    shm = shared_memory.SharedMemory(name=shared.name)
+    try:
+        mapped = _map_image(shm, shared.mode, shared.size)
+        image = mapped.copy()
+        del mapped  # Libera o buffer exportado antes do close
+    finally:
+        shm.close()
+        shm.unlink()
+    return image
+
+
+def release_shared_image(shared: SharedImage) -> None:
+    """Remove o bloco de um resultado que não será aberto (ex.: lote cancelado)"""
+    try:
+        shm = _SharedBlock(name=shared.name)
+    except FileNotFoundError:
+        return
+    shm.unlink()
+    shm.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TEMPOS POR ETAPA
+Registra quanto cada imagem passa em decodificação, conversão, redimensionamento,
+composição, texto e codificação, com exportação em JSON/CSV
+"""
+
+import csv
+import io
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+# Etapas do pipeline, na ordem em que acontecem
+STAGES = ('decode', 'convert', 'resize', 'composite', 'text', 'encode')
+
+
+@dataclass
+class StageTimings:
+    """Tempos (segundos) e bytes de uma imagem"""
+    filename: str = ''
+    stages: Dict[str, float] = field(default_factory=dict)
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Soma o tempo do bloco à etapa indicada"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Soma um tempo já medido à etapa (ex.: fração de uma operação em grupo)"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def to_dict(self) -> Dict:
+        row = {'filename': self.filename}
+        row.update({f"{stage}_ms": round(self.stages.get(stage, 0.0) * 1000, 2) for stage in STAGES})
+        # Etapas extras (ex.: transferência entre processos) também são exportadas
+        row.update({f"{stage}_ms": round(value * 1000, 2)
+                    for stage, value in self.stages.items() if stage not in STAGES})
+        row.update({
+            'total_ms': round(self.total * 1000, 2),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        })
+        return row
+
+
+@contextmanager
+def measure(timings: Optional[StageTimings], stage: str) -> Iterator[None]:
+    """Como StageTimings.measure, mas sem custo quando timings é None"""
+    if timings is None:
+        yield
+    else:
+        with timings.measure(stage):
+            yield
+
+
+def summarize(all_timings: List[StageTimings]) -> List[Dict]:
+    """
+    Tabela por etapa: tempo total, média por imagem e fração do tempo
+
+    Args:
+        all_timings: Tempos de cada imagem do lote
+
+    Returns:
+        Lista de linhas (uma por etapa)
+    """
+    stage_names = list(STAGES) + sorted({stage for t in all_timings for stage in t.stages} - set(STAGES))
+    totals = {stage: sum(t.stages.get(stage, 0.0) for t in all_timings) for stage in stage_names}
+    grand_total = sum(totals.values()) or 1.0
+    count = max(len(all_timings), 1)
+
+    return [
+        {
+            'etapa': stage,
+            'total_s': round(totals[stage], 3),
+            'media_ms': round(totals[stage] / count * 1000, 2),
+            'percentual': round(totals[stage] / grand_total * 100, 1)
+        }
+        for stage in stage_names
+    ]
+
+
+def slowest(all_timings: List[StageTimings], count: int = 5) -> List[Dict]:
+    """As imagens mais lentas do lote"""
+    ranked = sorted(all_timings, key=lambda t: t.total, reverse=True)
+    return [t.to_dict() for t in ranked[:count]]
+
+
+def to_json(all_timings: List[StageTimings]) -> str:
+    """Exporta resumo e tempos por imagem em JSON"""
+    return json.dumps({
+        'resumo': summarize(all_timings),
+        'imagens': [t.to_dict() for t in all_timings]
+    }, indent=2, ensure_ascii=False)
+
+
+def to_csv(all_timings: List[StageTimings]) -> str:
+    """Exporta os tempos por imagem em CSV (uma linha por imagem)"""
+    rows = [t.to_dict() for t in all_timings]
+    if not rows:
+        return ''
+
+    fieldnames = list(rows[0].keys())
+    for row in rows[1:]:
+        fieldnames.extend(key for key in row if key not in fieldnames)
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, restval=0)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
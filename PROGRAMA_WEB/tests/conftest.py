@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Os módulos do app são importados direto da pasta PROGRAMA_WEB (ex.: from image_processor import ...)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Testes da CLI de lote"""
+
+from PIL import Image
+
+from batch_cli import build_parser, run
+
+
+def make_folders(tmp_path):
+    input_dir = tmp_path / 'entrada'
+    input_dir.mkdir()
+    for idx in range(3):
+        Image.new('RGB', (300, 200), (idx * 60, 90, 150)).save(input_dir / f"foto_{idx}.png")
+    overlay = tmp_path / 'overlay.png'
+    Image.new('RGBA', (150, 150), (255, 0, 0, 96)).save(overlay)
+    return str(input_dir), str(overlay), str(tmp_path / 'saida')
+
+
+def run_cli(*argv) -> int:
+    return run(build_parser().parse_args([*argv, '--workers', '1', '--no-cache', '--quiet']))
+
+
+def skipped_count(capsys) -> int:
+    line = next(line for line in capsys.readouterr().out.splitlines() if 'para processar' in line)
+    return int(line.split(', ')[1].split()[0])
+
+
+def test_changed_settings_reprocess_outputs(tmp_path, capsys):
+    folders = make_folders(tmp_path)
+
+    assert run_cli(*folders) == 0
+    assert skipped_count(capsys) == 0
+
+    assert run_cli(*folders) == 0
+    assert skipped_count(capsys) == 3
+
+    for options in (['--keep-overlay-size'], ['--keep-overlay-size', '--resize', 'fast'], ['--max-kb', '50']):
+        assert run_cli(*folders, *options) == 0
+        assert skipped_count(capsys) == 0
+        assert run_cli(*folders, *options) == 0
+        assert skipped_count(capsys) == 3
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Testes do BatchEngine: ordem dos resultados e falhas por imagem"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from batch_engine import BatchEngine
+from image_processor import ImageProcessor
+
+OVERLAY_SIZE = (120, 90)
+TEXT_CONFIG = {'text': 'Lote', 'size': 20, 'position': 'inferior_direita', 'bg_enabled': True}
+BROKEN = {3, 7}  # Entradas que não são imagens
+
+# (workers, max_in_flight, shared_memory): no próprio processo e no pool, com janela
+# menor que o lote (as tarefas seguintes só entram quando um resultado é entregue)
+ENGINES = {
+    'inline': (1, None, True),
+    'pool': (2, 2, True),
+    'pool_pickle': (2, 3, False)
+}
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def overlay_bytes() -> bytes:
+    overlay = Image.new('RGBA', OVERLAY_SIZE, (0, 0, 0, 0))
+    overlay.paste((255, 255, 255, 160), (0, 0, OVERLAY_SIZE[0], 12))
+    return encode_png(overlay)
+
+
+def make_tasks(count: int):
+    """Bases de tamanhos variados (umas demoram mais que outras) com cor única por índice"""
+    tasks = []
+    for idx in range(count):
+        if idx in BROKEN:
+            tasks.append((f"quebrada_{idx}.jpg", b'isto nao e uma imagem'))
+        else:
+            size = (OVERLAY_SIZE[0] * (1 + idx % 4 * 3), OVERLAY_SIZE[1] * (1 + idx % 4 * 3))
+            tasks.append((f"foto_{idx}.png", encode_png(Image.new('RGB', size, (idx * 20, 255 - idx * 20, 90)))))
+    return tasks
+
+
+@pytest.mark.parametrize('engine_name', list(ENGINES))
+def test_results_in_input_order_with_failures(overlay_bytes, engine_name):
+    workers, max_in_flight, shared_memory = ENGINES[engine_name]
+    tasks = make_tasks(10)
+    engine = BatchEngine(overlay_bytes, text_config=TEXT_CONFIG, workers=workers,
+                         max_in_flight=max_in_flight, shared_memory=shared_memory)
+
+    # Gerador: a entrada é consumida aos poucos
+    results = list(engine.run(task for task in tasks))
+
+    processor = ImageProcessor()
+    overlay = processor.compile_overlay(overlay_bytes)
+    assert [result.index for result in results] == list(range(len(tasks)))
+    assert [result.filename for result in results] == [filename for filename, _ in tasks]
+    for result, (_, data) in zip(results, tasks):
+        if result.index in BROKEN:
+            assert not result.ok
+            assert result.error and result.image is None
+        else:
+            assert result.ok, result.error
+            expected = processor.process_source(data, overlay, TEXT_CONFIG)
+            assert result.image.tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize('engine_name', list(ENGINES))
+def test_encoded_results_in_input_order(overlay_bytes, engine_name):
+    workers, max_in_flight, shared_memory = ENGINES[engine_name]
+    tasks = make_tasks(6)
+    engine = BatchEngine(overlay_bytes, workers=workers, output_format='png',
+                         max_in_flight=max_in_flight, shared_memory=shared_memory)
+
+    results = list(engine.run(tasks))
+
+    assert [result.index for result in results] == list(range(len(tasks)))
+    assert [result.ok for result in results] == [idx not in BROKEN for idx in range(len(tasks))]
+    for result, (_, data) in zip(results, tasks):
+        if result.ok:
+            color = Image.open(io.BytesIO(data)).getpixel((0, 0))
+            decoded = Image.open(io.BytesIO(result.encoded.data)).convert('RGB')
+            # Fora da faixa do overlay (no centro) a cor da base fica intacta
+            assert decoded.getpixel((decoded.width // 2, decoded.height // 2)) == color
+
+
+def test_all_failures_are_reported(overlay_bytes):
+    tasks = [(f"{idx}.png", b'') for idx in range(5)]
+    results = list(BatchEngine(overlay_bytes, workers=2, max_in_flight=2).run(tasks))
+    assert [result.index for result in results] == list(range(5))
+    assert not any(result.ok for result in results)
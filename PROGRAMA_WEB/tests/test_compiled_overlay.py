@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Testes do overlay compilado"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from compiled_overlay import FRAME, OPAQUE, PARTIAL, TRANSPARENT, CompiledOverlay
+
+
+def make_overlay(size=(300, 200)) -> Image.Image:
+    """Moldura semitransparente com gradiente (bordas com alpha parcial)"""
+    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for step in range(20):
+        draw.rectangle((step, step, size[0] - 1 - step, size[1] - 1 - step),
+                       outline=(step * 12, 80, 255 - step * 12, 255 - step * 10))
+    draw.ellipse((120, 70, 180, 130), fill=(255, 255, 0, 128))
+    return overlay
+
+
+@pytest.mark.parametrize('size', [(150, 100), (97, 61), (600, 400), (300, 50)])
+def test_resized_matches_direct_lanczos(size):
+    overlay = make_overlay()
+    expected = overlay.resize(size, Image.Resampling.LANCZOS)
+    assert CompiledOverlay(overlay).resized(size).tobytes() == expected.tobytes()
+
+
+def test_resized_to_own_size_returns_pixels():
+    compiled = CompiledOverlay(make_overlay())
+    assert compiled.resized(compiled.size) is compiled.image
+
+
+@pytest.mark.parametrize('color, classification', [
+    ((255, 0, 0, 255), OPAQUE),
+    ((255, 0, 0, 0), TRANSPARENT),
+    ((255, 0, 0, 100), PARTIAL),
+])
+def test_classification(color, classification):
+    assert CompiledOverlay(Image.new('RGBA', (90, 90), color)).classification == classification
+
+
+def test_frame_classification():
+    assert CompiledOverlay(make_overlay()).classification == PARTIAL  # Elipse no miolo
+    frame = make_overlay()
+    frame.paste((0, 0, 0, 0), (30, 30, 270, 170))
+    assert CompiledOverlay(frame).classification == FRAME
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Testes do cache de glifos (referência: ImageDraw.text no layout básico)"""
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from caches import BoundedLRUCache
+from glyph_cache import GLYPH_CACHE_MAX_BYTES, GlyphRenderer, supports_glyph_cache
+from image_processor import ImageProcessor
+
+TEXTS = [
+    'SKU-00123 R$ 49,90',
+    'AVAWAY To Ta Yo LT',  # Pares com kerning
+    'fffi ||| ...',  # Glifos que se sobrepõem
+    'Ação Jóia Über ñ',
+    ' espaços  nas pontas ',
+    'x'
+]
+
+
+@pytest.fixture(scope='module')
+def font_path() -> str:
+    path = ImageProcessor().default_font
+    if not path:
+        pytest.skip('Nenhuma fonte TrueType instalada')
+    return path
+
+
+def make_renderer(path, size, max_bytes=GLYPH_CACHE_MAX_BYTES) -> GlyphRenderer:
+    font = ImageFont.truetype(path, size, layout_engine=ImageFont.Layout.BASIC)
+    assert supports_glyph_cache(font)
+    return GlyphRenderer(font, (path, size), BoundedLRUCache(max_bytes, sizeof=lambda glyph: glyph.nbytes))
+
+
+def draw_text(font, size, xy, text) -> Image.Image:
+    mask = Image.new('L', size)
+    ImageDraw.Draw(mask).text(xy, text, font=font, fill=255)
+    return mask
+
+
+@pytest.mark.parametrize('font_size', [9, 17, 40, 73])
+@pytest.mark.parametrize('text', TEXTS)
+def test_matches_draw_text(font_path, font_size, text):
+    renderer = make_renderer(font_path, font_size)
+    canvas = (font_size * len(text) + 40, font_size * 2 + 20)
+    for xy in [(10, 5), (13, 9)]:
+        expected = draw_text(renderer.font, canvas, xy, text)
+        mask = Image.new('L', canvas)
+        renderer.draw(mask, xy, text)
+        assert mask.tobytes() == expected.tobytes(), (text, font_size, xy)
+
+
+def test_matches_draw_text_with_evictions(font_path):
+    # Cache menor que um glifo: tudo é rasterizado de novo a cada uso
+    renderer = make_renderer(font_path, 40, max_bytes=1)
+    text = TEXTS[0] * 2
+    canvas = (40 * len(text), 100)
+    mask = Image.new('L', canvas)
+    renderer.draw(mask, (10, 10), text)
+    assert mask.tobytes() == draw_text(renderer.font, canvas, (10, 10), text).tobytes()
+
+
+def test_bitmap_font_is_not_supported():
+    assert not supports_glyph_cache(ImageFont.load_default_imagefont())
+
+
+@pytest.mark.parametrize('bg_enabled', [False, True])
+@pytest.mark.parametrize('text', TEXTS)
+def test_sprite_matches_draw_text_fallback(font_path, monkeypatch, text, bg_enabled):
+    processor = ImageProcessor()
+    config = {'text': text, 'size': 32, 'color': '#33AAFF', 'opacity': 65, 'bg_enabled': bg_enabled}
+    if not supports_glyph_cache(processor.get_font(32)):
+        pytest.skip('Fonte padrão sem layout básico (raqm)')
+
+    with_glyphs = processor._render_text_sprite(text, 32, config)
+    monkeypatch.setattr(processor, 'get_glyph_renderer', lambda font_size: None)
+    fallback = processor._render_text_sprite(text, 32, config)
+
+    assert with_glyphs.offset == fallback.offset
+    assert with_glyphs.image.tobytes() == fallback.image.tobytes()
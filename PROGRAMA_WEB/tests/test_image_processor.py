@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Testes de regressão do ImageProcessor"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from image_processor import ImageProcessor
+
+BASE_SIZE = (2000, 1500)
+OVERLAY_SIZE = (200, 150)
+
+
+def encode_png(mode: str) -> bytes:
+    """PNG grande o bastante para a redução inteira do modo "cover" ser usada"""
+    image = Image.linear_gradient('L').resize(BASE_SIZE)
+    if mode == 'I;16':
+        image = image.point(lambda value: value * 200, 'I').convert('I;16')
+    elif mode != 'L':
+        image = image.convert(mode)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def processor() -> ImageProcessor:
+    return ImageProcessor()
+
+
+@pytest.fixture(scope='module')
+def overlay() -> Image.Image:
+    return Image.new('RGBA', OVERLAY_SIZE, (255, 0, 0, 128))
+
+
+@pytest.mark.parametrize('mode', ['P', '1', 'I;16', 'L', 'RGB'])
+def test_cover_mode_accepts_any_png_mode(processor, overlay, mode):
+    result = processor.process_source(encode_png(mode), overlay, None, True)
+    assert result.size == OVERLAY_SIZE
+    assert result.mode == 'RGBA'
+
+
+@pytest.mark.parametrize('mode', ['P', '1', 'I;16'])
+def test_open_for_cover_reduces_unsupported_modes(processor, mode):
+    base = processor.open_for_cover(encode_png(mode), OVERLAY_SIZE)
+    assert base.info['source_size'] == BASE_SIZE
+    assert base.width < BASE_SIZE[0] and base.width >= OVERLAY_SIZE[0]
+
+
+@pytest.mark.parametrize('keep_overlay_size', [False, True])
+@pytest.mark.parametrize('mode', ['P', '1', 'I;16'])
+def test_preview_accepts_any_png_mode(processor, overlay, mode, keep_overlay_size):
+    preview = processor.render_preview(encode_png(mode), overlay, None, keep_overlay_size, max_side=500)
+    expected = OVERLAY_SIZE if keep_overlay_size else (500, 375)
+    assert preview.size == expected
+
+
+def test_preview_reuses_decoded_base(processor, overlay):
+    data = encode_png('RGB')
+    text = {'text': 'PROMO', 'size': 40}
+    first = processor.render_preview(data, overlay, text, max_side=500)
+    hits = processor.preview_base_cache.hits
+    second = processor.render_preview(io.BytesIO(data), overlay, text, max_side=500)
+    assert processor.preview_base_cache.hits == hits + 1
+    assert first.tobytes() == second.tobytes()
+
+
+def test_overlay_path_is_compiled_once(processor, tmp_path):
+    path = tmp_path / 'moldura.png'
+    Image.new('RGBA', (120, 90), (0, 0, 255, 200)).save(path)
+
+    compiled = processor.compile_overlay(str(path))
+    assert processor.compile_overlay(str(path)) is compiled
+    assert processor.compile_overlay(path.read_bytes()) is compiled
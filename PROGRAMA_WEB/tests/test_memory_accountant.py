@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Testes da contabilidade de memória por sessão"""
+
+from collections import OrderedDict
+
+from PIL import Image
+
+from image_processor import EncodedImage
+from memory_accountant import MemoryAccountant
+
+IMAGE_NBYTES = 600 * 500 * 3
+
+
+def session(accountant, color, count=6):
+    results = [(Image.new('RGB', (600, 500), color), f"{idx}.png") for idx in range(count)]
+    ledger = accountant.ledger()
+    ledger.track_results(results)
+    ledger.track_encoded(OrderedDict())
+    ledger.set_encoding('png', 95)
+    return ledger, results
+
+
+def test_other_sessions_only_receive_a_shrink_request():
+    accountant = MemoryAccountant(session_max_bytes=10 * IMAGE_NBYTES, global_max_bytes=8 * IMAGE_NBYTES)
+    ledger_a, results_a = session(accountant, (200, 0, 0), count=8)
+    ledger_b, results_b = session(accountant, (0, 200, 0))
+
+    accountant.enforce(ledger_a)  # Sozinha ainda cabe no limite global
+    assert all(isinstance(item, Image.Image) for item, _ in results_a)
+
+    # B passa o total do limite: A (a maior) só recebe o pedido, B não precisa reduzir
+    accountant.enforce(ledger_b)
+    assert all(isinstance(item, Image.Image) for item, _ in results_a + results_b)
+    assert accountant.stats()['shrink_requests'] == 1
+
+    # No próximo rerun, A atende o pedido com os próprios objetos
+    accountant.enforce(ledger_a)
+    assert any(isinstance(item, EncodedImage) for item, _ in results_a)
+    assert not ledger_a.shrink_requested
+    assert accountant.stats()['bytes'] <= accountant.global_max_bytes
+
+
+def test_encoding_runs_outside_the_locks():
+    accountant = MemoryAccountant(session_max_bytes=2 * IMAGE_NBYTES)
+    ledger, _ = session(accountant, (0, 0, 200))
+    encode_result = accountant.processor.encode_result
+    held = []
+
+    def checked_encode(*args, **kwargs):
+        held.append(accountant._lock.locked() or ledger._lock._is_owned())
+        return encode_result(*args, **kwargs)
+
+    accountant.processor.encode_result = checked_encode
+    try:
+        accountant.enforce(ledger)
+    finally:
+        del accountant.processor.encode_result
+
+    assert held and not any(held)
+    assert ledger.reported_nbytes <= accountant.session_max_bytes
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Testes da composição por regiões (referência: Image.alpha_composite)"""
+
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from overlay_analysis import TILE_SIZE, analyze_overlay, composite_with_plan
+
+SIZE = (300, 220)  # Não múltiplo de TILE_SIZE: blocos parciais nas bordas
+
+
+def noise(size, alpha_values, seed) -> Image.Image:
+    rng = random.Random(seed)
+    pixels = bytes(
+        value
+        for _ in range(size[0] * size[1])
+        for value in (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice(alpha_values))
+    )
+    return Image.frombytes('RGBA', size, pixels)
+
+
+def frame(size=SIZE) -> Image.Image:
+    overlay = noise(size, [0, 128, 255], seed=1)
+    overlay.paste((0, 0, 0, 0), (TILE_SIZE, TILE_SIZE, size[0] - TILE_SIZE, size[1] - TILE_SIZE))
+    return overlay
+
+
+def badge() -> Image.Image:
+    """Selo opaco com borda suave em um canto (blocos opacos, parciais e vazios)"""
+    overlay = Image.new('RGBA', SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.rectangle((150, 10, 290, 150), fill=(250, 30, 30, 255))
+    draw.ellipse((10, 140, 80, 210), fill=(0, 0, 255, 140))
+    return overlay
+
+
+OVERLAYS = {
+    'frame': frame,
+    'large_frame': lambda: frame((700, 520)),
+    'partial': lambda: noise(SIZE, [0, 1, 90, 254, 255], seed=2),
+    'opaque': lambda: noise(SIZE, [255], seed=3),
+    'transparent': lambda: Image.new('RGBA', SIZE, (10, 20, 30, 0)),
+    'badge': badge,
+}
+
+
+@pytest.mark.parametrize('name', list(OVERLAYS))
+@pytest.mark.parametrize('base_alphas', [[255], [0, 70, 255]])
+@pytest.mark.parametrize('in_place', [False, True])
+def test_matches_alpha_composite(name, base_alphas, in_place):
+    overlay = OVERLAYS[name]()
+    base = noise(overlay.size, base_alphas, seed=5)
+    expected = Image.alpha_composite(base, overlay).tobytes()
+
+    result = composite_with_plan(base.copy() if in_place else base, overlay, analyze_overlay(overlay), in_place)
+    assert result.tobytes() == expected
+
+
+def test_sparse_overlays_skip_transparent_tiles():
+    assert analyze_overlay(frame((1280, 960))).is_sparse
+    assert analyze_overlay(Image.new('RGBA', SIZE, (0, 0, 0, 0))).transparent_fraction == 1
+    badge_plan = analyze_overlay(badge())
+    assert badge_plan.opaque_boxes and badge_plan.blend_boxes
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Testes do cache de resultados em disco"""
+
+import io
+
+from PIL import Image
+
+from batch_engine import BatchEngine
+from image_processor import ImageProcessor
+from result_cache import ResultCache
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_interface_and_cli_outputs_do_not_share_cache_entries(tmp_path):
+    overlay = encode(Image.new('RGBA', (320, 240), (255, 0, 0, 96)), 'PNG')
+    source = encode(Image.radial_gradient('L').resize((320, 240)).convert('RGB'), 'PNG')
+    tasks = [('foto.png', source)]
+    cache = ResultCache(str(tmp_path / 'cache'))
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'expected').mkdir()
+
+    # Interface: resultado codificado em memória (perfil rápido)
+    interface = BatchEngine(overlay, workers=1, output_format='jpg', quality=90, result_cache=cache)
+    encoded = next(interface.run(tasks)).encoded.data
+
+    # CLI: arquivo gravado com save_image (perfil de arquivo), mesmo cache
+    options = {'dest_folder': str(tmp_path / 'out'), 'output_format': 'jpg', 'quality': 90}
+    cli = BatchEngine(overlay, workers=1, save_options=options, result_cache=cache)
+    result = next(cli.run(tasks))
+    assert 'cache' not in result.timings.stages
+
+    processor = ImageProcessor()
+    expected = processor.save_image(
+        processor.process_source(source, processor.compile_overlay(overlay)),
+        'foto.png', str(tmp_path / 'expected'), 'jpg', 90
+    )
+    with open(result.output_path, 'rb') as written, open(expected, 'rb') as reference:
+        assert written.read() == reference.read()
+    assert encoded != open(expected, 'rb').read()
+
+
+def test_stats_are_kept_without_scanning_the_folder(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), max_bytes=4000)
+    cache.stats()  # Primeira contagem: varre a pasta (vazia)
+
+    def no_scan():
+        raise AssertionError("stats() não deve varrer a pasta")
+    monkeypatch.setattr(cache, '_scan', no_scan)
+    for idx in range(5):
+        cache.put(f"{idx:040x}", b'x' * 100)
+    cache.put(f"{0:040x}", b'y' * 50)  # Substitui uma entrada
+    assert (cache.stats()['entries'], cache.stats()['bytes']) == (5, 450)
+
+    monkeypatch.undo()
+    for idx in range(5, 60):
+        cache.put(f"{idx:040x}", b'z' * 100)  # Passa do limite: remoção LRU
+    entries = cache._scan()
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes']) == (len(entries), sum(size for _, size, _ in entries))
+    assert stats['bytes'] <= 4000
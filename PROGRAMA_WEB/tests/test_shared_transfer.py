@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Testes da transferência por memória compartilhada"""
+
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from batch_engine import BatchEngine
+from shared_transfer import open_shared_image, share_image
+
+FD_DIR = '/proc/self/fd'
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(FD_DIR), reason="sem /proc/self/fd")
+
+
+def open_fds() -> int:
+    return len(os.listdir(FD_DIR))
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_shared_results_do_not_leak_file_descriptors():
+    overlay = encode_png(Image.new('RGBA', (160, 120), (255, 0, 0, 90)))
+    tasks = [(f"{idx}.png", encode_png(Image.new('RGB', (160, 120), (idx * 10, 0, 0)))) for idx in range(12)]
+    engine = BatchEngine(overlay, workers=2, max_in_flight=2, shared_memory=True)
+
+    list(engine.run(tasks))  # Aquecimento (resource_tracker, imports)
+    before = open_fds()
+    for _ in range(2):
+        results = list(engine.run(tasks))
+        assert all(result.ok for result in results)
+        assert not any(result.image.readonly for result in results)
+    assert open_fds() <= before
+
+
+def test_opened_image_is_private_and_block_is_removed():
+    image = Image.new('RGBA', (64, 48), (1, 2, 3, 4))
+    shared = share_image(image)
+    if shared is None:
+        pytest.skip("sem espaço em memória compartilhada")
+
+    before = open_fds()
+    opened = open_shared_image(shared)
+    assert open_fds() == before
+    assert opened.tobytes() == image.tobytes()
+    opened.putpixel((0, 0), (9, 9, 9, 9))  # Gravável
+    assert not os.path.exists(os.path.join('/dev/shm', shared.name.lstrip('/')))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Testes do texto sobre a imagem (referência: camada do tamanho da imagem + alpha_composite)"""
+
+import random
+
+import pytest
+from PIL import Image
+
+from image_processor import TEXT_MARGIN, ImageProcessor
+
+POSITIONS = ['superior_esquerda', 'superior_direita', 'inferior_esquerda', 'inferior_direita', 'centro', 'desconhecida']
+
+
+@pytest.fixture(scope='module')
+def processor() -> ImageProcessor:
+    return ImageProcessor()
+
+
+def noise(size, seed=7) -> Image.Image:
+    """Base com cores e transparências variadas (a mistura precisa bater em todo pixel)"""
+    rng = random.Random(seed)
+    pixels = bytes(
+        value
+        for _ in range(size[0] * size[1])
+        for value in (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice([0, 90, 255]))
+    )
+    return Image.frombytes('RGBA', size, pixels)
+
+
+def reference(processor, image, config) -> Image.Image:
+    """Implementação direta: cola o rótulo em uma camada transparente do tamanho da imagem"""
+    sprite = processor.get_text_sprite(config)
+    bbox = sprite.bbox
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    padding = round(TEXT_MARGIN * config.get('scale', 1.0))
+    right = image.width - text_width - padding
+    bottom = image.height - text_height - padding
+    x, y = {
+        'superior_direita': (right, padding),
+        'inferior_esquerda': (padding, bottom),
+        'inferior_direita': (right, bottom),
+        'centro': ((image.width - text_width) // 2, (image.height - text_height) // 2)
+    }.get(config['position'], (padding, padding))
+
+    layer = Image.new('RGBA', image.size, (255, 255, 255, 0))
+    layer.paste(sprite.image, (x + sprite.offset[0], y + sprite.offset[1]))
+    return Image.alpha_composite(image, layer)
+
+
+def make_config(position, bg_enabled, **extra) -> dict:
+    config = {
+        'text': 'Agência Jóia 2024',
+        'size': 36,
+        'color': '#FFCC00',
+        'opacity': 80,
+        'position': position,
+        'bg_enabled': bg_enabled,
+        'bg_color': '#102030',
+        'bg_opacity': 70
+    }
+    config.update(extra)
+    return config
+
+
+@pytest.mark.parametrize('bg_enabled', [False, True])
+@pytest.mark.parametrize('position', POSITIONS)
+def test_matches_full_layer_composite(processor, position, bg_enabled):
+    image = noise((480, 270))
+    config = make_config(position, bg_enabled)
+    expected = reference(processor, image, config).tobytes()
+
+    assert processor.add_text_overlay(image, config).tobytes() == expected
+    in_place = image.copy()
+    assert processor.add_text_overlay(in_place, config, in_place=True) is in_place
+    assert in_place.tobytes() == expected
+
+
+@pytest.mark.parametrize('bg_enabled', [False, True])
+@pytest.mark.parametrize('position', POSITIONS)
+def test_label_larger_than_image_is_clipped(processor, position, bg_enabled):
+    image = noise((90, 40), seed=8)
+    config = make_config(position, bg_enabled, size=48)
+    assert processor.add_text_overlay(image, config).tobytes() == reference(processor, image, config).tobytes()
+
+
+@pytest.mark.parametrize('position', POSITIONS)
+def test_preview_scale(processor, position):
+    image = noise((240, 135), seed=9)
+    config = make_config(position, True, scale=0.5)
+    assert processor.add_text_overlay(image, config).tobytes() == reference(processor, image, config).tobytes()
+
+
+def test_copy_leaves_original_untouched(processor):
+    image = noise((200, 100))
+    before = image.tobytes()
+    processor.add_text_overlay(image, make_config('centro', True))
+    assert image.tobytes() == before
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Testes da composição vetorizada (referência: Image.alpha_composite)"""
+
+import random
+
+import pytest
+from PIL import Image
+
+from overlay_analysis import analyze_overlay
+from vector_composite import HAS_NUMPY, composite_stack
+
+pytestmark = pytest.mark.skipif(not HAS_NUMPY, reason="NumPy não instalado")
+
+SIZE = (160, 120)
+
+
+def noise(size, alpha_values, seed) -> Image.Image:
+    rng = random.Random(seed)
+    pixels = bytes(
+        value
+        for _ in range(size[0] * size[1])
+        for value in (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice(alpha_values))
+    )
+    return Image.frombytes('RGBA', size, pixels)
+
+
+def frame_overlay() -> Image.Image:
+    overlay = noise(SIZE, [0, 1, 128, 254, 255], seed=1)
+    overlay.paste((0, 0, 0, 0), (40, 30, 120, 90))
+    return overlay
+
+
+@pytest.mark.parametrize('overlay_alphas', [[0, 1, 128, 254, 255], [255], [0], [90]])
+@pytest.mark.parametrize('base_alphas', [[255], [0, 60, 255]])
+@pytest.mark.parametrize('use_plan', [False, True])
+def test_matches_alpha_composite(overlay_alphas, base_alphas, use_plan):
+    overlay = noise(SIZE, overlay_alphas, seed=2)
+    bases = [noise(SIZE, base_alphas, seed=10 + idx) for idx in range(3)]
+    plan = analyze_overlay(overlay) if use_plan else None
+
+    results = composite_stack(bases, overlay, plan)
+    for base, result in zip(bases, results):
+        assert result.tobytes() == Image.alpha_composite(base, overlay).tobytes()
+
+
+def test_frame_overlay_with_plan_and_small_stacks():
+    overlay = frame_overlay()
+    plan = analyze_overlay(overlay)
+    bases = [noise(SIZE, [255], seed=20 + idx) for idx in range(5)]
+    expected = [Image.alpha_composite(base, overlay).tobytes() for base in bases]
+
+    results = composite_stack(bases, overlay, plan, in_place=True, max_stack_bytes=1)
+    assert [result.tobytes() for result in results] == expected
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TEXTO POR IMAGEM
+O texto do lote pode ter campos trocados em cada imagem: {stem}, {name},
+{ext}, {index} e as colunas de uma planilha CSV ligada pelo nome do arquivo
+(ex.: {sku}, {preco}). Ex.: "{sku} - R$ {preco}" ou "Foto {index:03d}".
+"""
+
+import csv
+import io
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+# Campos disponíveis em todas as imagens (além das colunas do CSV)
+TEMPLATE_FIELDS = {
+    'stem': 'nome do arquivo sem extensão',
+    'name': 'nome do arquivo',
+    'ext': 'extensão (sem o ponto)',
+    'index': 'posição no lote (1, 2, 3...)'
+}
+
+
+class _Fields(dict):
+    """Campos de uma imagem; campos desconhecidos ficam como estão no texto ({campo})"""
+
+    def __missing__(self, key: str) -> str:
+        return '{' + key + '}'
+
+
+def has_placeholders(text: str) -> bool:
+    """O texto tem campos a preencher por imagem?"""
+    return '{' in text
+
+
+def load_label_table(data: Union[bytes, str]) -> Dict:
+    """
+    Lê a planilha de rótulos (CSV com ',' ou ';', cabeçalho na primeira linha)
+
+    A primeira coluna é o nome do arquivo (com ou sem extensão); as demais
+    viram campos do texto pelo nome do cabeçalho.
+
+    Args:
+        data: Conteúdo do arquivo CSV
+
+    Returns:
+        {'columns': [...], 'rows': {nome em minúsculas: {coluna: valor}}}
+
+    Raises:
+        ValueError: CSV sem cabeçalho ou sem linhas
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            data = data.decode('latin-1')  # Excel em português costuma salvar assim
+
+    try:
+        dialect = csv.Sniffer().sniff(data[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(io.StringIO(data), dialect)
+    header = [column.strip() for column in next(reader, [])]
+    if len(header) < 2:
+        raise ValueError("O CSV precisa de cabeçalho com a coluna do arquivo e ao menos um campo")
+
+    columns = header[1:]
+    rows = {}
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        values = dict(zip(columns, (value.strip() for value in row[1:])))
+        name = row[0].strip().lower()
+        rows[name] = values
+        rows.setdefault(Path(name).stem, values)  # Também casa com o arquivo em outro formato
+
+    if not rows:
+        raise ValueError("O CSV não tem nenhuma linha de dados")
+    return {'columns': columns, 'rows': rows}
+
+
+def render_label(template: str, filename: str, index: int, labels: Optional[Dict] = None) -> str:
+    """
+    Texto de uma imagem
+
+    Args:
+        template: Texto com campos (ex.: "{sku} - {stem}")
+        filename: Nome ou caminho do arquivo de entrada
+        index: Posição da imagem no lote (começando em 0)
+        labels: Planilha de load_label_table (opcional)
+
+    Returns:
+        Texto com os campos preenchidos (colunas sem linha para o arquivo ficam vazias)
+    """
+    path = Path(filename)
+    fields = _Fields(stem=path.stem, name=path.name, ext=path.suffix.lstrip('.'), index=index + 1)
+    if labels:
+        row = labels['rows'].get(path.name.lower()) or labels['rows'].get(path.stem.lower()) or {}
+        fields.update({column: row.get(column, '') for column in labels['columns']})
+
+    try:
+        return template.format_map(fields)
+    except (ValueError, IndexError, AttributeError, TypeError):
+        return template  # Chaves mal formadas: usar o texto como foi digitado
+
+
+def text_config_for(config: Optional[Dict], filename: str, index: int) -> Optional[Dict]:
+    """
+    text_config de uma imagem do lote (o próprio config se o texto não tem campos)
+
+    Args:
+        config: text_config do lote (a planilha vai em config['labels'])
+        filename: Nome ou caminho do arquivo de entrada
+        index: Posição da imagem no lote (começando em 0)
+    """
+    if not config or not has_placeholders(config.get('text', '')):
+        return config
+    resolved = {key: value for key, value in config.items() if key != 'labels'}
+    resolved['text'] = render_label(config['text'], filename, index, config.get('labels'))
+    return resolved
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MINIATURAS PARA AS GALERIAS
+Decodifica em escala reduzida, gera WEBP/JPEG pequenos e guarda em cache pelo
+hash do conteúdo (o mesmo arquivo nunca é reduzido duas vezes no processo)
+"""
+
+import hashlib
+import io
+from typing import Optional
+
+from PIL import Image
+from caches import BoundedLRUCache, MemoryBudget, process_budget
+
+# Maior lado das miniaturas das galerias (pixels)
+GALLERY_THUMBNAIL_SIZE = 320
+
+# Orçamento de memória do cache de miniaturas
+THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ThumbnailService:
+    """Gera e guarda miniaturas codificadas, endereçadas pelo conteúdo do arquivo"""
+
+    def __init__(
+        self,
+        max_side: int = GALLERY_THUMBNAIL_SIZE,
+        quality: int = 75,
+        max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES,
+        budget: Optional[MemoryBudget] = None
+    ):
+        """
+        Args:
+            max_side: Maior lado das miniaturas
+            quality: Qualidade WEBP/JPEG das miniaturas
+            max_bytes: Orçamento de memória do cache
+            budget: Orçamento comum a outros caches (ex.: process_budget)
+        """
+        self.max_side = max_side
+        self.quality = quality
+        self.cache = BoundedLRUCache(max_bytes, sizeof=len, budget=budget)
+
+    def get(self, data: bytes) -> bytes:
+        """
+        Miniatura de um arquivo de imagem
+
+        Args:
+            data: Conteúdo do arquivo (png, jpg, webp...)
+
+        Returns:
+            Bytes da miniatura (WEBP com transparência, JPEG sem)
+        """
+        key = (hashlib.blake2b(data, digest_size=16).hexdigest(), self.max_side, self.quality)
+        return self.cache.get_or_create(key, lambda: self._render(data))
+
+    def _render(self, data: bytes) -> bytes:
+        img = Image.open(io.BytesIO(data))
+
+        # ⚡ thumbnail() usa draft() no JPEG: decodifica direto em 1/2, 1/4 ou 1/8
+        img.thumbnail((self.max_side, self.max_side), Image.Resampling.BILINEAR)
+
+        buffer = io.BytesIO()
+        if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+            img.save(buffer, 'WEBP', quality=self.quality, method=0)
+        else:
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.save(buffer, 'JPEG', quality=self.quality)
+        return buffer.getvalue()
+
+
+# Instância compartilhada do processo (o cache vale para todas as sessões)
+thumbnail_service = ThumbnailService(budget=process_budget)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EXPORTAÇÃO EM ZIP
+ZIP gravado em arquivo temporário "spooled": fica em memória enquanto é
+pequeno e passa para o disco acima do limite, sem copiar o arquivo inteiro
+"""
+
+import io
+import os
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+from image_processor import ImageProcessor, EncodedImage
+
+# Acima deste tamanho o ZIP vai para o disco
+ZIP_SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+
+
+class _SpoolReader(io.RawIOBase):
+    """Leitura do arquivo temporário como fluxo binário comum (sem cópia)"""
+
+    def __init__(self, spool):
+        self._spool = spool
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._spool.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._spool.tell()
+
+    def readinto(self, buffer) -> int:
+        data = self._spool.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class ZipExport:
+    """ZIP pronto para download, em memória ou em arquivo temporário"""
+
+    def __init__(self, spool: tempfile.SpooledTemporaryFile, nbytes: int, spool_max_memory: int,
+                 report: Optional[List[Dict]] = None):
+        self._spool = spool
+        self.nbytes = nbytes
+        self.spool_max_memory = spool_max_memory
+        # Uma linha por arquivo: nome, qualidade usada, bytes e se coube no limite
+        self.report = report or []
+
+    @property
+    def on_disk(self) -> bool:
+        """O ZIP passou do limite e está em disco?"""
+        return self.nbytes > self.spool_max_memory
+
+    @property
+    def over_budget(self) -> List[Dict]:
+        """Arquivos que não couberam no tamanho máximo nem na qualidade mínima"""
+        return [row for row in self.report if not row['dentro_do_limite']]
+
+    def reader(self) -> io.BufferedReader:
+        """Fluxo de leitura do início do ZIP (aceito pelo st.download_button)"""
+        self._spool.seek(0)
+        return io.BufferedReader(_SpoolReader(self._spool))
+
+    def getvalue(self) -> bytes:
+        """Conteúdo completo em bytes (evitar em ZIPs grandes)"""
+        self._spool.seek(0)
+        return self._spool.read()
+
+    def close(self) -> None:
+        """Libera a memória/arquivo temporário"""
+        self._spool.close()
+
+
+class ZipSink:
+    """
+    Destino de lote: grava cada imagem codificada no ZIP assim que chega
+    ⚡ Nada fica acumulado: o lote pode ser bem maior que a memória
+    """
+
+    def __init__(self, format_ext: str, quality: int, prefix: str = '', suffix: str = '',
+                 max_bytes: Optional[int] = None, spool_max_memory: int = ZIP_SPOOL_MAX_MEMORY):
+        """
+        Args:
+            format_ext: Formato das imagens ('webp', 'png', 'jpg')
+            quality: Qualidade pedida (usada no relatório sem limite de tamanho)
+            prefix: Prefixo dos nomes no ZIP
+            suffix: Sufixo dos nomes no ZIP
+            max_bytes: Tamanho máximo por arquivo (só para o relatório)
+            spool_max_memory: Acima deste tamanho o ZIP vai para o disco
+        """
+        self.format_ext = format_ext
+        self.quality = quality
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.spool_max_memory = spool_max_memory
+        self.report: List[Dict] = []
+
+        self._spool = tempfile.SpooledTemporaryFile(max_size=spool_max_memory, prefix='imagens_zip_')
+        # ZIP_STORED = sem compressão (muito mais rápido, pois imagens já são comprimidas)
+        self._zip = zipfile.ZipFile(self._spool, 'w', zipfile.ZIP_STORED)
+
+    def write(self, original_name: str, encoded: EncodedImage) -> None:
+        """Adiciona uma imagem já codificada no formato do ZIP"""
+        name_without_ext = Path(original_name).stem
+        new_name = f"{self.prefix}{name_without_ext}{self.suffix}.{self.format_ext}"
+
+        self._zip.writestr(new_name, encoded.data)
+        self.report.append({
+            'arquivo': new_name,
+            # Sem limite a qualidade é a pedida; do cache em disco com limite, desconhecida
+            'qualidade': encoded.encoded_quality if encoded.encoded_quality is not None
+            else (self.quality if self.max_bytes is None else None),
+            'bytes': len(encoded.data),
+            'dentro_do_limite': self.max_bytes is None or len(encoded.data) <= self.max_bytes
+        })
+
+    def add(self, result) -> None:
+        """Recebe um BatchResult (lote com output_format igual ao do ZIP); falhas são ignoradas"""
+        if result.encoded is not None:
+            self.write(result.filename, result.encoded)
+
+    def close(self) -> ZipExport:
+        """Finaliza o ZIP e o entrega pronto para download"""
+        self._zip.close()
+        nbytes = self._spool.tell()
+        self._spool.seek(0)
+        return ZipExport(self._spool, nbytes, self.spool_max_memory, self.report)
+
+
+def create_download_zip(
+    processor: ImageProcessor,
+    processed_images: List[Tuple[Union[Image.Image, EncodedImage], str]],
+    format_ext: str,
+    quality: int,
+    prefix: str,
+    suffix: str,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    encoded: Optional[Dict[int, EncodedImage]] = None,
+    spool_max_memory: int = ZIP_SPOOL_MAX_MEMORY,
+    max_bytes: Optional[int] = None,
+    workers: Optional[int] = None
+) -> ZipExport:
+    """
+    Cria arquivo ZIP com todas as imagens processadas
+    ⚡ OTIMIZADO: Sem compressão do ZIP (imagens já são comprimidas)
+    ⚡ OTIMIZADO: encoded (índice -> EncodedImage) evita recodificar imagens já codificadas
+    ⚡ OTIMIZADO: Cada imagem vai direto para o arquivo temporário (sem BytesIO + getvalue)
+    ⚡ OTIMIZADO: Codificação em paralelo (threads: o Pillow libera o GIL ao codificar)
+
+    max_bytes limita o tamanho de cada arquivo: para WEBP/JPG é usada a maior
+    qualidade (até 'quality') que caiba, escolhida por imagem.
+    """
+    sink = ZipSink(format_ext, quality, prefix, suffix, max_bytes, spool_max_memory)
+    total = len(processed_images)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    def encode(idx: int, img: Union[Image.Image, EncodedImage]) -> EncodedImage:
+        # ⚡ Resultado já comprimido com as mesmas configurações: usar os bytes como estão
+        if isinstance(img, EncodedImage) and img.matches(format_ext, quality, max_bytes):
+            return img
+
+        # Reaproveitar a codificação anterior (mesmo lote, formato, qualidade e limite)
+        previous = encoded.get(idx) if encoded is not None else None
+        if previous is not None:
+            return previous
+
+        if isinstance(img, EncodedImage):
+            # Formato/qualidade mudaram depois do processamento: recodificar
+            img = img.to_image()
+        if max_bytes is None:
+            data, used_quality = processor.encode_image(img, format_ext, quality), quality
+        else:
+            data, used_quality = processor.encode_image_to_size(img, format_ext, max_bytes, quality)
+        result = EncodedImage(data, format_ext, quality, img.size, max_bytes=max_bytes, encoded_quality=used_quality)
+        if encoded is not None:
+            encoded[idx] = result
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Resultados na ordem de entrada; no máximo 2 por thread em andamento (limita memória)
+        pending = deque()
+        items = iter(enumerate(processed_images, 1))
+        in_flight = 2 * workers
+
+        def submit_next() -> None:
+            item = next(items, None)
+            if item is not None:
+                idx, (img, original_name) = item
+                pending.append((idx, original_name, executor.submit(encode, idx, img)))
+
+        for _ in range(in_flight):
+            submit_next()
+
+        while pending:
+            idx, original_name, future = pending.popleft()
+            result = future.result()
+            submit_next()
+
+            # Callback de progresso
+            if progress_callback:
+                progress_callback(idx, total, original_name)
+
+            # Adicionar ao ZIP
+            sink.write(original_name, result)
+
+    return sink.close()